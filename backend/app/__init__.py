@@ -1 +1,6 @@
+import time
+
+# When the app package started importing; the startup report counts imports from here.
+IMPORT_STARTED = time.perf_counter()
+
 __all__ = ["main"]
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from .. import metrics
+from ..versioning import get_data_versions, get_data_versions_async
+
+
+class FeedResponseCache:
+    """Conditional-GET cache for read endpoints keyed on query params and data versions.
+
+    The ETag is derived from the endpoint name, its parameters and the current
+    versions of the tables it reads, so a matching ``If-None-Match`` is answered with
+    304 before any feed work happens. Serialized bodies are kept in a bounded LRU so
+    repeat loads also skip the DB and Pydantic.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, etag: str):
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def _put(self, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _cached(self, request: Request, etag: str) -> Tuple[Dict[str, str], Optional[Response]]:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in parse_if_none_match(request.headers.get("if-none-match")):
+            metrics.FEED_CACHE_LOOKUPS.inc(result="not_modified")
+            return headers, Response(status_code=304, headers=headers)
+        body = self._get(etag)
+        if body is None:
+            self.misses += 1
+            metrics.FEED_CACHE_LOOKUPS.inc(result="miss")
+            return headers, None
+        self.hits += 1
+        metrics.FEED_CACHE_LOOKUPS.inc(result="hit")
+        return headers, Response(content=body, media_type="application/json", headers=headers)
+
+    def _store(self, etag: str, payload: BaseModel, headers: Dict[str, str]) -> Response:
+        body = payload.json().encode("utf-8")
+        self._put(etag, body)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def serve(
+        self,
+        request: Request,
+        name: str,
+        params: Dict[str, object],
+        scopes: Iterable[str],
+        build: Callable[[], BaseModel],
+    ) -> Response:
+        etag = _etag(name, params, get_data_versions(scopes))
+        headers, response = self._cached(request, etag)
+        return response if response is not None else self._store(etag, build(), headers)
+
+    async def serve_async(
+        self,
+        request: Request,
+        name: str,
+        params: Dict[str, object],
+        scopes: Iterable[str],
+        build: Callable[[], Awaitable[BaseModel]],
+    ) -> Response:
+        """Like :meth:`serve`, for async endpoints whose ``build`` is a coroutine."""
+
+        etag = _etag(name, params, await get_data_versions_async(scopes))
+        headers, response = self._cached(request, etag)
+        return response if response is not None else self._store(etag, await build(), headers)
+
+
+def _etag(name: str, params: Dict[str, object], versions: Dict[str, int]) -> str:
+    key = json.dumps([name, sorted(params.items()), sorted(versions.items())], default=str)
+    return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest() + '"'
+
+
+def parse_if_none_match(value) -> Tuple[str, ...]:
+    if not value:
+        return ()
+    return tuple(tag.strip().removeprefix("W/") for tag in value.split(","))
+
+
+feed_cache = FeedResponseCache()
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, BackgroundTasks, Query
+import asyncio
+from datetime import datetime
+from typing import Optional
 
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from ..config import get_settings
 from ..schemas import (
+    BookSearchPayload,
+    CatalogImportJobResponse,
     ClientLogEntry,
+    EmbeddingRebuildResponse,
+    EmbeddingRecommendationsPayload,
+    EnrichmentJobResponse,
+    FeedbackBatchRequest,
+    FeedbackBatchResponse,
     FeedbackPayload,
     FeedbackRequest,
     FeedbackResponse,
+    LogArchiveJobResponse,
     LogsPayload,
     RecommendationsPayload,
     SettingsResponse,
@@ -13,18 +27,43 @@ from ..schemas import (
     TropeExtractionResponse,
     TropeRecommendationsPayload,
 )
-from ..services.feedback_service import fetch_feedback, record_feedback
-from ..services.log_service import fetch_logs, record_client_log
-from ..services.settings_service import get_settings_snapshot, update_settings
-from ..services.sync_service import get_last_job, get_recommendations, run_sync_job, start_sync_job
-from ..services.trope_service import extract_tropes, get_trope_recommendations
+from ..services.catalog_service import resolve_import_path
+from ..services.cover_service import COVER_SIZES, DEFAULT_SIZE, get_cover, warm_covers
+from ..services.embedding_service import get_embedding_recommendations
+from ..services.feedback_service import fetch_feedback_async, record_feedback, record_feedback_batch
+from ..services.job_queue import enqueue_job
+from ..services.log_service import fetch_logs_async, record_client_log
+from ..services.recommendation_service import (
+    UpcomingCovers,
+    fetch_recommendations_async,
+    recommendations_are_stale_async,
+    request_recommendations_refresh,
+    stream_recommendations_async,
+)
+from ..services.search_service import search_books_async
+from ..services.settings_service import get_settings_snapshot_async, update_settings
+from ..services.sync_service import get_last_job, start_sync_job
+from ..services.trope_profile import profile_cache_epoch
+from ..services.trope_service import fetch_trope_recommendations_async, stream_trope_recommendations_async
+from .cache import feed_cache, parse_if_none_match
+from .streaming import ndjson_response, wants_ndjson
+from .users import current_user
 
 router = APIRouter()
 
+# Tables each cached feed reads; a write to any of them changes the feed's ETag.
+RECOMMENDATION_SCOPES = ("appsettings", "book", "booktrope", "feedback", "recommendationstate")
+TROPE_FEED_SCOPES = ("appsettings", "book", "booktrope", "catalogtrope", "feedback", "tropeprofile")
+
+COVER_SIZE_PATTERN = "^(" + "|".join(COVER_SIZES) + ")$"
+
+# Read endpoints are ``async def`` on AsyncSession so they don't hold a threadpool
+# slot per request; writes and job triggers stay sync on the single writer.
+
 
 @router.get("/settings", response_model=SettingsResponse)
-def read_settings() -> SettingsResponse:
-    return get_settings_snapshot()
+async def read_settings() -> SettingsResponse:
+    return await get_settings_snapshot_async()
 
 
 @router.post("/settings", response_model=SettingsResponse)
@@ -34,9 +73,8 @@ def write_settings(payload: SettingsUpdate) -> SettingsResponse:
 
 
 @router.post("/abs/sync", response_model=SyncJobResponse)
-def trigger_sync(background_tasks: BackgroundTasks) -> SyncJobResponse:
+def trigger_sync() -> SyncJobResponse:
     job = start_sync_job()
-    background_tasks.add_task(run_sync_job, job)
     return SyncJobResponse(
         id=job.id,
         job_type=job.job_type,
@@ -44,6 +82,19 @@ def trigger_sync(background_tasks: BackgroundTasks) -> SyncJobResponse:
         message=job.message,
         started_at=job.started_at,
         finished_at=job.finished_at,
+        items_processed=job.items_processed,
+        progress=job.progress,
+        attempts=job.attempts,
+    )
+
+
+@router.post("/enrichment/run", response_model=EnrichmentJobResponse)
+def trigger_enrichment() -> EnrichmentJobResponse:
+    job, created = enqueue_job("enrichment", message="Metadata enrichment queued")
+    return EnrichmentJobResponse(
+        scheduled=created,
+        message="Metadata enrichment queued" if created else "Metadata enrichment already queued",
+        job_id=job.id,
     )
 
 
@@ -59,18 +110,62 @@ def get_sync_status() -> SyncJobResponse | None:
         message=job.message,
         started_at=job.started_at,
         finished_at=job.finished_at,
+        items_processed=job.items_processed,
+        progress=job.progress,
+        attempts=job.attempts,
     )
 
 
 @router.get("/recommendations", response_model=RecommendationsPayload)
-def recommendations(limit: int = Query(10, ge=1, le=25)) -> RecommendationsPayload:
-    items = get_recommendations(limit)
-    return RecommendationsPayload(items=items)
+async def recommendations(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(10, ge=1, le=25),
+    cursor: str | None = None,
+    user_id: str = Depends(current_user),
+) -> Response:
+    try:
+        # Only a first-page load refreshes, so a feed being paged keeps its generation.
+        if cursor is None and await recommendations_are_stale_async():
+            await asyncio.to_thread(request_recommendations_refresh)
+        if wants_ndjson(request):
+            items = stream_recommendations_async(limit, cursor, user_id, _prefetch(background_tasks))
+            return await ndjson_response(items)
+
+        async def build() -> RecommendationsPayload:
+            return await fetch_recommendations_async(limit, cursor, user_id, _prefetch(background_tasks))
+
+        params = {"limit": limit, "cursor": cursor, "user": user_id}
+        return await feed_cache.serve_async(request, "recommendations", params, RECOMMENDATION_SCOPES, build)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/books/search", response_model=BookSearchPayload)
+async def book_search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
+) -> BookSearchPayload:
+    try:
+        return await search_books_async(q, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.get("/logs", response_model=LogsPayload)
-def read_logs(level: str | None = None, source: str | None = None) -> LogsPayload:
-    return fetch_logs(level=level, source=source)
+async def read_logs(
+    level: str | None = None,
+    source: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
+) -> LogsPayload:
+    try:
+        return await fetch_logs_async(level=level, source=source, limit=limit, cursor=cursor, since=since, until=until)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @router.post("/logs/client", response_model=dict)
@@ -79,29 +174,159 @@ def write_client_log(payload: ClientLogEntry) -> dict:
     return {"status": "recorded", "log": entry.dict()}
 
 
+@router.post("/logs/archive", response_model=LogArchiveJobResponse)
+def trigger_log_archive(older_than_days: float | None = Query(None, ge=0)) -> LogArchiveJobResponse:
+    payload = {"older_than_days": older_than_days} if older_than_days is not None else {}
+    job, created = enqueue_job("log_archive", payload, message="Log archival job queued")
+    return LogArchiveJobResponse(
+        scheduled=created,
+        message="Log archival job queued" if created else "Log archival job already queued",
+        job_id=job.id,
+    )
+
+
+@router.post("/catalog/import", response_model=CatalogImportJobResponse)
+def trigger_catalog_import(
+    file: str = Query(..., min_length=1), format: str | None = Query(None, pattern="^(jsonl|csv)$")
+) -> CatalogImportJobResponse:
+    try:
+        resolve_import_path(file)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    payload = {"file": file, "format": format} if format else {"file": file}
+    job, created = enqueue_job("catalog_import", payload, message="Catalog import job queued")
+    return CatalogImportJobResponse(
+        scheduled=created,
+        message="Catalog import job queued" if created else "Catalog import job already queued",
+        job_id=job.id,
+    )
+
+
+@router.get("/catalog/import/status", response_model=SyncJobResponse | None)
+def get_catalog_import_status() -> SyncJobResponse | None:
+    job = get_last_job("catalog_import")
+    if not job:
+        return None
+    return SyncJobResponse(
+        id=job.id,
+        job_type=job.job_type,
+        status=job.status,
+        message=job.message,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        items_processed=job.items_processed,
+        progress=job.progress,
+        attempts=job.attempts,
+    )
+
+
 @router.post("/feedback", response_model=FeedbackResponse)
-def submit_feedback(payload: FeedbackRequest) -> FeedbackResponse:
-    return record_feedback(payload)
+def submit_feedback(payload: FeedbackRequest, user_id: str = Depends(current_user)) -> FeedbackResponse:
+    return record_feedback(payload, user_id)
+
+
+@router.post("/feedback/batch", response_model=FeedbackBatchResponse)
+def submit_feedback_batch(
+    payload: FeedbackBatchRequest, user_id: str = Depends(current_user)
+) -> FeedbackBatchResponse:
+    return record_feedback_batch(payload, user_id)
 
 
 @router.get("/feedback", response_model=FeedbackPayload)
-def list_feedback() -> FeedbackPayload:
-    return fetch_feedback()
+async def list_feedback(user_id: str = Depends(current_user)) -> FeedbackPayload:
+    return await fetch_feedback_async(user_id=user_id)
 
 
 @router.post("/tropes/extract", response_model=TropeExtractionResponse)
-def trigger_trope_extraction(background_tasks: BackgroundTasks) -> TropeExtractionResponse:
-    background_tasks.add_task(extract_tropes, False)
-    return TropeExtractionResponse(message="Trope extraction job queued")
+def trigger_trope_extraction() -> TropeExtractionResponse:
+    return _queue_trope_job(force=False, label="Trope extraction job")
 
 
 @router.post("/tropes/refresh", response_model=TropeExtractionResponse)
-def refresh_tropes(background_tasks: BackgroundTasks) -> TropeExtractionResponse:
-    background_tasks.add_task(extract_tropes, True)
-    return TropeExtractionResponse(message="Trope extraction refresh queued", status="queued")
+def refresh_tropes() -> TropeExtractionResponse:
+    return _queue_trope_job(force=True, label="Trope extraction refresh")
+
+
+def _queue_trope_job(force: bool, label: str) -> TropeExtractionResponse:
+    job, created = enqueue_job("trope_extract", {"force": force}, message=f"{label} queued")
+    return TropeExtractionResponse(
+        status="queued",
+        scheduled=created,
+        message=f"{label} queued" if created else f"{label} already queued",
+        job_id=job.id,
+    )
 
 
 @router.get("/discovery/trope-feed", response_model=TropeRecommendationsPayload)
-def trope_feed(limit: int = Query(10, ge=1, le=25)) -> TropeRecommendationsPayload:
-    items = get_trope_recommendations(limit)
-    return TropeRecommendationsPayload(items=items)
+async def trope_feed(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(10, ge=1, le=25),
+    cursor: str | None = None,
+    user_id: str = Depends(current_user),
+) -> Response:
+    try:
+        if wants_ndjson(request):
+            items = stream_trope_recommendations_async(limit, cursor, user_id, _prefetch(background_tasks))
+            return await ndjson_response(items)
+
+        async def build() -> TropeRecommendationsPayload:
+            return await fetch_trope_recommendations_async(limit, cursor, user_id, _prefetch(background_tasks))
+
+        params = {"limit": limit, "cursor": cursor, "user": user_id, "epoch": profile_cache_epoch()}
+        return await feed_cache.serve_async(request, "trope-feed", params, TROPE_FEED_SCOPES, build)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _prefetch(background_tasks: BackgroundTasks) -> Optional[UpcomingCovers]:
+    """Warm the next page's covers, found while ranking this one, once the response is sent."""
+
+    if not get_settings().cover_prefetch_enabled:
+        return None
+    return lambda urls: background_tasks.add_task(warm_covers, urls)
+
+
+# External ids may contain slashes (Open Library "/works/OL...W" keys).
+@router.get("/covers/catalog/{candidate_id:path}", response_class=Response)
+async def catalog_cover(
+    request: Request, candidate_id: str, size: str = Query(DEFAULT_SIZE, pattern=COVER_SIZE_PATTERN)
+) -> Response:
+    return await _cover_response(request, "catalog", candidate_id, size)
+
+
+@router.get("/covers/{book_id}", response_class=Response)
+async def book_cover(
+    request: Request, book_id: int, size: str = Query(DEFAULT_SIZE, pattern=COVER_SIZE_PATTERN)
+) -> Response:
+    return await _cover_response(request, "book", str(book_id), size)
+
+
+async def _cover_response(request: Request, kind: str, key: str, size: str) -> Response:
+    try:
+        variant = await get_cover(kind, key, size)
+    except ValueError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    if variant is None:
+        raise HTTPException(status_code=404, detail="No cover for this item")
+    # Variants are content-addressed, so the ETag only changes when the image does.
+    headers = {"ETag": variant.etag, "Cache-Control": f"public, max-age={get_settings().cover_cache_max_age}"}
+    if variant.etag in parse_if_none_match(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(variant.path, media_type=variant.content_type, headers=headers)
+
+
+@router.get("/discovery/embedding-feed", response_model=EmbeddingRecommendationsPayload)
+def embedding_feed(limit: int = Query(10, ge=1, le=25)) -> EmbeddingRecommendationsPayload:
+    items = get_embedding_recommendations(limit)
+    return EmbeddingRecommendationsPayload(items=items)
+
+
+@router.post("/embeddings/rebuild", response_model=EmbeddingRebuildResponse)
+def trigger_embedding_rebuild() -> EmbeddingRebuildResponse:
+    job, created = enqueue_job("embedding_rebuild", message="Embedding index rebuild queued")
+    return EmbeddingRebuildResponse(
+        scheduled=created,
+        message="Embedding index rebuild queued" if created else "Embedding index rebuild already queued",
+        job_id=job.id,
+    )
@@ -0,0 +1,28 @@
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def ndjson_response(items: AsyncIterator[BaseModel]) -> StreamingResponse:
+    """Stream each model as one JSON line.
+
+    The first item is pulled before the response starts, so errors raised while
+    resolving a page (a bad cursor, say) still reach the caller as exceptions.
+    """
+
+    first = await items.__anext__()
+
+    async def lines() -> AsyncIterator[bytes]:
+        yield first.json().encode("utf-8") + b"\n"
+        async for item in items:
+            yield item.json().encode("utf-8") + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers={"Cache-Control": "no-store"})
@@ -0,0 +1,12 @@
+from fastapi import Header, HTTPException
+
+from ..services.user_state import normalize_user_id
+
+
+def current_user(x_user_id: str | None = Header(None)) -> str:
+    """The reader a request acts for, from ``X-User-Id``; requests without one use the default reader."""
+
+    try:
+        return normalize_user_id(x_user_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
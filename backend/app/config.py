@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseSettings, Field
 
@@ -11,6 +11,19 @@ class Settings(BaseSettings):
         default="sqlite:///./bookdiscover.db",
         description="SQLAlchemy-compatible database URL.",
     )
+    database_profile: str = Field(
+        default="auto",
+        description="Engine tuning profile: sqlite, postgres, default, or auto (picked from database_url).",
+    )
+    sqlite_busy_timeout_ms: int = Field(default=5000, description="SQLite busy_timeout pragma in milliseconds.")
+    sqlite_synchronous: str = Field(default="NORMAL", description="SQLite synchronous pragma (NORMAL is safe with WAL).")
+    sqlite_cache_size_kb: int = Field(default=65536, description="SQLite page cache size per connection in KiB.")
+    sqlite_mmap_size: int = Field(default=268_435_456, description="SQLite mmap_size pragma in bytes.")
+    sqlite_read_pool_size: int = Field(default=8, description="Read-only SQLite connections kept in the read pool.")
+    db_pool_size: int = Field(default=10, description="Postgres connection pool size per worker.")
+    db_max_overflow: int = Field(default=20, description="Extra Postgres connections allowed beyond the pool size.")
+    db_pool_timeout: float = Field(default=30.0, description="Seconds to wait for a pooled connection.")
+    db_pool_recycle: int = Field(default=1800, description="Seconds after which pooled connections are recycled.")
     cors_origins: List[str] = Field(
         default_factory=lambda: ["http://localhost:5173", "http://127.0.0.1:5173"],
         description="Allowed CORS origins for the frontend application.",
@@ -20,6 +33,172 @@ class Settings(BaseSettings):
         description="When enabled, the backend will operate with seed/demo data instead of external integrations.",
     )
 
+    search_backend: str = Field(
+        default="auto",
+        description="Book search backend: auto (FTS5 on SQLite, in-process index elsewhere) or memory.",
+    )
+
+    trope_write_batch_size: int = Field(
+        default=500,
+        description="Number of book/trope rows written per bulk statement during trope extraction.",
+    )
+
+    trope_llm_batch_size: int = Field(default=20, description="Books sent to the trope extraction provider per prompt.")
+    trope_llm_concurrency: int = Field(default=4, description="Trope extraction prompts in flight at once.")
+    trope_llm_timeout: float = Field(default=60.0, description="Timeout in seconds for a trope extraction request.")
+    trope_llm_rate_limit: float = Field(default=2.0, description="Trope extraction prompts started per second.")
+    trope_llm_max_retries: int = Field(
+        default=4, description="Retries of a trope extraction prompt after a 429, 5xx or network error."
+    )
+
+    catalog_import_dir: str = Field(
+        default="./data/catalog",
+        description="Directory the catalog import endpoint reads JSONL/CSV candidate dumps from.",
+    )
+    catalog_import_batch_size: int = Field(default=2000, description="Catalog records validated and written per chunk.")
+
+    trope_profile_feedback_weight: float = Field(
+        default=0.2,
+        description="Trope weight added to a matched trope in the feed score per unit of reaction weight.",
+    )
+    trope_profile_half_life_days: Optional[float] = Field(
+        default=None,
+        description="Half-life in days for feedback in the trope profile; unset disables decay.",
+    )
+
+    log_buffer_enabled: bool = Field(
+        default=True,
+        description="Write log entries through the background batch writer instead of inline transactions.",
+    )
+    log_queue_size: int = Field(default=10_000, description="Maximum number of log entries buffered in memory.")
+    log_batch_size: int = Field(default=200, description="Number of buffered log entries written per transaction.")
+    log_flush_interval: float = Field(
+        default=0.5,
+        description="Maximum number of seconds a buffered log entry waits before being written.",
+    )
+    log_overflow_policy: str = Field(
+        default="drop_oldest",
+        description="What to do when the log buffer is full: block, drop_oldest or sample.",
+    )
+    log_sample_every: int = Field(
+        default=10,
+        description="With the sample overflow policy, keep one in this many overflowing entries.",
+    )
+
+    log_retention_days: Optional[float] = Field(
+        default=30.0,
+        description="Age in days after which log entries are moved to the archive; unset disables archival.",
+    )
+    log_archive_dir: str = Field(default="./data/log-archive", description="Directory holding archived log segments.")
+    log_archive_compression: str = Field(
+        default="gzip",
+        description="Archive segment compression: gzip, or zstd (requires the zstandard package).",
+    )
+    log_archive_batch_size: int = Field(default=5000, description="Log rows read and deleted per archival batch.")
+
+    openai_api_key: Optional[str] = Field(default=None, description="API key for the OpenAI embedding and trope extraction providers.")
+    embedding_store_dir: str = Field(
+        default="./data/embeddings",
+        description="Directory holding the memory-mapped book and candidate vector stores.",
+    )
+    embedding_dimensions: int = Field(default=256, description="Vector size of the local hashing embedding provider.")
+    embedding_index_mode: str = Field(
+        default="auto",
+        description="Nearest-neighbour search mode: exact, ivf, or auto (IVF for large catalogs).",
+    )
+    embedding_ivf_threshold: int = Field(
+        default=50_000,
+        description="Minimum number of vectors before auto mode switches to the IVF index.",
+    )
+    embedding_ivf_probes: int = Field(default=8, description="Number of IVF partitions scanned per query.")
+
+    abs_page_size: int = Field(default=200, description="Items requested per Audiobookshelf library page.")
+    abs_max_concurrency: int = Field(
+        default=4,
+        description="Maximum concurrent Audiobookshelf requests (also the HTTP connection pool size).",
+    )
+    abs_timeout: float = Field(default=30.0, description="Timeout in seconds for Audiobookshelf requests.")
+    abs_full_sync_interval_hours: float = Field(
+        default=24.0,
+        description="Hours between full library passes that also remove books deleted from Audiobookshelf.",
+    )
+
+    enrichment_cache_dir: str = Field(
+        default="./data/http-cache",
+        description="Directory for cached Google Books / Open Library responses.",
+    )
+    enrichment_cache_ttl: float = Field(
+        default=7 * 24 * 3600,
+        description="Seconds a cached metadata response is reused before it is revalidated.",
+    )
+    enrichment_concurrency: int = Field(default=8, description="Books enriched concurrently.")
+    enrichment_batch_size: int = Field(default=200, description="Books loaded and written per enrichment chunk.")
+    google_books_rate_limit: float = Field(default=1.0, description="Google Books requests per second.")
+    google_books_burst: float = Field(default=5, description="Google Books request burst size.")
+    open_library_rate_limit: float = Field(default=1.0, description="Open Library requests per second.")
+    open_library_burst: float = Field(default=3, description="Open Library request burst size.")
+    http_max_retry_after: float = Field(
+        default=120.0,
+        description="Longest Retry-After in seconds a provider request waits; a longer one fails the attempt.",
+    )
+
+    cover_cache_dir: str = Field(default="./data/covers", description="Directory for resized cover images.")
+    cover_cache_max_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        description="Disk budget in bytes for cached covers; least recently served images are deleted first.",
+    )
+    cover_cache_max_age: int = Field(
+        default=7 * 24 * 3600, description="Cache-Control max-age in seconds sent with cover images."
+    )
+    cover_fetch_timeout: float = Field(default=15.0, description="Timeout in seconds for fetching an upstream cover.")
+    cover_max_source_bytes: int = Field(
+        default=10 * 1024 * 1024, description="Largest upstream cover image accepted, in bytes."
+    )
+    cover_prefetch_enabled: bool = Field(
+        default=True, description="Warm the covers of a feed's next page after serving a page."
+    )
+    cover_prefetch_concurrency: int = Field(default=4, description="Upstream covers fetched at once while prefetching.")
+
+    metrics_enabled: bool = Field(default=True, description="Instrument requests, SQL and jobs and serve /metrics.")
+
+    startup_budget_seconds: float = Field(
+        default=5.0,
+        description="Startup time (imports through worker start) above which the started log is a warning; 0 disables.",
+    )
+
+    user_state_cache_max_bytes: int = Field(
+        default=32 * 1024 * 1024,
+        description="Memory budget in bytes for cached per-reader scoring state; least recently used readers are evicted.",
+    )
+
+    settings_cache_check_interval: float = Field(
+        default=1.0,
+        description="Seconds cached AppSettings are trusted before checking for writes from other workers.",
+    )
+
+    job_embedded_worker: bool = Field(
+        default=True,
+        description="Run a job worker thread inside the API process; disable when running `python -m app.worker`.",
+    )
+    job_worker_threads: int = Field(default=2, description="Jobs a single worker process runs at once.")
+    job_poll_interval: float = Field(default=1.0, description="Seconds an idle worker waits before polling again.")
+    job_lease_seconds: float = Field(default=60.0, description="Lease length; a job whose lease lapses is reclaimed.")
+    job_max_attempts: int = Field(default=3, description="Attempts before a failing job is marked failed.")
+    job_retry_backoff: float = Field(default=5.0, description="Base retry delay in seconds, doubled per attempt.")
+    job_retry_backoff_max: float = Field(default=300.0, description="Upper bound on the retry delay in seconds.")
+    job_concurrency: Dict[str, int] = Field(
+        default_factory=lambda: {
+            "abs_sync": 1,
+            "trope_extract": 1,
+            "log_archive": 1,
+            "catalog_import": 1,
+            "recommendations_refresh": 1,
+            "enrichment": 1,
+            "embedding_rebuild": 1,
+        },
+        description="Maximum running jobs per job type across all workers (JSON object).",
+    )
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
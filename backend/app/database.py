@@ -1,26 +1,276 @@
-from contextlib import contextmanager
-from typing import Iterator
+import hashlib
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import AsyncIterator, Iterator, Optional, Sequence, Tuple
 
+from sqlalchemy import delete, event, insert, inspect, select, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .config import get_settings
+from .config import Settings, get_settings
 
 
-settings = get_settings()
-engine = create_engine(settings.database_url, echo=False, future=True)
+def resolve_profile(settings: Settings) -> str:
+    if settings.database_profile != "auto":
+        return settings.database_profile
+    backend = make_url(settings.database_url).get_backend_name()
+    if backend == "sqlite":
+        database = make_url(settings.database_url).database or ""
+        return "default" if database in ("", ":memory:") or "mode=memory" in settings.database_url else "sqlite"
+    if backend == "postgresql":
+        return "postgres"
+    return "default"
 
 
-def create_db_and_tables() -> None:
-    """Create database tables based on SQLModel metadata."""
+def _sqlite_pragmas(settings: Settings, read_only: bool):
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return on_connect
+
+
+def build_engines(settings: Settings) -> Tuple[Engine, Engine]:
+    """Return ``(write_engine, read_engine)`` for the configured profile.
+
+    The sqlite profile runs in WAL mode and funnels every write through a single
+    pooled writer connection, so writers queue in-process instead of failing with
+    ``database is locked``; reads use a separate pool of query-only connections
+    that WAL lets proceed alongside the writer. Other profiles share one engine.
+    """
+
+    profile = resolve_profile(settings)
+    if profile == "sqlite":
+        connect_args = {"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000}
+        write_engine = create_engine(
+            settings.database_url,
+            echo=False,
+            future=True,
+            connect_args=connect_args,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=settings.db_pool_timeout,
+        )
+        read_engine = create_engine(
+            settings.database_url,
+            echo=False,
+            future=True,
+            connect_args=connect_args,
+            pool_size=settings.sqlite_read_pool_size,
+            max_overflow=settings.sqlite_read_pool_size,
+            pool_timeout=settings.db_pool_timeout,
+        )
+        event.listen(write_engine, "connect", _sqlite_pragmas(settings, read_only=False))
+        event.listen(read_engine, "connect", _sqlite_pragmas(settings, read_only=True))
+        return write_engine, read_engine
+    if profile == "postgres":
+        engine = create_engine(
+            settings.database_url,
+            echo=False,
+            future=True,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True,
+        )
+        return engine, engine
+    engine = create_engine(settings.database_url, echo=False, future=True)
+    return engine, engine
+
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite a sync database URL to its asyncio driver (aiosqlite/asyncpg)."""
+
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()!r}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def build_async_read_engine(settings: Settings) -> AsyncEngine:
+    """Return the asyncio engine used by async read endpoints.
+
+    It mirrors the sync read engine for the active profile: query-only WAL
+    connections for sqlite, the shared pool settings for postgres.
+    """
+
+    profile = resolve_profile(settings)
+    url = async_database_url(settings.database_url)
+    if profile == "sqlite":
+        async_engine = create_async_engine(
+            url,
+            echo=False,
+            connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000},
+            pool_size=settings.sqlite_read_pool_size,
+            max_overflow=settings.sqlite_read_pool_size,
+            pool_timeout=settings.db_pool_timeout,
+        )
+        event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas(settings, read_only=True))
+        return async_engine
+    if profile == "postgres":
+        return create_async_engine(
+            url,
+            echo=False,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=True,
+        )
+    return create_async_engine(url, echo=False)
+
+
+_engines: Optional[Tuple[Engine, Engine]] = None
+_engines_lock = threading.Lock()
+_async_read_engine: Optional[AsyncEngine] = None
+
+
+def _get_engines() -> Tuple[Engine, Engine]:
+    global _engines
+    if _engines is None:
+        with _engines_lock:
+            if _engines is None:
+                _engines = build_engines(get_settings())
+    return _engines
+
+
+def get_engine() -> Engine:
+    """Return the write engine, creating both sync engines on first use.
+
+    Nothing connects or loads a dialect at import time, so commands and workers
+    that never touch the database start without paying for it.
+    """
+
+    return _get_engines()[0]
+
+
+def get_read_engine() -> Engine:
+    return _get_engines()[1]
+
+
+def get_async_read_engine() -> AsyncEngine:
+    """Create the async read engine on first use so sync-only processes never load a driver."""
+
+    global _async_read_engine
+    if _async_read_engine is None:
+        _async_read_engine = build_async_read_engine(get_settings())
+    return _async_read_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_read_engine
+    if _async_read_engine is not None:
+        await _async_read_engine.dispose()
+        _async_read_engine = None
+
+
+def schema_fingerprint(dialect, extra: Sequence[str] = ()) -> str:
+    """Hash the DDL every model table and index compiles to on ``dialect``, plus ``extra``."""
+
+    digest = hashlib.sha256()
+    for table in SQLModel.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode("utf-8"))
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode("utf-8"))
+    for statement in extra:
+        digest.update(statement.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _stored_fingerprint(engine: Engine) -> Optional[str]:
+    from .models import SchemaState
+
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(SchemaState.fingerprint).where(SchemaState.id == 1)).scalar()
+    except DBAPIError:  # no schemastate table yet: a new or older database
+        return None
+
+
+def create_db_and_tables(force: bool = False) -> bool:
+    """Bring the database schema up to date with the SQLModel metadata.
+
+    The fingerprint of the applied schema is stored in ``schemastate``; when it
+    matches the current models the reflection-heavy steps (``create_all``, column
+    and index checks, the search index) are skipped, so restarting against an
+    unchanged database costs one query. Returns whether the schema was applied.
+    """
+
+    from . import models  # noqa: F401  (registers every table on SQLModel.metadata)
+    from .services.search_service import install_search_index, search_index_ddl
+
+    engine = get_engine()
+    fingerprint = schema_fingerprint(engine.dialect, search_index_ddl(engine.dialect.name))
+    if not force and _stored_fingerprint(engine) == fingerprint:
+        return False
 
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns(engine)
+    # create_all skips indexes on tables that already exist, so add any new ones.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    with engine.begin() as connection:
+        install_search_index(connection)
+        connection.execute(delete(models.SchemaState))
+        connection.execute(insert(models.SchemaState).values(id=1, fingerprint=fingerprint, applied_at=datetime.utcnow()))
+    return True
+
+
+def _add_missing_columns(engine: Engine) -> None:
+    """Add nullable/defaulted columns introduced after a table was first created."""
+
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                default = _column_default(column)
+                if not column.nullable and default is None:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                if default is not None:
+                    ddl += f" NOT NULL DEFAULT {default}"
+                connection.execute(text(ddl))
+
+
+def _column_default(column) -> Optional[str]:
+    default = getattr(column.default, "arg", None)
+    if isinstance(default, bool):
+        return "1" if default else "0"
+    if isinstance(default, (int, float)):
+        return repr(default)
+    if isinstance(default, str):
+        return "'" + default.replace("'", "''") + "'"
+    return None
 
 
 @contextmanager
 def get_session() -> Iterator[Session]:
-    """Provide a transactional database session."""
+    """Provide a transactional database session on the writer connection."""
 
-    session = Session(engine)
+    session = Session(get_engine(), expire_on_commit=False)
     try:
         yield session
         session.commit()
@@ -29,3 +279,33 @@ def get_session() -> Iterator[Session]:
         raise
     finally:
         session.close()
+
+
+@contextmanager
+def get_read_session() -> Iterator[Session]:
+    """Provide a session from the read pool for queries that never write."""
+
+    session = Session(get_read_engine(), expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@asynccontextmanager
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """Provide an ``AsyncSession`` on the async read pool for non-blocking queries.
+
+    Writes stay on the sync writer (see :func:`get_session`) so the single-writer
+    queue and the data-version hooks keep covering every write.
+    """
+
+    session = AsyncSession(get_async_read_engine(), expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+# Registers the session hooks that bump DataVersion on writes to tracked tables.
+from . import versioning  # noqa: E402,F401
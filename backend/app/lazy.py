@@ -0,0 +1,32 @@
+"""Deferred imports for heavy dependencies that boot does not need.
+
+``np = lazy_import("numpy")`` binds a stand-in module that imports the real one on
+first attribute access, so a process only pays for numpy or httpx once a code path
+uses them. Modules keep a ``TYPE_CHECKING`` import alongside for type checkers.
+"""
+
+import importlib
+import threading
+from types import ModuleType
+
+_lock = threading.Lock()
+
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, attribute: str):
+        # Only reached for attributes not yet copied over, i.e. before the first load.
+        with _lock:
+            if not self.__dict__.get("_loaded"):
+                module = importlib.import_module(self.__name__)
+                self.__dict__.update(vars(module))
+                self.__dict__["_loaded"] = True
+        try:
+            return self.__dict__[attribute]
+        except KeyError:
+            raise AttributeError(f"module {self.__name__!r} has no attribute {attribute!r}") from None
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return ``name`` as a module that is imported when first used."""
+
+    return _LazyModule(name)
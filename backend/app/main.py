@@ -1,13 +1,21 @@
-from fastapi import FastAPI
+import time
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import IMPORT_STARTED, metrics
 from .api.router import router as api_router
 from .config import get_settings
-from .database import create_db_and_tables
-from .services.log_service import record_log
+from .database import dispose_async_engine
+from .services.cover_service import collect_cover_metrics
+from .services.job_queue import JobWorker, collect_queue_metrics
+from .services.log_service import collect_log_metrics, shutdown_logs
+from .services.user_state import collect_user_state_metrics
+from .startup import run_startup
 
 
 def create_application() -> FastAPI:
+    imports_seconds = time.perf_counter() - IMPORT_STARTED
     settings = get_settings()
     app = FastAPI(title="BookDiscoverAI API", version="0.1.0")
 
@@ -18,16 +26,35 @@ def create_application() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if settings.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware)
+        metrics.register_collectors(
+            [collect_queue_metrics, collect_log_metrics, collect_user_state_metrics, collect_cover_metrics]
+        )
+
+    worker = JobWorker() if settings.job_embedded_worker else None
 
     @app.on_event("startup")
     def on_startup() -> None:
-        create_db_and_tables()
-        record_log("INFO", "BookDiscoverAI backend started")
+        app.state.startup = run_startup(worker, imports_seconds=imports_seconds)
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        if worker is not None:
+            worker.stop(timeout=settings.job_lease_seconds)
+        await dispose_async_engine()
+        shutdown_logs()
 
     @app.get("/healthz")
     def healthz() -> dict[str, str]:
         return {"status": "ok"}
 
+    if settings.metrics_enabled:
+
+        @app.get("/metrics", include_in_schema=False)
+        def read_metrics() -> Response:
+            return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
     app.include_router(api_router, prefix="/api")
 
     return app
@@ -0,0 +1,324 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+``MetricsMiddleware`` times every HTTP request per route template and tracks
+in-flight requests; SQLAlchemy cursor events count queries and their time both
+globally and for the request that issued them; job gauges are read from the
+queue table when ``/metrics`` is scraped.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the sample outright, e.g. to mirror a total counted elsewhere."""
+
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def replace(self, values: Dict[LabelValues, float]) -> None:
+        """Swap in a complete set of samples (for gauges computed at scrape time)."""
+
+        with self._lock:
+            self._values = dict(values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts, sum, count.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0.0]))
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return int(entry[1][1]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+        lines = []
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {_format_value(count)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Run ``collector`` before each render to refresh scrape-time gauges."""
+
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:  # a failing collector must not take down the scrape
+                ERRORS.inc(collector=getattr(collector, "__name__", "collector"))
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+ERRORS = REGISTRY.register(
+    Counter("metrics_collector_errors_total", "Scrape-time collectors that raised.", ["collector"])
+)
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests handled.", ["method", "route", "status"])
+)
+HTTP_LATENCY = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency.", ["method", "route"])
+)
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "HTTP requests being handled.", ["method"]))
+HTTP_DB_QUERIES = REGISTRY.register(
+    Histogram(
+        "http_request_db_queries",
+        "SQL statements executed per HTTP request.",
+        ["method", "route"],
+        buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+    )
+)
+HTTP_DB_SECONDS = REGISTRY.register(
+    Histogram("http_request_db_seconds", "Time spent in SQL per HTTP request.", ["method", "route"])
+)
+DB_QUERIES = REGISTRY.register(Counter("db_queries_total", "SQL statements executed.", ["engine"]))
+DB_QUERY_SECONDS = REGISTRY.register(
+    Histogram("db_query_duration_seconds", "SQL statement latency.", ["engine"])
+)
+JOB_DURATION = REGISTRY.register(
+    Histogram(
+        "job_duration_seconds",
+        "Queued job run time by outcome.",
+        ["job_type", "status"],
+        buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+    )
+)
+JOB_LAST_DURATION = REGISTRY.register(
+    Gauge("job_last_duration_seconds", "Run time of the most recent job of each type.", ["job_type"])
+)
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge("job_queue_depth", "Queued and running jobs.", ["job_type", "status"]))
+JOB_OLDEST_QUEUED = REGISTRY.register(
+    Gauge("job_oldest_queued_age_seconds", "Age of the oldest runnable queued job.", ["job_type"])
+)
+LOG_BUFFER_DEPTH = REGISTRY.register(Gauge("log_buffer_depth", "Log entries waiting to be written."))
+LOG_DROPPED = REGISTRY.register(Counter("log_entries_dropped_total", "Log entries dropped by the overflow policy."))
+FEED_CACHE_LOOKUPS = REGISTRY.register(Counter("feed_cache_lookups_total", "Feed response cache lookups.", ["result"]))
+COVER_LOOKUPS = REGISTRY.register(Counter("cover_cache_lookups_total", "Cover image lookups.", ["result"]))
+COVER_CACHE_BYTES = REGISTRY.register(Gauge("cover_cache_bytes", "Bytes of cover images cached on disk."))
+COVER_CACHE_EVICTIONS = REGISTRY.register(
+    Counter("cover_cache_evictions_total", "Cover images deleted to stay within the disk budget.")
+)
+STARTUP_PHASE_SECONDS = REGISTRY.register(
+    Gauge("startup_phase_seconds", "Time this process spent in each startup phase.", ["phase"])
+)
+USER_STATE_LOOKUPS = REGISTRY.register(
+    Counter("user_state_cache_lookups_total", "Per-reader scoring state lookups.", ["result"])
+)
+USER_STATE_CACHE_USERS = REGISTRY.register(Gauge("user_state_cache_users", "Readers with cached scoring state."))
+USER_STATE_CACHE_BYTES = REGISTRY.register(
+    Gauge("user_state_cache_bytes", "Estimated memory held by cached per-reader scoring state.")
+)
+USER_STATE_CACHE_EVICTIONS = REGISTRY.register(
+    Counter("user_state_cache_evictions_total", "Readers evicted from the scoring state cache.")
+)
+
+
+def observe_job(job_type: str, status: str, seconds: float) -> None:
+    JOB_DURATION.observe(seconds, job_type=job_type, status=status)
+    JOB_LAST_DURATION.set(seconds, job_type=job_type)
+
+
+# ---------------------------------------------------------------------------
+# SQL instrumentation
+
+# [statement count, seconds] for the request currently being handled.
+_request_sql: ContextVar[Optional[List[float]]] = ContextVar("request_sql", default=None)
+_STARTED_KEY = "metrics_query_started"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+    connection.info[_STARTED_KEY] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany) -> None:
+    started = connection.info.pop(_STARTED_KEY, None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    engine_name = connection.engine.dialect.name
+    DB_QUERIES.inc(engine=engine_name)
+    DB_QUERY_SECONDS.observe(elapsed, engine=engine_name)
+    stats = _request_sql.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+# ---------------------------------------------------------------------------
+# HTTP instrumentation
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; the route label is the matched path template."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self._templates: Dict[object, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            routes = getattr(scope.get("app"), "routes", ())
+            self._templates = {getattr(route, "endpoint", None): route.path for route in routes}
+            template = self._templates.get(endpoint, "unmatched")
+        return template
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        HTTP_IN_FLIGHT.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec(method=method)
+            _request_sql.reset(token)
+            route = self._route(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status["code"]))
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            HTTP_DB_QUERIES.observe(sql[0], method=method, route=route)
+            HTTP_DB_SECONDS.observe(sql[1], method=method, route=route)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def register_collectors(collectors: Iterable[Callable[[], None]]) -> None:
+    for collector in collectors:
+        REGISTRY.add_collector(collector)
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint, text
 from sqlmodel import Column, DateTime, Field, JSON, SQLModel
 
 
@@ -34,11 +34,27 @@ class AppSettings(SQLModel, table=True):
     demo_mode: bool = Field(default=True)
 
 
+class DataVersion(SQLModel, table=True):
+    scope: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+
+class SchemaState(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fingerprint: str = Field(description="Hash of the DDL the models compiled to when the schema was last applied")
+    applied_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
 class SyncJob(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     job_type: str = Field(default="abs_sync")
     status: str = Field(default="pending")
     message: Optional[str] = Field(default=None)
+    items_processed: int = Field(default=0)
+    progress: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     started_at: datetime = Field(
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), nullable=False),
@@ -46,6 +62,34 @@ class SyncJob(SQLModel, table=True):
     finished_at: Optional[datetime] = Field(
         default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
     )
+    payload: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    dedupe_key: Optional[str] = Field(default=None)
+    attempts: int = Field(default=0)
+    max_attempts: int = Field(default=3)
+    available_at: Optional[datetime] = Field(
+        default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    lease_owner: Optional[str] = Field(default=None)
+    lease_expires_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    heartbeat_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    last_error: Optional[str] = Field(default=None)
+
+    __table_args__ = (
+        Index("ix_syncjob_claim", "status", "available_at"),
+        Index("ix_syncjob_type_status", "job_type", "status"),
+        # At most one queued job per dedupe key: duplicate requests coalesce onto it.
+        Index(
+            "uix_syncjob_queued_dedupe",
+            "dedupe_key",
+            unique=True,
+            sqlite_where=text("status = 'queued'"),
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
 
 
 class Book(SQLModel, table=True):
@@ -55,10 +99,28 @@ class Book(SQLModel, table=True):
     description: Optional[str] = Field(default=None)
     cover_url: Optional[str] = Field(default=None)
     reason: Optional[str] = Field(default=None)
-    metadata: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    book_metadata: Optional[dict] = Field(default=None, sa_column=Column("metadata", JSON))
+    abs_item_id: Optional[str] = Field(default=None, index=True, unique=True)
+    abs_library_id: Optional[str] = Field(default=None)
+    abs_updated_at: Optional[int] = Field(default=None, description="ABS updatedAt in epoch milliseconds")
+
+
+class LibrarySyncState(SQLModel, table=True):
+    library_id: str = Field(primary_key=True)
+    name: Optional[str] = Field(default=None)
+    high_water_mark: Optional[int] = Field(default=None, description="Newest ABS updatedAt synced, epoch ms")
+    items_synced: int = Field(default=0)
+    last_synced_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    last_full_sync_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
 
 class Recommendation(SQLModel, table=True):
+    __table_args__ = (Index("ix_recommendation_generation_rank", "generation", "rank"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     book_id: int = Field(foreign_key="book.id")
     score: float = Field(default=0.0)
@@ -67,9 +129,28 @@ class Recommendation(SQLModel, table=True):
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), nullable=False),
     )
+    generation: int = Field(default=0)
+    rank: int = Field(default=0)
+
+
+class RecommendationState(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    generation: int = Field(default=0, description="Generation currently served from Recommendation")
+    stale: bool = Field(default=True)
+    stale_reason: Optional[str] = Field(default=None)
+    refreshed_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
 
 
 class LogEntry(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_logentry_created_id", "created_at", "id"),
+        Index("ix_logentry_level_created_id", "level", "created_at", "id"),
+        Index("ix_logentry_source_created_id", "source", "created_at", "id"),
+        Index("ix_logentry_level_source_created_id", "level", "source", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     level: str = Field(default="INFO")
     source: str = Field(default="backend")
@@ -81,6 +162,10 @@ class LogEntry(SQLModel, table=True):
     )
 
 
+# Reader for requests without an ``X-User-Id`` header and for feedback stored before readers existed.
+DEFAULT_USER = "default"
+
+
 class Feedback(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     book_id: int = Field(foreign_key="book.id")
@@ -90,6 +175,25 @@ class Feedback(SQLModel, table=True):
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), nullable=False),
     )
+    # Client-generated key for batched submissions, so retried batches don't double count.
+    idempotency_key: Optional[str] = Field(default=None)
+    user_id: str = Field(default=DEFAULT_USER)
+
+    __table_args__ = (
+        Index("uix_feedback_idempotency_key", "idempotency_key", unique=True),
+        Index("ix_feedback_user_book", "user_id", "book_id"),
+    )
+
+
+class TropeProfile(SQLModel, table=True):
+    """Number of library books carrying each trope.
+
+    The trope feed reads ``book_count`` from here as the frequency term of its score
+    and each reader's own feedback from ``user_state``.
+    """
+
+    trope: str = Field(primary_key=True)
+    book_count: int = Field(default=0)
 
 
 class BookTrope(SQLModel, table=True):
@@ -104,3 +208,41 @@ class BookTrope(SQLModel, table=True):
         default_factory=datetime.utcnow,
         sa_column=Column(DateTime(timezone=True), nullable=False),
     )
+
+
+class TropeExtractionCache(SQLModel, table=True):
+    """Provider output keyed by a hash of the book text, provider, model and prompt version."""
+
+    content_hash: str = Field(primary_key=True)
+    provider: str
+    model: str
+    prompt_version: int
+    tropes: List[list] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class CatalogCandidate(SQLModel, table=True):
+    """A title the trope feed can recommend; filled by the catalog importer."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    external_id: str = Field(index=True, unique=True)
+    title: str
+    author: str
+    description: Optional[str] = Field(default=None)
+    cover_url: Optional[str] = Field(default=None)
+    explanation: Optional[str] = Field(default=None)
+    imported_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
+
+
+class CatalogTrope(SQLModel, table=True):
+    """Trope membership of a catalog candidate, in the candidate's own trope order."""
+
+    candidate_id: int = Field(foreign_key="catalogcandidate.id", primary_key=True)
+    position: int = Field(primary_key=True)
+    trope: str = Field(index=True)
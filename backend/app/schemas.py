@@ -36,6 +36,9 @@ class SyncJobResponse(BaseModel):
     message: Optional[str]
     started_at: datetime
     finished_at: Optional[datetime]
+    items_processed: int = 0
+    progress: Optional[dict] = None
+    attempts: int = 0
 
 
 class BookResponse(BaseModel):
@@ -47,6 +50,19 @@ class BookResponse(BaseModel):
     reason: Optional[str]
 
 
+class BookSearchResult(BaseModel):
+    book: BookResponse
+    score: float
+    title: str = Field(description="Title with matched terms wrapped in <mark>")
+    author: str = Field(description="Author with matched terms wrapped in <mark>")
+    snippet: Optional[str] = Field(default=None, description="Description excerpt around the best match")
+
+
+class BookSearchPayload(BaseModel):
+    items: List[BookSearchResult]
+    next_cursor: Optional[str] = None
+
+
 class RecommendationResponse(BaseModel):
     id: int
     book: BookResponse
@@ -71,6 +87,20 @@ class ClientLogEntry(BaseModel):
     context: Optional[dict] = None
 
 
+class LogArchiveJobResponse(BaseModel):
+    status: str = Field(default="queued")
+    scheduled: bool = Field(default=True)
+    message: str = Field(default="Log archival job queued")
+    job_id: Optional[int] = Field(default=None)
+
+
+class CatalogImportJobResponse(BaseModel):
+    status: str = Field(default="queued")
+    scheduled: bool = Field(default=True)
+    message: str = Field(default="Catalog import job queued")
+    job_id: Optional[int] = Field(default=None)
+
+
 class FeedbackRequest(BaseModel):
     book_id: int
     reaction: str
@@ -85,12 +115,33 @@ class FeedbackResponse(BaseModel):
     created_at: datetime
 
 
+class FeedbackBatchItem(FeedbackRequest):
+    idempotency_key: str = Field(min_length=1, max_length=128, description="Client-generated; replays are ignored")
+    created_at: Optional[datetime] = Field(default=None, description="When the reaction happened on the client")
+
+
+class FeedbackBatchRequest(BaseModel):
+    items: List[FeedbackBatchItem] = Field(max_items=500)
+
+
+class FeedbackBatchResponse(BaseModel):
+    accepted: int
+    duplicates: int
+    items: List[FeedbackResponse]
+
+
 class RecommendationsPayload(BaseModel):
     items: List[RecommendationResponse]
+    next_cursor: Optional[str] = None
+
+
+class FeedCursor(BaseModel):
+    next_cursor: Optional[str] = None
 
 
 class LogsPayload(BaseModel):
     items: List[LogEntryResponse]
+    next_cursor: Optional[str] = None
 
 
 class FeedbackPayload(BaseModel):
@@ -102,6 +153,7 @@ class TropeExtractionResponse(BaseModel):
     scheduled: bool = Field(default=True)
     processed: int = Field(default=0)
     message: str = Field(default="Trope extraction job queued")
+    job_id: Optional[int] = Field(default=None)
 
 
 class TropeRecommendationResponse(BaseModel):
@@ -118,3 +170,34 @@ class TropeRecommendationResponse(BaseModel):
 
 class TropeRecommendationsPayload(BaseModel):
     items: List[TropeRecommendationResponse]
+    next_cursor: Optional[str] = None
+
+
+class EmbeddingRecommendationResponse(BaseModel):
+    id: str
+    title: str
+    author: str
+    description: Optional[str]
+    cover_url: Optional[str]
+    tropes: List[str]
+    score: float
+    similar_to: Optional[str]
+    explanation: str
+
+
+class EmbeddingRecommendationsPayload(BaseModel):
+    items: List[EmbeddingRecommendationResponse]
+
+
+class EmbeddingRebuildResponse(BaseModel):
+    status: str = Field(default="queued")
+    scheduled: bool = Field(default=True)
+    message: str = Field(default="Embedding index rebuild queued")
+    job_id: Optional[int] = Field(default=None)
+
+
+class EnrichmentJobResponse(BaseModel):
+    status: str = Field(default="queued")
+    scheduled: bool = Field(default=True)
+    message: str = Field(default="Metadata enrichment queued")
+    job_id: Optional[int] = Field(default=None)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, List, Optional
+
+from ..lazy import lazy_import
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = lazy_import("httpx")
+
+
+class AbsClient:
+    """Minimal async client for the Audiobookshelf REST API.
+
+    One pooled ``httpx.AsyncClient`` is shared by all requests; ``semaphore`` bounds
+    how many requests are in flight at once across every library being synced.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        token: str,
+        max_concurrency: int = 4,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AbsClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> dict:
+        async with self.semaphore:
+            response = await self._client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def libraries(self) -> List[dict]:
+        payload = await self._get("/api/libraries")
+        return [library for library in payload.get("libraries", []) if library.get("mediaType", "book") == "book"]
+
+    async def library_items_page(self, library_id: str, page: int, limit: int) -> dict:
+        """Return one page of items, most recently updated first."""
+
+        return await self._get(
+            f"/api/libraries/{library_id}/items",
+            params={"limit": limit, "page": page, "sort": "updatedAt", "desc": 1, "minified": 1},
+        )
+
+    def cover_url(self, item_id: str) -> str:
+        return f"{self.base_url}/api/items/{item_id}/cover"
@@ -0,0 +1,539 @@
+"""Candidate catalog for the trope feed: persisted store, streaming importer, scoring view.
+
+Catalog dumps (JSONL or CSV, optionally gzipped) are read record by record and
+written ``catalog_import_batch_size`` records per transaction, so arbitrarily large
+files import in constant memory and the writer is released between chunks.
+Records are keyed by their ``id`` in the dump; re-importing a record replaces its
+fields and tropes. Invalid records are counted and skipped.
+
+The feed scores against :class:`CandidateCatalog`, an array-backed view holding
+only candidate ids and the interned trope matrix; card fields are read from the
+database for the page being served. The view is rebuilt off the request path and
+swapped in whole: while an import is running, readers keep the previous view, and
+it is rebuilt once the import finishes.
+
+``python -m app.services.catalog_service import <file>`` imports from the command line.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import sys
+import threading
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, update
+from sqlmodel import delete, select
+
+from ..config import get_settings
+from ..database import get_async_read_session, get_read_session, get_session
+from ..lazy import lazy_import
+from ..models import CatalogCandidate, CatalogTrope, SyncJob
+from ..versioning import get_data_versions, get_data_versions_async
+from .log_service import record_log
+from .trope_index import TropeScoringIndex
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+MAX_TROPES = 20
+MAX_ERRORS = 20
+CSV_TROPE_SEPARATOR = "|"
+FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}
+
+# Seeded into an empty catalog so the demo feed has something to rank.
+TROPE_CANDIDATES = [
+    {
+        "id": "shadow-court-bargain",
+        "title": "Shadow Court Bargain",
+        "author": "Mira Lark",
+        "description": "A human negotiator is bound to a fae prince after a perilous bargain for her sister's freedom.",
+        "cover_url": "https://placehold.co/400x600?text=Shadow",
+        "tropes": ["enemies to lovers", "forbidden romance", "royal intrigue"],
+        "explanation": "This pick leans hard into the enemies-to-lovers tension and royal intrigue you keep revisiting.",
+    },
+    {
+        "id": "ashborne-vow",
+        "title": "Ashborne Vow",
+        "author": "Khalia Dusk",
+        "description": "An exiled fire mage must fake an engagement with her rival to reclaim her throne.",
+        "cover_url": "https://placehold.co/400x600?text=Ashborne",
+        "tropes": ["forced proximity", "enemies to lovers", "redemption arc"],
+        "explanation": "A fiery forced-proximity partnership that mirrors your favorite redemption arcs.",
+    },
+    {
+        "id": "celestial-threads",
+        "title": "Celestial Threads",
+        "author": "Rowan Illyr",
+        "description": "Twin seers are drafted into a celestial academy where fate knots their hearts together.",
+        "cover_url": "https://placehold.co/400x600?text=Celestial",
+        "tropes": ["magical academy", "slow burn", "found family"],
+        "explanation": "A lush academy setting with the slow-burn tension and found family comfort you crave.",
+    },
+    {
+        "id": "siren-of-the-tempest",
+        "title": "Siren of the Tempest",
+        "author": "Elara Voss",
+        "description": "A stormcaller and a pirate queen must join forces to calm a raging sea god.",
+        "cover_url": "https://placehold.co/400x600?text=Tempest",
+        "tropes": ["found family", "mates bond", "morally gray hero"],
+        "explanation": "This sea-swept adventure pairs a morally gray hero with a fated mate bond twist.",
+    },
+    {
+        "id": "gilded-sanctum",
+        "title": "Gilded Sanctum",
+        "author": "Aster Quinn",
+        "description": "A healer infiltrates a holy order and discovers her soulmate among the sworn protectors.",
+        "cover_url": "https://placehold.co/400x600?text=Sanctum",
+        "tropes": ["mates bond", "forbidden romance", "slow burn"],
+        "explanation": "Sweeping forbidden romance with a patient slow burn and undeniable soulmate pull.",
+    },
+]
+
+
+@dataclass
+class ImportReport:
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    invalid: int = 0
+    # The first MAX_ERRORS problems, as "line N: reason".
+    errors: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "invalid": self.invalid,
+            "errors": list(self.errors),
+        }
+
+
+def _text(record: Mapping, key: str, required: bool = False, limit: int = 10_000) -> Optional[str]:
+    value = record.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"missing {key}")
+        return None
+    if not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise ValueError(f"{key} must be a string")
+    value = str(value).strip()
+    if len(value) > limit:
+        raise ValueError(f"{key} is longer than {limit} characters")
+    return value
+
+
+def _tropes(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(CSV_TROPE_SEPARATOR)
+    if not isinstance(value, list):
+        raise ValueError("tropes must be a list")
+    tropes: List[str] = []
+    for trope in value:
+        if not isinstance(trope, str):
+            raise ValueError("tropes must be strings")
+        trope = " ".join(trope.lower().split())
+        if trope and trope not in tropes:
+            tropes.append(trope)
+    if not tropes:
+        raise ValueError("missing tropes")
+    if len(tropes) > MAX_TROPES:
+        raise ValueError(f"more than {MAX_TROPES} tropes")
+    return tropes
+
+
+def validate_record(record) -> Tuple[dict, List[str]]:
+    """Return ``(candidate fields, tropes)`` for one dump record; raises ``ValueError``."""
+
+    if not isinstance(record, Mapping):
+        raise ValueError("record must be an object")
+    fields = {
+        "external_id": _text(record, "id", required=True, limit=255),
+        "title": _text(record, "title", required=True, limit=1000),
+        "author": _text(record, "author", required=True, limit=1000),
+        "description": _text(record, "description"),
+        "cover_url": _text(record, "cover_url", limit=2000),
+        "explanation": _text(record, "explanation"),
+    }
+    return fields, _tropes(record.get("tropes"))
+
+
+def _format(path: Path, fmt: Optional[str]) -> str:
+    if fmt:
+        if fmt not in set(FORMATS.values()):
+            raise ValueError(f"Unknown catalog format: {fmt}")
+        return fmt
+    suffixes = [suffix for suffix in path.suffixes if suffix != ".gz"]
+    if not suffixes or suffixes[-1] not in FORMATS:
+        raise ValueError(f"Cannot tell the catalog format of {path.name}; pass jsonl or csv")
+    return FORMATS[suffixes[-1]]
+
+
+def read_records(path: Path, fmt: Optional[str] = None) -> Iterator[Tuple[int, object]]:
+    """Yield ``(line number, record)`` from a JSONL or CSV dump, one record at a time.
+
+    A JSONL line that does not parse is yielded as a :class:`ValueError` so the
+    importer can count it with the other invalid records.
+    """
+
+    fmt = _format(path, fmt)
+    raw = gzip.open(path, "rb") if path.suffix == ".gz" else open(path, "rb")
+    with io.TextIOWrapper(raw, encoding="utf-8", newline="") as handle:
+        if fmt == "csv":
+            reader = csv.DictReader(handle)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as exc:
+                yield line_number, ValueError(f"invalid JSON ({exc.msg})")
+
+
+def _write_chunk(chunk: Dict[str, Tuple[dict, List[str]]], imported_at: datetime) -> Tuple[int, int]:
+    """Upsert one chunk of candidates and replace their tropes; returns ``(inserted, updated)``."""
+
+    with get_session() as session:
+        ids = dict(
+            session.exec(
+                select(CatalogCandidate.external_id, CatalogCandidate.id).where(
+                    CatalogCandidate.external_id.in_(list(chunk))
+                )
+            ).all()
+        )
+        updates = [{"id": ids[key], **fields, "imported_at": imported_at} for key, (fields, _) in chunk.items() if key in ids]
+        inserts = [{**fields, "imported_at": imported_at} for key, (fields, _) in chunk.items() if key not in ids]
+        if updates:
+            session.execute(update(CatalogCandidate), updates)
+            session.exec(delete(CatalogTrope).where(CatalogTrope.candidate_id.in_([row["id"] for row in updates])))
+        if inserts:
+            returned = session.execute(
+                insert(CatalogCandidate).returning(CatalogCandidate.external_id, CatalogCandidate.id), inserts
+            )
+            ids.update(returned.tuples().all())
+        session.execute(
+            insert(CatalogTrope),
+            [
+                {"candidate_id": ids[key], "position": position, "trope": trope}
+                for key, (_, tropes) in chunk.items()
+                for position, trope in enumerate(tropes)
+            ],
+        )
+    return len(inserts), len(updates)
+
+
+def import_records(
+    records: Iterable[Tuple[int, object]],
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Validate and write ``(line number, record)`` pairs chunk by chunk.
+
+    Each chunk is its own transaction; ``progress`` is called after every chunk with
+    the running totals. A record repeated within a chunk keeps its last version.
+    Scoring view rebuilds wait until the whole import has been written.
+    """
+
+    global _imports
+    with _catalog_lock:
+        _imports += 1
+    try:
+        report = _import_records(records, chunk_size, progress)
+    finally:
+        with _catalog_lock:
+            _imports -= 1
+    if _catalog is not None:
+        refresh_candidate_catalog()
+    return report
+
+
+def _import_records(
+    records: Iterable[Tuple[int, object]],
+    chunk_size: Optional[int],
+    progress: Optional[Callable[[ImportReport], None]],
+) -> ImportReport:
+
+    chunk_size = max(1, chunk_size or get_settings().catalog_import_batch_size)
+    report = ImportReport()
+    imported_at = datetime.utcnow()
+    chunk: Dict[str, Tuple[dict, List[str]]] = {}
+
+    def flush() -> None:
+        inserted, updated = _write_chunk(chunk, imported_at)
+        report.inserted += inserted
+        report.updated += updated
+        chunk.clear()
+        if progress is not None:
+            progress(report)
+
+    for line_number, record in records:
+        report.read += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            fields, tropes = validate_record(record)
+        except ValueError as exc:
+            report.invalid += 1
+            if len(report.errors) < MAX_ERRORS:
+                report.errors.append(f"line {line_number}: {exc}")
+            continue
+        chunk.pop(fields["external_id"], None)
+        chunk[fields["external_id"]] = (fields, tropes)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
+
+
+def import_catalog(
+    path: Path,
+    fmt: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Stream a JSONL/CSV catalog dump into the candidate tables."""
+
+    report = import_records(read_records(Path(path), fmt), chunk_size, progress)
+    record_log("INFO", "Catalog import completed", source="catalog", context={"file": Path(path).name, **report.as_dict()})
+    return report
+
+
+def resolve_import_path(name: str) -> Path:
+    """Resolve a dump name inside ``catalog_import_dir``; raises ``ValueError`` outside it."""
+
+    directory = Path(get_settings().catalog_import_dir).resolve()
+    path = (directory / name).resolve()
+    if directory not in path.parents or not path.is_file():
+        raise ValueError(f"Catalog file not found: {name}")
+    return path
+
+
+def run_catalog_import_job(job: SyncJob) -> str:
+    """Queue handler for ``catalog_import`` jobs; ``payload["file"]`` names a dump in the import dir."""
+
+    payload = job.payload or {}
+    path = resolve_import_path(payload["file"])
+
+    def record_progress(report: ImportReport) -> None:
+        with get_session() as session:
+            row = session.get(SyncJob, job.id)
+            if row is not None:
+                row.progress = report.as_dict()
+                row.items_processed = report.inserted + report.updated
+                row.message = f"Imported {row.items_processed} catalog candidates"
+                session.add(row)
+
+    report = import_catalog(path, payload.get("format"), progress=record_progress)
+    return (
+        f"Imported {report.inserted + report.updated} catalog candidates "
+        f"({report.inserted} new, {report.updated} updated, {report.invalid} invalid)"
+    )
+
+
+class CandidateCatalog:
+    """Array-backed view of the catalog used for scoring.
+
+    Row ``n`` of :attr:`index` is the candidate with the ``n``-th smallest id, so
+    ranking ties in catalog order fall back to id order and survive imports.
+    """
+
+    def __init__(self, ids: np.ndarray, index: TropeScoringIndex) -> None:
+        self.ids = ids
+        self.index = index
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    def candidate_id(self, row: int) -> int:
+        return int(self.ids[row])
+
+    def row_before(self, candidate_id: int) -> int:
+        """The last row whose id is at most ``candidate_id`` (``-1`` if none)."""
+
+        return int(np.searchsorted(self.ids, candidate_id, side="right")) - 1
+
+    def load(self, rows: Sequence[int]) -> Dict[int, CatalogCandidate]:
+        """Fetch the stored fields of the candidates at ``rows``, keyed by row."""
+
+        wanted = {self.candidate_id(row): row for row in rows}
+        if not wanted:
+            return {}
+        with get_read_session() as session:
+            found = session.exec(select(CatalogCandidate).where(CatalogCandidate.id.in_(list(wanted))))
+            return {wanted[candidate.id]: candidate for candidate in found}
+
+    async def load_async(self, rows: Sequence[int]) -> Dict[int, CatalogCandidate]:
+        """Async variant of :meth:`load` on the async read pool."""
+
+        wanted = {self.candidate_id(row): row for row in rows}
+        if not wanted:
+            return {}
+        async with get_async_read_session() as session:
+            found = await session.exec(select(CatalogCandidate).where(CatalogCandidate.id.in_(list(wanted))))
+            return {wanted[candidate.id]: candidate for candidate in found}
+
+
+def _build_catalog() -> CandidateCatalog:
+    with get_read_session() as session:
+        ids = np.fromiter(session.exec(select(CatalogCandidate.id).order_by(CatalogCandidate.id)), dtype=np.int64)
+        owners = array("q")
+        columns = array("i")
+        trope_ids = array("i")
+        interned: Dict[str, int] = {}
+        for candidate_id, position, trope in session.exec(
+            select(CatalogTrope.candidate_id, CatalogTrope.position, CatalogTrope.trope)
+        ):
+            owners.append(candidate_id)
+            columns.append(position)
+            trope_ids.append(interned.setdefault(trope, len(interned)))
+    rows = np.searchsorted(ids, np.frombuffer(owners, dtype=np.int64)) if owners else np.zeros(0, dtype=np.int64)
+    index = TropeScoringIndex.from_arrays(len(ids), rows, columns, trope_ids, list(interned))
+    return CandidateCatalog(ids, index)
+
+
+def _seed_catalog() -> None:
+    import_records(enumerate(TROPE_CANDIDATES, start=1))
+
+
+_catalog: Optional[Tuple[int, CandidateCatalog]] = None
+# Guards the swap of ``_catalog`` and the bookkeeping below; never held while building.
+_catalog_lock = threading.Lock()
+# Serializes builds. Reentrant because seeding an empty catalog imports records.
+_build_lock = threading.RLock()
+_rebuilding = False
+_imports = 0
+
+
+def _import_running() -> bool:
+    """Whether an import is writing the catalog, here or in another worker."""
+
+    if _imports:
+        return True
+    with get_read_session() as session:
+        running = session.exec(
+            select(SyncJob.id)
+            .where(
+                SyncJob.job_type == "catalog_import",
+                SyncJob.status == "running",
+                SyncJob.lease_expires_at >= datetime.utcnow(),
+            )
+            .limit(1)
+        ).first()
+    return running is not None
+
+
+def refresh_candidate_catalog() -> CandidateCatalog:
+    """Build the view for the current ``catalogtrope`` version and swap it in.
+
+    An empty catalog is seeded with the demo candidates first. The build runs
+    outside ``_catalog_lock``, so readers keep the previous view until the swap.
+    """
+
+    global _catalog
+    with _build_lock:
+        version = get_data_versions(["catalogtrope"])["catalogtrope"]
+        current = _catalog
+        if current is not None and current[0] == version:
+            return current[1]
+        if version == 0:
+            with get_read_session() as session:
+                empty = session.exec(select(CatalogCandidate.id).limit(1)).first() is None
+            if empty:
+                _seed_catalog()
+                version = get_data_versions(["catalogtrope"])["catalogtrope"]
+        catalog = _build_catalog()
+        with _catalog_lock:
+            _catalog = (version, catalog)
+        return catalog
+
+
+def _rebuild_in_background() -> None:
+    global _rebuilding
+    try:
+        refresh_candidate_catalog()
+    except Exception as exc:
+        record_log("ERROR", "Candidate catalog rebuild failed", source="catalog", context={"error": str(exc)})
+    finally:
+        with _catalog_lock:
+            _rebuilding = False
+
+
+def _schedule_rebuild() -> None:
+    global _rebuilding
+    with _catalog_lock:
+        if _rebuilding:
+            return
+        _rebuilding = True
+    threading.Thread(target=_rebuild_in_background, name="catalog-rebuild", daemon=True).start()
+
+
+def get_candidate_catalog() -> CandidateCatalog:
+    """Return the scoring view.
+
+    Only the first call builds inline. Once a view exists, a moved ``catalogtrope``
+    version starts one background rebuild, unless an import is still running, and
+    the current view is served until the new one is swapped in.
+    """
+
+    current = _catalog
+    if current is None:
+        return refresh_candidate_catalog()
+    if current[0] != get_data_versions(["catalogtrope"])["catalogtrope"] and not _import_running():
+        _schedule_rebuild()
+    return current[1]
+
+
+async def get_candidate_catalog_async() -> CandidateCatalog:
+    """Async variant of :func:`get_candidate_catalog`.
+
+    The version check runs on the async read pool; only the first build and the
+    import check behind a stale view go to a thread.
+    """
+
+    version = (await get_data_versions_async(["catalogtrope"]))["catalogtrope"]
+    current = _catalog
+    if current is not None and current[0] == version:
+        return current[1]
+    return await asyncio.to_thread(get_candidate_catalog)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import a candidate catalog dump.")
+    parser.add_argument("command", choices=("import",))
+    parser.add_argument("file", type=Path, help="JSONL or CSV dump, optionally gzipped.")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), default=None)
+    parser.add_argument("--chunk-size", type=int, default=None, help="Override CATALOG_IMPORT_BATCH_SIZE.")
+    args = parser.parse_args(argv)
+
+    from ..database import create_db_and_tables
+
+    create_db_and_tables()
+
+    def show(report: ImportReport) -> None:
+        print(f"\r{report.read} read, {report.inserted} new, {report.updated} updated, {report.invalid} invalid", end="")
+
+    report = import_catalog(args.file, args.format, args.chunk_size, progress=show)
+    print()
+    for error in report.errors:
+        print(error, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Cover image proxy backed by a size-bounded, content-addressed disk cache.
+
+A cover is fetched from its upstream ``cover_url`` once, resized to every width in
+:data:`COVER_SIZES` and stored under the SHA-256 of each variant's bytes, so an
+image shared by several books is kept once. A small ref file per upstream URL
+points at its variants. Serving a variant bumps its mtime; once the cached images
+exceed ``cover_cache_max_bytes`` the least recently served are deleted, and a ref
+whose image was deleted is fetched again on next use.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+
+from .. import metrics
+from ..config import get_settings
+from ..database import get_async_read_session
+from ..lazy import lazy_import
+from ..models import Book, CatalogCandidate
+from .log_service import record_log
+from .settings_service import get_app_settings
+
+if TYPE_CHECKING:
+    import httpx
+    from PIL import Image
+else:
+    httpx = lazy_import("httpx")
+    Image = lazy_import("PIL.Image")
+
+# Variant name -> maximum width in pixels.
+COVER_SIZES: Dict[str, int] = {"thumb": 160, "card": 480}
+DEFAULT_SIZE = "card"
+JPEG_QUALITY = 82
+
+Variants = Dict[str, Tuple[bytes, str]]
+
+
+@dataclass(frozen=True)
+class CoverVariant:
+    digest: str
+    content_type: str
+    path: Path
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+def _staged(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+class CoverCache:
+    """Content-addressed image store on disk, trimmed least recently served first."""
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._nbytes: Optional[int] = None
+        self.evictions = 0
+
+    def _ref_path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / "refs" / digest[:2] / f"{digest}.json"
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.directory / "blobs" / digest[:2] / digest
+
+    def _blobs(self) -> Iterator[Tuple[Path, os.stat_result]]:
+        for path in (self.directory / "blobs").glob("*/*"):
+            if not path.name.endswith(".tmp"):
+                try:
+                    yield path, path.stat()
+                except OSError:
+                    continue
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            if self._nbytes is None:
+                self._nbytes = sum(stat.st_size for _, stat in self._blobs())
+            return self._nbytes
+
+    def get(self, url: str, size: str) -> Optional[CoverVariant]:
+        try:
+            entry = json.loads(self._ref_path(url).read_text())["variants"][size]
+        except (OSError, ValueError, KeyError):
+            return None
+        path = self._blob_path(entry["digest"])
+        try:
+            os.utime(path)
+        except OSError:  # evicted since the ref was written
+            return None
+        return CoverVariant(digest=entry["digest"], content_type=entry["content_type"], path=path)
+
+    def put(self, url: str, variants: Variants) -> None:
+        added = 0
+        refs = {}
+        for size, (data, content_type) in variants.items():
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._blob_path(digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                staged = _staged(path)
+                staged.write_bytes(data)
+                os.replace(staged, path)
+                added += len(data)
+            refs[size] = {"digest": digest, "content_type": content_type}
+        ref = self._ref_path(url)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        staged = _staged(ref)
+        staged.write_text(json.dumps({"url": url, "variants": refs}))
+        os.replace(staged, ref)
+        with self._lock:
+            if self._nbytes is not None:
+                self._nbytes += added
+        if self.nbytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            # Rescan: other processes share the directory, so the running total drifts.
+            blobs = sorted(self._blobs(), key=lambda item: item[1].st_mtime)
+            total = sum(stat.st_size for _, stat in blobs)
+            for path, stat in blobs:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= stat.st_size
+                self.evictions += 1
+                metrics.COVER_CACHE_EVICTIONS.inc()
+            self._nbytes = total
+
+
+_cache: Optional[CoverCache] = None
+_cache_lock = threading.Lock()
+# One upstream fetch per URL at a time; waiters reuse the stored result.
+_fetch_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def get_cover_cache() -> CoverCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = get_settings()
+            _cache = CoverCache(Path(settings.cover_cache_dir), settings.cover_cache_max_bytes)
+        return _cache
+
+
+def resize_cover(data: bytes, content_type: str) -> Variants:
+    """Return every :data:`COVER_SIZES` variant of an image; raises ``ValueError`` if unreadable.
+
+    Images already narrower than a size are kept as they are. Resized variants are
+    JPEG, or PNG when the image has transparency.
+    """
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            variants: Variants = {}
+            for size, width in COVER_SIZES.items():
+                if image.width <= width:
+                    variants[size] = (data, content_type)
+                    continue
+                resized = image.copy()
+                resized.thumbnail((width, width * 4))
+                buffer = io.BytesIO()
+                if resized.mode in ("RGBA", "LA") or "transparency" in resized.info:
+                    resized.save(buffer, format="PNG", optimize=True)
+                    variants[size] = (buffer.getvalue(), "image/png")
+                else:
+                    resized.convert("RGB").save(
+                        buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True
+                    )
+                    variants[size] = (buffer.getvalue(), "image/jpeg")
+            return variants
+    except (OSError, Image.DecompressionBombError) as exc:
+        raise ValueError("Cover is not a readable image") from exc
+
+
+def _auth_headers(url: str) -> Dict[str, str]:
+    # Audiobookshelf serves covers only to authenticated clients.
+    snapshot = get_app_settings()
+    if snapshot.abs_url and snapshot.abs_token and url.startswith(snapshot.abs_url.rstrip("/") + "/"):
+        return {"Authorization": f"Bearer {snapshot.abs_token}"}
+    return {}
+
+
+async def _download(http: httpx.AsyncClient, url: str) -> Tuple[bytes, str]:
+    limit = get_settings().cover_max_source_bytes
+    async with http.stream("GET", url, headers=_auth_headers(url)) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if not content_type.startswith("image/"):
+            raise ValueError(f"Cover URL returned {content_type or 'no content type'}, not an image")
+        data = bytearray()
+        async for chunk in response.aiter_bytes():
+            data.extend(chunk)
+            if len(data) > limit:
+                raise ValueError(f"Cover is larger than {limit} bytes")
+    return bytes(data), content_type
+
+
+def _client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(timeout=get_settings().cover_fetch_timeout, follow_redirects=True, transport=transport)
+
+
+async def _fetch(http: httpx.AsyncClient, url: str, size: str = DEFAULT_SIZE) -> bool:
+    """Fetch and cache ``url`` unless its ``size`` variant is already cached; returns whether it fetched."""
+
+    cache = get_cover_cache()
+    lock = _fetch_locks.setdefault(url, asyncio.Lock())
+    async with lock:
+        if cache.get(url, size) is not None:
+            return False
+        try:
+            data, content_type = await _download(http, url)
+        except httpx.HTTPError as exc:
+            raise ValueError(f"Could not fetch cover: {exc}") from exc
+        variants = await asyncio.to_thread(resize_cover, data, content_type)
+        await asyncio.to_thread(cache.put, url, variants)
+    return True
+
+
+async def _source_urls(kind: str, keys: Sequence[str]) -> Dict[str, str]:
+    """``{key: cover_url}`` for the books (by id) or catalog candidates (by external id) that have one."""
+
+    async with get_async_read_session() as session:
+        if kind == "book":
+            ids = [int(key) for key in keys if key.isdigit()]
+            statement = select(Book.id, Book.cover_url).where(Book.id.in_(ids), Book.cover_url.is_not(None))
+        else:
+            statement = select(CatalogCandidate.external_id, CatalogCandidate.cover_url).where(
+                CatalogCandidate.external_id.in_(list(keys)), CatalogCandidate.cover_url.is_not(None)
+            )
+        rows = (await session.exec(statement)).all()
+    return {str(key): url for key, url in rows if url}
+
+
+async def get_cover(
+    kind: str, key: str, size: str = DEFAULT_SIZE, transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Optional[CoverVariant]:
+    """Return the cached ``size`` variant of an item's cover, fetching it on first use.
+
+    Returns ``None`` when the item has no cover; raises ``ValueError`` when the
+    upstream image cannot be fetched or decoded.
+    """
+
+    url = (await _source_urls(kind, [key])).get(key)
+    if url is None:
+        return None
+    cache = get_cover_cache()
+    variant = cache.get(url, size)
+    if variant is not None:
+        metrics.COVER_LOOKUPS.inc(result="hit")
+        return variant
+    metrics.COVER_LOOKUPS.inc(result="miss")
+    async with _client(transport) as http:
+        await _fetch(http, url, size)
+    return cache.get(url, size)
+
+
+async def warm_covers(urls: Sequence[str], transport: Optional[httpx.AsyncBaseTransport] = None) -> int:
+    """Fetch the upstream covers in ``urls`` that are not cached yet; returns how many were fetched.
+
+    The feeds pass the cover URLs of the page after the one they served, read in
+    the same query, and this runs as a background task once the response is sent.
+    Failures are logged and skipped so one bad upstream image does not stop the rest.
+    """
+
+    cache = get_cover_cache()
+    missing = sorted({url for url in urls if cache.get(url, DEFAULT_SIZE) is None})
+    if not missing:
+        return 0
+    semaphore = asyncio.Semaphore(max(1, get_settings().cover_prefetch_concurrency))
+    failed: List[str] = []
+
+    async with _client(transport) as http:
+
+        async def warm(url: str) -> bool:
+            async with semaphore:
+                try:
+                    return await _fetch(http, url)
+                except ValueError:
+                    failed.append(url)
+                    return False
+
+        fetched = sum(await asyncio.gather(*(warm(url) for url in missing)))
+    metrics.COVER_LOOKUPS.inc(fetched, result="prefetch")
+    if failed:
+        record_log("WARNING", "Cover prefetch skipped images", source="covers", context={"urls": failed[:10]})
+    return fetched
+
+
+def collect_cover_metrics() -> None:
+    if _cache is not None:
+        metrics.COVER_CACHE_BYTES.set(_cache.nbytes)
@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_read_session
+from ..lazy import lazy_import
+from ..models import Book, CatalogCandidate, CatalogTrope, SyncJob
+from ..schemas import EmbeddingRecommendationResponse
+from ..versioning import get_data_versions
+from .catalog_service import get_candidate_catalog
+from .log_service import record_log
+from .settings_service import get_app_settings
+from .vector_index import VectorIndex, VectorStore
+
+if TYPE_CHECKING:
+    import httpx
+    import numpy as np
+else:
+    httpx = lazy_import("httpx")
+    np = lazy_import("numpy")
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+# Catalog candidates read and embedded per step when building the candidate store.
+EMBED_CHUNK = 1000
+
+
+class EmbeddingProvider(Protocol):
+    name: str
+    model: str
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return an ``len(texts) x dim`` float32 matrix of L2-normalized vectors."""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class HashingEmbeddingProvider:
+    """Deterministic offline embeddings from hashed unigrams and bigrams.
+
+    Token counts are sublinearly scaled (``1 + log tf``) and folded into a fixed
+    number of signed buckets, so vectors are stable across processes and machines.
+    """
+
+    name = "local"
+
+    def __init__(self, dimensions: int = 256) -> None:
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> Counter:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dimensions] += sign * (1.0 + math.log(count))
+        return _normalize(vectors)
+
+
+class OpenAIEmbeddingProvider:
+    name = "openai"
+
+    def __init__(self, model: str, api_key: str, batch_size: int = 256) -> None:
+        self.model = model
+        self.api_key = api_key
+        self.batch_size = batch_size
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows: List[List[float]] = []
+        with httpx.Client(base_url="https://api.openai.com/v1", timeout=30.0) as client:
+            for start in range(0, len(texts), self.batch_size):
+                response = client.post(
+                    "/embeddings",
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    json={"model": self.model, "input": list(texts[start : start + self.batch_size])},
+                )
+                response.raise_for_status()
+                data = sorted(response.json()["data"], key=lambda item: item["index"])
+                rows.extend(item["embedding"] for item in data)
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+def get_embedding_provider(name: Optional[str] = None, model: Optional[str] = None) -> EmbeddingProvider:
+    """Resolve the configured provider, falling back to local hashing when offline."""
+
+    snapshot = get_app_settings()
+    settings = get_settings()
+    name = name or snapshot.embedding_provider
+    model = model or snapshot.embedding_model
+    if name == "openai" and settings.openai_api_key and not snapshot.demo_mode:
+        return OpenAIEmbeddingProvider(model=model, api_key=settings.openai_api_key)
+    return HashingEmbeddingProvider(dimensions=settings.embedding_dimensions)
+
+
+def _book_text(book: Book) -> str:
+    return " ".join(part for part in (book.title, book.author, book.description) if part)
+
+
+def _candidate_text(candidate: CatalogCandidate, tropes: Sequence[str]) -> str:
+    parts = [candidate.title, candidate.author, candidate.description or ""]
+    return " ".join(parts + list(tropes))
+
+
+def _fingerprint(provider: EmbeddingProvider, keys: Sequence) -> str:
+    digest = hashlib.sha1(f"{provider.name}:{provider.model}".encode("utf-8"))
+    for key in keys:
+        digest.update(str(key).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+_index_cache: Dict[Tuple[str, str], Tuple[VectorStore, VectorIndex]] = {}
+_index_lock = threading.Lock()
+
+
+def _store_dir(name: str) -> Path:
+    return Path(get_settings().embedding_store_dir) / name
+
+
+def _load_index(name: str, fingerprint: str) -> Optional[Tuple[VectorStore, VectorIndex]]:
+    cached = _index_cache.get((name, fingerprint))
+    if cached:
+        return cached
+    store = VectorStore.open(_store_dir(name))
+    if store is None or store.fingerprint != fingerprint:
+        return None
+    settings = get_settings()
+    index = VectorIndex(
+        store.vectors,
+        mode=settings.embedding_index_mode,
+        ivf_threshold=settings.embedding_ivf_threshold,
+        nprobe=settings.embedding_ivf_probes,
+    )
+    _index_cache[(name, fingerprint)] = (store, index)
+    return store, index
+
+
+def _ensure_index(
+    name: str,
+    provider: EmbeddingProvider,
+    keys: Sequence,
+    texts: Callable[[], Iterable[List[str]]],
+    force: bool = False,
+    fingerprint_parts: Optional[Sequence] = None,
+) -> Tuple[VectorStore, VectorIndex]:
+    """Load the named store, or rebuild it when its fingerprint is stale.
+
+    ``texts`` yields the text of ``keys`` in order, in chunks; each chunk is
+    embedded and written before the next is read.
+    """
+
+    fingerprint = _fingerprint(provider, fingerprint_parts if fingerprint_parts is not None else keys)
+    with _index_lock:
+        loaded = None if force else _load_index(name, fingerprint)
+        if loaded:
+            return loaded
+        VectorStore.write_chunks(
+            _store_dir(name),
+            len(keys),
+            (provider.embed(chunk) for chunk in texts() if chunk),
+            keys,
+            {"provider": provider.name, "model": provider.model, "fingerprint": fingerprint},
+        )
+        for key in [key for key in _index_cache if key[0] == name]:
+            del _index_cache[key]
+        return _load_index(name, fingerprint)
+
+
+# (``book`` data version, book ids, digest of their embedded text)
+_book_digest: Optional[Tuple[int, List[int], str]] = None
+
+
+def _book_fingerprint() -> Tuple[List[int], str]:
+    """Book ids and a digest of their embedded text.
+
+    The text is re-read only when the ``book`` data version moved, so sync and
+    enrichment edits invalidate the store without each request reading every
+    description; books whose text did not change keep the same digest.
+    """
+
+    global _book_digest
+    version = get_data_versions(["book"])["book"]
+    cached = _book_digest
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    keys: List[int] = []
+    digest = hashlib.sha1()
+    with get_read_session() as session:
+        for book in session.exec(select(Book).order_by(Book.id)):
+            keys.append(book.id)
+            digest.update(f"{book.id}\0{_book_text(book)}\0".encode("utf-8"))
+    _book_digest = (version, keys, digest.hexdigest())
+    return keys, _book_digest[2]
+
+
+def _book_index(provider: EmbeddingProvider, force: bool = False) -> Tuple[VectorStore, VectorIndex]:
+    keys, text_digest = _book_fingerprint()
+
+    def texts() -> Iterator[List[str]]:
+        with get_read_session() as session:
+            books = {book.id: book for book in session.exec(select(Book))}
+        yield [_book_text(books[key]) if key in books else "" for key in keys]
+
+    return _ensure_index("books", provider, keys, texts, force, fingerprint_parts=[text_digest])
+
+
+def _candidate_index(provider: EmbeddingProvider, force: bool = False) -> Tuple[VectorStore, VectorIndex]:
+    """Vectors of every :class:`CatalogCandidate`, keyed by candidate id.
+
+    The store is fingerprinted by the ``catalogcandidate`` data version, which every
+    import chunk bumps, so it is rebuilt after the catalog changes and candidates
+    are read and embedded :data:`EMBED_CHUNK` at a time.
+    """
+
+    get_candidate_catalog()  # seeds the demo candidates into an empty catalog
+    version = get_data_versions(["catalogcandidate"])["catalogcandidate"]
+    with get_read_session() as session:
+        keys = list(session.exec(select(CatalogCandidate.id).order_by(CatalogCandidate.id)))
+
+    def texts() -> Iterator[List[str]]:
+        for start in range(0, len(keys), EMBED_CHUNK):
+            chunk = keys[start : start + EMBED_CHUNK]
+            candidates, tropes = _load_candidates(chunk)
+            yield [
+                _candidate_text(candidates[key], tropes.get(key, [])) if key in candidates else "" for key in chunk
+            ]
+
+    parts = ["catalogcandidate", version, len(keys), keys[-1] if keys else 0]
+    return _ensure_index("candidates", provider, keys, texts, force, fingerprint_parts=parts)
+
+
+def _load_candidates(ids: Sequence[int]) -> Tuple[Dict[int, CatalogCandidate], Dict[int, List[str]]]:
+    """Candidates by id and their tropes in the candidate's own order."""
+
+    tropes: Dict[int, List[str]] = defaultdict(list)
+    with get_read_session() as session:
+        candidates = {
+            candidate.id: candidate
+            for candidate in session.exec(select(CatalogCandidate).where(CatalogCandidate.id.in_(list(ids))))
+        }
+        for candidate_id, trope in session.exec(
+            select(CatalogTrope.candidate_id, CatalogTrope.trope)
+            .where(CatalogTrope.candidate_id.in_(list(ids)))
+            .order_by(CatalogTrope.candidate_id, CatalogTrope.position)
+        ):
+            tropes[candidate_id].append(trope)
+    return candidates, dict(tropes)
+
+
+def rebuild_embeddings(force: bool = True) -> int:
+    """Embed the library and candidate catalog into their on-disk vector stores."""
+
+    provider = get_embedding_provider()
+    book_store, _ = _book_index(provider, force)
+    candidate_store, _ = _candidate_index(provider, force)
+    record_log(
+        "INFO",
+        "Embedding index rebuilt",
+        source="embedding-engine",
+        context={
+            "provider": provider.name,
+            "model": provider.model,
+            "books": len(book_store.ids),
+            "candidates": len(candidate_store.ids),
+        },
+    )
+    return len(book_store.ids) + len(candidate_store.ids)
+
+
+def run_embedding_rebuild_job(job: SyncJob) -> str:
+    """Queue handler for ``embedding_rebuild`` jobs."""
+
+    return f"Embedded {rebuild_embeddings(force=True)} vectors"
+
+
+def get_embedding_recommendations(limit: int = 10) -> List[EmbeddingRecommendationResponse]:
+    """Rank catalog candidates by cosine similarity to the library's mean vector."""
+
+    provider = get_embedding_provider()
+    book_store, book_index = _book_index(provider)
+    if not len(book_index):
+        return []
+    candidate_store, candidate_index = _candidate_index(provider)
+    profile = np.asarray(book_store.vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        return []
+    matches = candidate_index.search(profile / norm, limit)
+
+    candidates, tropes = _load_candidates([candidate_store.ids[row] for row, _ in matches])
+    nearest_books = {}
+    for row, _ in matches:
+        nearest = book_index.search(np.asarray(candidate_store.vectors[row]), 1)
+        if nearest:
+            nearest_books[row] = book_store.ids[nearest[0][0]]
+    with get_read_session() as session:
+        titles = dict(
+            session.exec(select(Book.id, Book.title).where(Book.id.in_(set(nearest_books.values())))).all()
+        )
+    results: List[EmbeddingRecommendationResponse] = []
+    for row, score in matches:
+        candidate = candidates.get(candidate_store.ids[row])
+        if candidate is None:  # removed since the store was built
+            continue
+        nearest_title = titles.get(nearest_books.get(row))
+        explanation = (
+            f"Reads a lot like {nearest_title} from your library."
+            if nearest_title
+            else candidate.explanation or "Close in tone and theme to the books in your library."
+        )
+        results.append(
+            EmbeddingRecommendationResponse(
+                id=candidate.external_id,
+                title=candidate.title,
+                author=candidate.author,
+                description=candidate.description,
+                cover_url=candidate.cover_url,
+                tropes=tropes.get(candidate.id, []),
+                score=round(max(0.0, score) * 100, 2),
+                similar_to=nearest_title,
+                explanation=explanation,
+            )
+        )
+
+    record_log(
+        "INFO",
+        "Generated embedding-based recommendations",
+        source="embedding-engine",
+        context={"results": len(results), "mode": candidate_index.mode},
+    )
+    return results
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..lazy import lazy_import
+from ..models import Book, SyncJob
+from .http_cache import CachedHttpClient, ResponseCache, TokenBucket
+from .log_service import record_log
+from .settings_service import get_app_settings
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = lazy_import("httpx")
+
+GOOGLE_BOOKS_URL = "https://www.googleapis.com/books/v1/volumes"
+OPEN_LIBRARY_URL = "https://openlibrary.org/search.json"
+OPEN_LIBRARY_COVER_URL = "https://covers.openlibrary.org/b/id/{cover_id}-L.jpg"
+
+
+def _lookup(book: dict) -> Tuple[Optional[str], str]:
+    isbn = ((book.get("book_metadata") or {}).get("abs") or {}).get("isbn")
+    isbn = "".join(ch for ch in isbn if ch.isalnum()) if isbn else None
+    return isbn, f"{book['title'].strip().lower()}|{book['author'].strip().lower()}"
+
+
+async def _google_books(http: CachedHttpClient, book: dict, api_key: Optional[str]) -> Optional[dict]:
+    isbn, title_author = _lookup(book)
+    query = f"isbn:{isbn}" if isbn else f'intitle:"{book["title"]}" inauthor:"{book["author"]}"'
+    params = {"q": query, "maxResults": 1, "printType": "books"}
+    if api_key:
+        params["key"] = api_key
+    body = await http.get_json(f"google:{isbn or title_author}", GOOGLE_BOOKS_URL, params)
+    items = (body or {}).get("items") or []
+    if not items:
+        return None
+    info = items[0].get("volumeInfo") or {}
+    images = info.get("imageLinks") or {}
+    cover = images.get("thumbnail") or images.get("smallThumbnail")
+    return {
+        "id": items[0].get("id"),
+        "description": info.get("description"),
+        "cover_url": cover.replace("http://", "https://") if cover else None,
+        "categories": info.get("categories") or [],
+        "published_date": info.get("publishedDate"),
+        "page_count": info.get("pageCount"),
+        "average_rating": info.get("averageRating"),
+    }
+
+
+async def _open_library(http: CachedHttpClient, book: dict) -> Optional[dict]:
+    isbn, title_author = _lookup(book)
+    params = {"limit": 1, "fields": "key,title,author_name,first_publish_year,subject,cover_i,number_of_pages_median"}
+    if isbn:
+        params["isbn"] = isbn
+    else:
+        params.update({"title": book["title"], "author": book["author"]})
+    body = await http.get_json(f"openlibrary:{isbn or title_author}", OPEN_LIBRARY_URL, params)
+    docs = (body or {}).get("docs") or []
+    if not docs:
+        return None
+    doc = docs[0]
+    return {
+        "key": doc.get("key"),
+        "cover_url": OPEN_LIBRARY_COVER_URL.format(cover_id=doc["cover_i"]) if doc.get("cover_i") else None,
+        "subjects": (doc.get("subject") or [])[:15],
+        "first_publish_year": doc.get("first_publish_year"),
+        "page_count": doc.get("number_of_pages_median"),
+    }
+
+
+async def _enrich_book(
+    book: dict,
+    google: Optional[CachedHttpClient],
+    open_library: Optional[CachedHttpClient],
+    api_key: Optional[str],
+    semaphore: asyncio.Semaphore,
+) -> Optional[dict]:
+    lookups = {}
+    if google is not None:
+        lookups["google_books"] = _google_books(google, book, api_key)
+    if open_library is not None:
+        lookups["open_library"] = _open_library(open_library, book)
+    async with semaphore:
+        results = await asyncio.gather(*lookups.values(), return_exceptions=True)
+    found: Dict[str, dict] = {}
+    for name, result in zip(lookups, results):
+        if isinstance(result, Exception):
+            record_log(
+                "WARNING",
+                "Metadata provider lookup failed",
+                source="enrichment",
+                context={"book_id": book["id"], "provider": name, "error": str(result)},
+            )
+        elif result:
+            found[name] = result
+    if not found:
+        return None
+
+    metadata = dict(book.get("book_metadata") or {})
+    metadata.update(found)
+    values = {"id": book["id"], "book_metadata": metadata}
+    description = next((item.get("description") for item in found.values() if item.get("description")), None)
+    if not book.get("description") and description:
+        values["description"] = description
+    cover = next((item.get("cover_url") for item in found.values() if item.get("cover_url")), None)
+    if not book.get("cover_url") and cover:
+        values["cover_url"] = cover
+    if metadata == (book.get("book_metadata") or {}) and len(values) == 2:
+        return None
+    return values
+
+
+async def enrich_books(transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, int]:
+    """Fetch Google Books and Open Library metadata for every book in the library.
+
+    Books are processed in chunks; both providers are queried concurrently per book,
+    each behind its own token bucket and the shared on-disk response cache.
+    """
+
+    settings = get_settings()
+    app_settings = get_app_settings()
+    cache = ResponseCache(Path(settings.enrichment_cache_dir))
+    limits = httpx.Limits(max_connections=settings.enrichment_concurrency * 2)
+    updated = 0
+    async with httpx.AsyncClient(timeout=20.0, limits=limits, transport=transport) as client:
+        google = CachedHttpClient(
+            client,
+            cache,
+            TokenBucket(settings.google_books_rate_limit, settings.google_books_burst),
+            ttl=settings.enrichment_cache_ttl,
+            max_retry_after=settings.http_max_retry_after,
+        )
+        open_library = (
+            CachedHttpClient(
+                client,
+                cache,
+                TokenBucket(settings.open_library_rate_limit, settings.open_library_burst),
+                ttl=settings.enrichment_cache_ttl,
+                max_retry_after=settings.http_max_retry_after,
+            )
+            if app_settings.open_library_enabled
+            else None
+        )
+        semaphore = asyncio.Semaphore(settings.enrichment_concurrency)
+        last_id = 0
+        while True:
+            books = await asyncio.to_thread(_load_books, last_id, settings.enrichment_batch_size)
+            if not books:
+                break
+            last_id = books[-1]["id"]
+            changes = await asyncio.gather(
+                *(
+                    _enrich_book(book, google, open_library, app_settings.google_books_api_key, semaphore)
+                    for book in books
+                )
+            )
+            rows = [change for change in changes if change]
+            if rows:
+                await asyncio.to_thread(_write_books, rows)
+            updated += len(rows)
+    calls = google.network_calls + (open_library.network_calls if open_library else 0)
+    return {"updated": updated, "network_calls": calls}
+
+
+def _load_books(after_id: int, limit: int) -> List[dict]:
+    columns = (Book.id, Book.title, Book.author, Book.description, Book.cover_url, Book.book_metadata)
+    with get_read_session() as session:
+        rows = session.exec(select(*columns).where(Book.id > after_id).order_by(Book.id).limit(limit)).all()
+    return [dict(zip(("id", "title", "author", "description", "cover_url", "book_metadata"), row)) for row in rows]
+
+
+def _write_books(rows: List[dict]) -> None:
+    with get_session() as session:
+        for keys in {tuple(sorted(row)) for row in rows}:
+            session.execute(update(Book), [row for row in rows if tuple(sorted(row)) == keys])
+
+
+def run_enrichment(transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict[str, int]:
+    if get_app_settings().demo_mode:
+        record_log("INFO", "Metadata enrichment skipped in demo mode", source="enrichment")
+        return {"updated": 0, "network_calls": 0}
+    record_log("INFO", "Starting metadata enrichment", source="enrichment")
+    stats = asyncio.run(enrich_books(transport=transport))
+    record_log("INFO", "Metadata enrichment completed", source="enrichment", context=stats)
+    return stats
+
+
+def run_enrichment_job(job: SyncJob) -> str:
+    """Queue handler for ``enrichment`` jobs."""
+
+    stats = run_enrichment()
+    return f"Enriched {stats['updated']} books ({stats['network_calls']} provider requests)"
@@ -1,17 +1,36 @@
+from collections import Counter
+from datetime import datetime
+from typing import List, Set
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import select
 
-from ..database import get_session
+from ..database import get_async_read_session, get_read_session, get_session
 from ..models import Feedback
-from ..schemas import FeedbackPayload, FeedbackRequest, FeedbackResponse
+from ..schemas import (
+    FeedbackBatchRequest,
+    FeedbackBatchResponse,
+    FeedbackPayload,
+    FeedbackRequest,
+    FeedbackResponse,
+)
+from ..versioning import bump_data_versions, user_scope
 from .log_service import record_log
+from .pagination import to_naive_utc
+from .recommendation_service import mark_recommendations_stale
+from .user_state import DEFAULT_USER, get_user_state_cache
 
 
-def record_feedback(payload: FeedbackRequest) -> FeedbackResponse:
+def record_feedback(payload: FeedbackRequest, user_id: str = DEFAULT_USER) -> FeedbackResponse:
     with get_session() as session:
-        feedback = Feedback(book_id=payload.book_id, reaction=payload.reaction, note=payload.note)
+        feedback = Feedback(book_id=payload.book_id, reaction=payload.reaction, note=payload.note, user_id=user_id)
         session.add(feedback)
+        bump_data_versions(session, [user_scope(user_id)])
         session.commit()
         session.refresh(feedback)
+    get_user_state_cache().invalidate(user_id)
     response = FeedbackResponse(
         id=feedback.id,
         book_id=feedback.book_id,
@@ -19,13 +38,85 @@ def record_feedback(payload: FeedbackRequest) -> FeedbackResponse:
         note=feedback.note,
         created_at=feedback.created_at,
     )
-    record_log("INFO", "Feedback captured", context={"book_id": feedback.book_id, "reaction": feedback.reaction})
+    mark_recommendations_stale("feedback")
+    record_log(
+        "INFO",
+        "Feedback captured",
+        context={"book_id": feedback.book_id, "reaction": feedback.reaction, "user_id": user_id},
+    )
     return response
 
 
-def fetch_feedback(limit: int = 50) -> FeedbackPayload:
+def _insert_feedback(session, rows: List[dict]) -> Set[str]:
+    """Insert rows whose idempotency key is new; returns the keys actually inserted."""
+
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        statement = sqlite_insert(Feedback).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    elif dialect == "postgresql":
+        statement = postgresql_insert(Feedback).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    else:
+        session.execute(insert(Feedback), rows)
+        return {row["idempotency_key"] for row in rows}
+    return set(session.execute(statement.returning(Feedback.idempotency_key), rows).scalars())
+
+
+def record_feedback_batch(payload: FeedbackBatchRequest, user_id: str = DEFAULT_USER) -> FeedbackBatchResponse:
+    """Store a batch of swipe reactions in one transaction.
+
+    Reactions are keyed by their client idempotency key: keys repeated within the
+    batch or already stored (a retried batch) are reported as duplicates and return
+    the stored row, so only newly inserted reactions move the reader's scores.
+    """
+
+    now = datetime.utcnow()
+    unique = {}
+    for item in payload.items:
+        unique.setdefault(item.idempotency_key, item)
+    rows = [
+        {
+            "book_id": item.book_id,
+            "reaction": item.reaction,
+            "note": item.note,
+            "idempotency_key": key,
+            "created_at": min(to_naive_utc(item.created_at) or now, now),
+            "user_id": user_id,
+        }
+        for key, item in unique.items()
+    ]
+    if not rows:
+        return FeedbackBatchResponse(accepted=0, duplicates=0, items=[])
     with get_session() as session:
-        entries = session.exec(select(Feedback).order_by(Feedback.created_at.desc()).limit(limit)).all()
+        inserted = _insert_feedback(session, rows)
+        accepted = [row for row in rows if row["idempotency_key"] in inserted]
+        if accepted:
+            bump_data_versions(session, [user_scope(user_id)])
+        stored = {
+            entry.idempotency_key: entry
+            for entry in session.exec(select(Feedback).where(Feedback.idempotency_key.in_(list(unique))))
+        }
+    duplicates = len(payload.items) - len(accepted)
+    if accepted:
+        get_user_state_cache().invalidate(user_id)
+        mark_recommendations_stale("feedback")
+    record_log(
+        "INFO",
+        "Feedback batch captured",
+        context={
+            "accepted": len(accepted),
+            "duplicates": duplicates,
+            "user_id": user_id,
+            "reactions": dict(Counter(row["reaction"] for row in accepted)),
+        },
+    )
+    return FeedbackBatchResponse(
+        accepted=len(accepted),
+        duplicates=duplicates,
+        items=_feedback_payload(stored[key] for key in unique if key in stored).items,
+    )
+
+
+def _feedback_payload(entries) -> FeedbackPayload:
     items = [
         FeedbackResponse(
             id=entry.id,
@@ -37,3 +128,21 @@ def fetch_feedback(limit: int = 50) -> FeedbackPayload:
         for entry in entries
     ]
     return FeedbackPayload(items=items)
+
+
+def _recent_feedback(user_id: str, limit: int):
+    return (
+        select(Feedback).where(Feedback.user_id == user_id).order_by(Feedback.created_at.desc()).limit(limit)
+    )
+
+
+def fetch_feedback(limit: int = 50, user_id: str = DEFAULT_USER) -> FeedbackPayload:
+    with get_read_session() as session:
+        entries = session.exec(_recent_feedback(user_id, limit)).all()
+    return _feedback_payload(entries)
+
+
+async def fetch_feedback_async(limit: int = 50, user_id: str = DEFAULT_USER) -> FeedbackPayload:
+    async with get_async_read_session() as session:
+        entries = (await session.exec(_recent_feedback(user_id, limit))).all()
+    return _feedback_payload(entries)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from ..lazy import lazy_import
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = lazy_import("httpx")
+
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursting up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ResponseCache:
+    """On-disk JSON response cache keyed by an arbitrary string.
+
+    Each entry keeps the body together with its ``ETag``/``Last-Modified`` validators
+    so stale entries can be revalidated with a conditional request.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._path(key).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staged = path.with_suffix(f".{os.getpid()}.tmp")
+        staged.write_text(json.dumps(entry))
+        os.replace(staged, path)
+
+
+class CachedHttpClient:
+    """Rate-limited, retrying JSON GET client backed by a :class:`ResponseCache`.
+
+    Entries younger than ``ttl`` seconds are served without touching the network;
+    older ones are revalidated with ``If-None-Match``/``If-Modified-Since`` and a 304
+    refreshes the entry in place. Every network attempt first takes a token from the
+    provider's bucket, and 429/5xx/transport errors are retried with exponential
+    backoff (honoring ``Retry-After`` up to ``max_retry_after`` seconds; a longer one
+    ends the retries and the error response is returned).
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        cache: ResponseCache,
+        bucket: TokenBucket,
+        ttl: float,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_retry_after: float = 120.0,
+    ) -> None:
+        self.client = client
+        self.cache = cache
+        self.bucket = bucket
+        self.ttl = ttl
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        self.network_calls = 0
+
+    async def get_json(self, key: str, url: str, params: Optional[dict] = None) -> Optional[Any]:
+        entry = self.cache.get(key)
+        if entry and time.time() - entry.get("fetched_at", 0) < self.ttl:
+            return entry.get("body")
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await self._request(url, params, headers)
+        if response.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+            self.cache.put(key, entry)
+            return entry.get("body")
+        if response.status_code == 404:
+            body = None
+        else:
+            response.raise_for_status()
+            body = response.json()
+        self.cache.put(
+            key,
+            {
+                "url": str(response.request.url),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "body": body,
+            },
+        )
+        return body
+
+    async def _request(self, url: str, params: Optional[dict], headers: dict) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            self.network_calls += 1
+            try:
+                response = await self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS or attempt >= self.max_retries:
+                    return response
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    return response
+                if retry_after is not None:
+                    await asyncio.sleep(retry_after)
+                    attempt += 1
+                    continue
+            await asyncio.sleep(self.backoff * (2**attempt) * (1 + random.random()))
+            attempt += 1
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delay or HTTP date), if it parses."""
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
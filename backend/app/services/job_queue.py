@@ -0,0 +1,381 @@
+"""Durable job queue stored in the ``SyncJob`` table.
+
+Any number of worker processes poll the table and claim runnable jobs with a lease
+that a heartbeat keeps extending; a job whose worker dies is reclaimed once its
+lease lapses. Enqueueing a job whose dedupe key already has a queued job returns
+that job instead, failed attempts are retried with exponential backoff, and each
+job type has a cluster-wide cap on concurrently running jobs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select as sa_select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from .. import metrics
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..models import SyncJob
+from .log_service import record_log
+
+# A handler runs one job; the string it returns becomes the job's final message.
+JobHandler = Callable[[SyncJob], Optional[str]]
+
+
+@lru_cache(maxsize=1)
+def job_handlers() -> Dict[str, JobHandler]:
+    # Imported here: the handlers' services enqueue jobs through this module.
+    from .catalog_service import run_catalog_import_job
+    from .embedding_service import run_embedding_rebuild_job
+    from .enrichment_service import run_enrichment_job
+    from .log_archive import run_log_archive_job
+    from .recommendation_service import run_refresh_job
+    from .sync_service import run_sync_job
+    from .trope_service import run_trope_job
+
+    return {
+        "abs_sync": run_sync_job,
+        "trope_extract": run_trope_job,
+        "log_archive": run_log_archive_job,
+        "catalog_import": run_catalog_import_job,
+        "recommendations_refresh": run_refresh_job,
+        "enrichment": run_enrichment_job,
+        "embedding_rebuild": run_embedding_rebuild_job,
+    }
+
+
+def _dedupe_key(job_type: str, payload: Optional[dict]) -> str:
+    return f"{job_type}:{json.dumps(payload or {}, sort_keys=True)}"
+
+
+def _queued_job(session, dedupe_key: str) -> Optional[SyncJob]:
+    return session.exec(
+        select(SyncJob).where(SyncJob.dedupe_key == dedupe_key, SyncJob.status == "queued")
+    ).first()
+
+
+def enqueue_job(
+    job_type: str,
+    payload: Optional[dict] = None,
+    dedupe_key: Optional[str] = None,
+    message: str = "Job queued",
+) -> Tuple[SyncJob, bool]:
+    """Queue a job and return ``(job, created)``.
+
+    When a job with the same dedupe key (by default the type plus payload) is
+    already waiting, that job is returned with ``created=False``; a partial unique
+    index keeps concurrent enqueues from different processes down to one row.
+    """
+
+    if job_type not in job_handlers():
+        raise ValueError(f"Unknown job type: {job_type}")
+    key = dedupe_key or _dedupe_key(job_type, payload)
+    with get_session() as session:
+        existing = _queued_job(session, key)
+        if existing is not None:
+            return existing, False
+        job = SyncJob(
+            job_type=job_type,
+            status="queued",
+            message=message,
+            payload=payload,
+            dedupe_key=key,
+            max_attempts=get_settings().job_max_attempts,
+        )
+        session.add(job)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            existing = _queued_job(session, key)
+            if existing is None:
+                raise
+            return existing, False
+    record_log("INFO", "Job queued", source="job-queue", context={"job_id": job.id, "job_type": job_type})
+    return job, True
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(SyncJob.status == "queued", or_(SyncJob.available_at.is_(None), SyncJob.available_at <= now)),
+        and_(SyncJob.status == "running", SyncJob.lease_expires_at < now),
+    )
+
+
+def claim_job(worker_id: str, job_types: Optional[Iterable[str]] = None) -> Optional[SyncJob]:
+    """Lease the oldest runnable job, respecting per-type concurrency limits.
+
+    Each claim is one conditional ``UPDATE`` that re-checks the job is still
+    claimable and that its type is under its limit, so racing workers can't both
+    win the same job. On SQLite the single writer serializes claims, so the count
+    sees every earlier claim. On Postgres, READ COMMITTED would let two claims of
+    the same type each count the other's row as not yet running, so a per-type
+    advisory lock held until commit serializes them.
+    """
+
+    settings = get_settings()
+    handlers = job_handlers()
+    types = [job_type for job_type in (job_types or handlers) if job_type in handlers]
+    now = datetime.utcnow()
+    with get_read_session() as session:
+        candidates = session.exec(
+            select(SyncJob.id, SyncJob.job_type)
+            .where(_claimable(now), SyncJob.job_type.in_(types))
+            .order_by(SyncJob.available_at, SyncJob.id)
+            .limit(20)
+        ).all()
+
+    running = SyncJob.__table__.alias("running_jobs")
+    for job_id, job_type in candidates:
+        in_flight = (
+            sa_select(func.count())
+            .select_from(running)
+            .where(
+                running.c.job_type == job_type,
+                running.c.status == "running",
+                running.c.lease_expires_at >= now,
+            )
+            .scalar_subquery()
+        )
+        statement = (
+            update(SyncJob)
+            .where(SyncJob.id == job_id, _claimable(now), in_flight < settings.job_concurrency.get(job_type, 1))
+            .values(
+                status="running",
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=settings.job_lease_seconds),
+                heartbeat_at=now,
+                attempts=SyncJob.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        with get_session() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                session.execute(sa_select(func.pg_advisory_xact_lock(func.hashtext(f"syncjob:{job_type}"))))
+            if session.execute(statement).rowcount == 1:
+                return session.get(SyncJob, job_id, populate_existing=True)
+    return None
+
+
+def heartbeat(job_id: int, worker_id: str) -> bool:
+    """Extend the job's lease; returns ``False`` if this worker no longer holds it."""
+
+    now = datetime.utcnow()
+    statement = (
+        update(SyncJob)
+        .where(SyncJob.id == job_id, SyncJob.lease_owner == worker_id, SyncJob.status == "running")
+        .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=get_settings().job_lease_seconds))
+        .execution_options(synchronize_session=False)
+    )
+    with get_session() as session:
+        return session.execute(statement).rowcount == 1
+
+
+def _release(session, job_id: int, worker_id: str, **values) -> bool:
+    statement = (
+        update(SyncJob)
+        .where(SyncJob.id == job_id, SyncJob.lease_owner == worker_id)
+        .values(lease_owner=None, lease_expires_at=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(statement).rowcount == 1
+
+
+def complete_job(job_id: int, worker_id: str, message: Optional[str] = None) -> bool:
+    values = {"status": "completed", "finished_at": datetime.utcnow(), "last_error": None}
+    if message:
+        values["message"] = message
+    with get_session() as session:
+        return _release(session, job_id, worker_id, **values)
+
+
+def retry_delay(attempts: int) -> float:
+    settings = get_settings()
+    return min(settings.job_retry_backoff_max, settings.job_retry_backoff * 2 ** max(0, attempts - 1))
+
+
+def fail_job(job: SyncJob, worker_id: str, error: str) -> str:
+    """Record a failed attempt; requeue with backoff or give up. Returns the new status."""
+
+    now = datetime.utcnow()
+    if job.attempts >= job.max_attempts:
+        with get_session() as session:
+            _release(
+                session,
+                job.id,
+                worker_id,
+                status="failed",
+                finished_at=now,
+                last_error=error,
+                message=f"Failed after {job.attempts} attempts: {error}",
+            )
+        return "failed"
+
+    delay = retry_delay(job.attempts)
+    try:
+        with get_session() as session:
+            _release(
+                session,
+                job.id,
+                worker_id,
+                status="queued",
+                available_at=now + timedelta(seconds=delay),
+                last_error=error,
+                message=f"Attempt {job.attempts} failed, retrying in {delay:.0f}s: {error}",
+            )
+        return "queued"
+    except IntegrityError:
+        # A newer duplicate was queued meanwhile; it will redo this work.
+        with get_session() as session:
+            _release(
+                session,
+                job.id,
+                worker_id,
+                status="superseded",
+                finished_at=now,
+                last_error=error,
+                message="Superseded by a newer queued job",
+            )
+        return "superseded"
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, job_id: int, worker_id: str, interval: float) -> None:
+        super().__init__(name=f"job-heartbeat-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                if not heartbeat(self.job_id, self.worker_id):
+                    record_log(
+                        "WARNING",
+                        "Job lease lost",
+                        source="job-queue",
+                        context={"job_id": self.job_id, "worker": self.worker_id},
+                    )
+                    return
+            except Exception as exc:  # keep beating; the next tick may get the writer
+                record_log("WARNING", "Job heartbeat failed", source="job-queue", context={"error": str(exc)})
+
+
+def run_job(job: SyncJob, worker_id: str) -> str:
+    """Run one claimed job under a heartbeat and record its outcome."""
+
+    if job.attempts > job.max_attempts:
+        return fail_job(job, worker_id, "lease expired on every attempt")
+    beat = _Heartbeat(job.id, worker_id, get_settings().job_lease_seconds / 3)
+    beat.start()
+    started = time.perf_counter()
+    try:
+        message = job_handlers()[job.job_type](job)
+    except Exception as exc:
+        beat.stopped.set()
+        status = fail_job(job, worker_id, str(exc) or type(exc).__name__)
+        metrics.observe_job(job.job_type, status, time.perf_counter() - started)
+        record_log(
+            "ERROR" if status == "failed" else "WARNING",
+            "Job attempt failed",
+            source="job-queue",
+            context={"job_id": job.id, "job_type": job.job_type, "attempt": job.attempts, "status": status},
+        )
+        return status
+    finally:
+        beat.stopped.set()
+    complete_job(job.id, worker_id, message)
+    metrics.observe_job(job.job_type, "completed", time.perf_counter() - started)
+    record_log("INFO", "Job completed", source="job-queue", context={"job_id": job.id, "job_type": job.job_type})
+    return "completed"
+
+
+def collect_queue_metrics() -> None:
+    """Refresh the queue depth and oldest-runnable-job gauges from the table."""
+
+    now = datetime.utcnow()
+    with get_read_session() as session:
+        depth = session.exec(
+            select(SyncJob.job_type, SyncJob.status, func.count())
+            .where(SyncJob.status.in_(["queued", "running"]))
+            .group_by(SyncJob.job_type, SyncJob.status)
+        ).all()
+        oldest = session.exec(
+            select(SyncJob.job_type, func.min(func.coalesce(SyncJob.available_at, SyncJob.started_at)))
+            .where(SyncJob.status == "queued")
+            .group_by(SyncJob.job_type)
+        ).all()
+    metrics.JOB_QUEUE_DEPTH.replace({(job_type, status): count for job_type, status, count in depth})
+    metrics.JOB_OLDEST_QUEUED.replace(
+        {(job_type,): max(0.0, (now - since).total_seconds()) for job_type, since in oldest if since is not None}
+    )
+
+
+class JobWorker:
+    """Polls the queue from ``threads`` threads until :meth:`stop` is called."""
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        job_types: Optional[Iterable[str]] = None,
+    ) -> None:
+        settings = get_settings()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.threads = threads or settings.job_worker_threads
+        self.poll_interval = poll_interval if poll_interval is not None else settings.job_poll_interval
+        self.job_types = list(job_types) if job_types else None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def run_pending(self) -> int:
+        """Run runnable jobs one at a time until none are left; returns how many ran."""
+
+        ran = 0
+        while not self._stopped.is_set():
+            job = claim_job(self.worker_id, self.job_types)
+            if job is None:
+                return ran
+            run_job(job, self.worker_id)
+            ran += 1
+        return ran
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                ran = self.run_pending()
+            except Exception as exc:
+                record_log("ERROR", "Job worker poll failed", source="job-queue", context={"error": str(exc)})
+                ran = 0
+            if not ran:
+                self._stopped.wait(self.poll_interval)
+
+    def start(self) -> None:
+        self._stopped.clear()
+        for n in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        record_log(
+            "INFO", "Job worker started", source="job-queue", context={"worker": self.worker_id, "threads": self.threads}
+        )
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop polling and wait for in-flight jobs to finish."""
+
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
@@ -0,0 +1,339 @@
+"""Archive old log entries into compressed JSONL segments.
+
+Rows older than ``LOG_RETENTION_DAYS`` are moved, one UTC day at a time, into
+``LOG_ARCHIVE_DIR/YYYY/MM/DD/<first id>-<last id>.jsonl.gz`` (or ``.zst``). Each
+segment has a sidecar ``.index.json`` holding its time range and per-level and
+per-source counts; the sidecar is written last, so a segment without one is an
+interrupted run and is ignored. Archived rows are then deleted in batches. Log
+reads consult the sidecars and only open segments that can match the query.
+
+``python -m app.services.log_archive run`` archives once from the command line.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, func, or_
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..models import LogEntry, SyncJob
+from .pagination import to_naive_utc
+
+CODEC_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+INDEX_SUFFIX = ".index.json"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as exc:  # optional dependency
+        raise ValueError("LOG_ARCHIVE_COMPRESSION=zstd requires the zstandard package") from exc
+    return zstandard
+
+
+def _open_segment(path: Path, mode: str):
+    """Open a segment for text reading (``"r"``) or writing (``"w"``) by its suffix."""
+
+    if path.name.endswith(CODEC_SUFFIXES["zstd"]) or path.name.endswith(CODEC_SUFFIXES["zstd"] + ".tmp"):
+        zstandard = _zstandard()
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return gzip.open(path, mode + "t", encoding="utf-8")
+
+
+def _entry_record(entry: LogEntry) -> dict:
+    return {
+        "id": entry.id,
+        "level": entry.level,
+        "source": entry.source,
+        "message": entry.message,
+        "context": entry.context,
+        "created_at": to_naive_utc(entry.created_at).isoformat(),
+    }
+
+
+def _record_entry(record: dict) -> LogEntry:
+    return LogEntry(**{**record, "created_at": datetime.fromisoformat(record["created_at"])})
+
+
+@dataclass
+class Segment:
+    path: Path
+    start: datetime
+    end: datetime
+    count: int
+    levels: Dict[str, int]
+    sources: Dict[str, int]
+
+    def matches(
+        self, level: Optional[str], source: Optional[str], since: Optional[datetime], until: Optional[datetime]
+    ) -> bool:
+        if level and not self.levels.get(level):
+            return False
+        if source and not self.sources.get(source):
+            return False
+        if since and self.end < since:
+            return False
+        return not (until and self.start >= until)
+
+    def entries(self) -> Iterator[LogEntry]:
+        with _open_segment(self.path, "r") as handle:
+            for line in handle:
+                if line.strip():
+                    yield _record_entry(json.loads(line))
+
+
+class LogArchive:
+    """Segment store rooted at ``directory``; parsed sidecars are cached by path."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._segments: Dict[Path, Segment] = {}
+        self._lock = threading.Lock()
+
+    def segments(self) -> List[Segment]:
+        """Return every complete segment, newest first."""
+
+        if not self.directory.exists():
+            return []
+        found: List[Segment] = []
+        with self._lock:
+            for index_path in self.directory.glob(f"*/*/*/*{INDEX_SUFFIX}"):
+                segment = self._segments.get(index_path)
+                if segment is None:
+                    try:
+                        segment = self._load(index_path)
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    self._segments[index_path] = segment
+                found.append(segment)
+        return sorted(found, key=lambda segment: (segment.end, segment.start), reverse=True)
+
+    @staticmethod
+    def _load(index_path: Path) -> Segment:
+        index = json.loads(index_path.read_text())
+        return Segment(
+            path=index_path.parent / index["file"],
+            start=datetime.fromisoformat(index["start"]),
+            end=datetime.fromisoformat(index["end"]),
+            count=index["count"],
+            levels=index["levels"],
+            sources=index["sources"],
+        )
+
+    def newest(
+        self, level: Optional[str], source: Optional[str], since: Optional[datetime], until: Optional[datetime]
+    ) -> Optional[datetime]:
+        """Latest archived timestamp that could match the filters, or ``None``."""
+
+        for segment in self.segments():
+            if segment.matches(level, source, since, until):
+                return segment.end
+        return None
+
+    def read(
+        self,
+        level: Optional[str],
+        source: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+        before: Optional[Tuple[datetime, int]],
+        limit: int,
+    ) -> List[LogEntry]:
+        """Return up to ``limit`` archived entries newest first, keyset-bounded by ``before``."""
+
+        found: List[LogEntry] = []
+        for segment in self.segments():
+            if not segment.matches(level, source, since, until) or (before and segment.start > before[0]):
+                continue
+            if len(found) >= limit and segment.end < found[limit - 1].created_at:
+                break
+            for entry in segment.entries():
+                if level and entry.level != level:
+                    continue
+                if source and entry.source != source:
+                    continue
+                if since and entry.created_at < since:
+                    continue
+                if until and entry.created_at >= until:
+                    continue
+                if before and (entry.created_at, entry.id) >= before:
+                    continue
+                found.append(entry)
+            found.sort(key=lambda entry: (entry.created_at, entry.id), reverse=True)
+        return found[:limit]
+
+    def archived_ids(self, day: datetime) -> Set[int]:
+        """Ids already stored in complete segments for ``day`` (for re-runs after a crash)."""
+
+        ids: Set[int] = set()
+        folder = self.directory / day.strftime("%Y/%m/%d")
+        for index_path in folder.glob(f"*{INDEX_SUFFIX}"):
+            segment = self._load(index_path)
+            ids.update(entry.id for entry in segment.entries())
+        return ids
+
+    def write_day(self, day: datetime, end: datetime, batch_size: int) -> Tuple[int, List[int]]:
+        """Archive the rows of ``day`` older than ``end``; returns ``(written, ids_to_delete)``."""
+
+        codec = get_settings().log_archive_compression
+        if codec not in CODEC_SUFFIXES:
+            raise ValueError(f"Unknown log archive compression: {codec}")
+        folder = self.directory / day.strftime("%Y/%m/%d")
+        folder.mkdir(parents=True, exist_ok=True)
+        already = self.archived_ids(day)
+        staged = folder / f"segment.{os.getpid()}{CODEC_SUFFIXES[codec]}.tmp"
+        ids: List[int] = []
+        levels: Counter = Counter()
+        sources: Counter = Counter()
+        first: Optional[LogEntry] = None
+        last: Optional[LogEntry] = None
+        written = 0
+        with _open_segment(staged, "w") as handle:
+            for entry in _day_rows(day, end, batch_size):
+                ids.append(entry.id)
+                if entry.id in already:
+                    continue
+                handle.write(json.dumps(_entry_record(entry), separators=(",", ":")) + "\n")
+                levels[entry.level] += 1
+                sources[entry.source] += 1
+                first = first or entry
+                last = entry
+                written += 1
+        if not written:
+            staged.unlink()
+            return 0, ids
+        name = f"{first.id}-{last.id}{CODEC_SUFFIXES[codec]}"
+        os.replace(staged, folder / name)
+        index = {
+            "file": name,
+            "start": to_naive_utc(first.created_at).isoformat(),
+            "end": to_naive_utc(last.created_at).isoformat(),
+            "count": written,
+            "levels": dict(levels),
+            "sources": dict(sources),
+        }
+        staged_index = folder / f"{name}.{os.getpid()}.tmp"
+        staged_index.write_text(json.dumps(index))
+        os.replace(staged_index, folder / f"{name}{INDEX_SUFFIX}")
+        return written, ids
+
+
+def _day_rows(day: datetime, end: datetime, batch_size: int) -> Iterator[LogEntry]:
+    """Yield the rows in ``[day, end)`` in ``(created_at, id)`` order, one keyset batch at a time."""
+
+    after: Optional[Tuple[datetime, int]] = None
+    while True:
+        query = (
+            select(LogEntry)
+            .where(LogEntry.created_at >= day, LogEntry.created_at < end)
+            .order_by(LogEntry.created_at, LogEntry.id)
+            .limit(batch_size)
+        )
+        if after is not None:
+            query = query.where(
+                or_(LogEntry.created_at > after[0], and_(LogEntry.created_at == after[0], LogEntry.id > after[1]))
+            )
+        with get_read_session() as session:
+            rows = list(session.exec(query))
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1].created_at, rows[-1].id)
+
+
+_archive: Optional[LogArchive] = None
+_archive_lock = threading.Lock()
+
+
+def get_log_archive() -> LogArchive:
+    global _archive
+    with _archive_lock:
+        directory = Path(get_settings().log_archive_dir)
+        if _archive is None or _archive.directory != directory:
+            _archive = LogArchive(directory)
+        return _archive
+
+
+def archive_logs(older_than: Optional[timedelta] = None, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Move rows older than the retention age into segments, then delete them.
+
+    Returns counts of segments written, rows archived and rows deleted. Each delete
+    batch is its own transaction so the writer is released between batches.
+    """
+
+    settings = get_settings()
+    if older_than is None:
+        if settings.log_retention_days is None:
+            return {"segments": 0, "archived": 0, "deleted": 0}
+        older_than = timedelta(days=settings.log_retention_days)
+    cutoff = (now or datetime.utcnow()) - older_than
+    archive = get_log_archive()
+    batch_size = max(1, settings.log_archive_batch_size)
+    totals = {"segments": 0, "archived": 0, "deleted": 0}
+    start: Optional[datetime] = None
+    while True:
+        with get_read_session() as session:
+            query = select(func.min(LogEntry.created_at)).where(LogEntry.created_at < cutoff)
+            if start is not None:
+                query = query.where(LogEntry.created_at >= start)
+            oldest = session.exec(query).one()
+        if oldest is None:
+            return totals
+        day = to_naive_utc(oldest).replace(hour=0, minute=0, second=0, microsecond=0)
+        start = day + timedelta(days=1)
+        written, ids = archive.write_day(day, min(start, cutoff), batch_size)
+        totals["segments"] += 1 if written else 0
+        totals["archived"] += written
+        for offset in range(0, len(ids), batch_size):
+            with get_session() as session:
+                session.exec(delete(LogEntry).where(LogEntry.id.in_(ids[offset : offset + batch_size])))
+        totals["deleted"] += len(ids)
+
+
+def run_log_archive_job(job: SyncJob) -> str:
+    """Queue handler for ``log_archive`` jobs; ``payload["older_than_days"]`` overrides retention."""
+
+    # Imported here: log_service reads archived entries through this module.
+    from .log_service import record_log
+
+    days = (job.payload or {}).get("older_than_days")
+    totals = archive_logs(timedelta(days=days) if days is not None else None)
+    record_log("INFO", "Log archival completed", source="log-archive", context=totals)
+    return f"Archived {totals['archived']} log entries into {totals['segments']} segments"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Archive old log entries to compressed segments.")
+    parser.add_argument("command", choices=("run",))
+    parser.add_argument("--older-than-days", type=float, default=None, help="Override LOG_RETENTION_DAYS.")
+    args = parser.parse_args(argv)
+
+    from ..database import create_db_and_tables
+
+    create_db_and_tables()
+    older_than = timedelta(days=args.older_than_days) if args.older_than_days is not None else None
+    totals = archive_logs(older_than)
+    print(f"Archived {totals['archived']} log entries into {totals['segments']} segments")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,251 @@
-from typing import Optional
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, List, Optional, Tuple
 
+from sqlalchemy import and_, or_
 from sqlmodel import select
 
-from ..database import get_session
+from .. import metrics
+from ..config import get_settings
+from ..database import get_async_read_session, get_read_session, get_session
 from ..models import LogEntry
 from ..schemas import ClientLogEntry, LogEntryResponse, LogsPayload
+from .log_archive import get_log_archive
+from .pagination import decode_cursor, encode_cursor, parse_cursor_datetime, to_naive_utc
 
+logger = logging.getLogger(__name__)
 
-def record_log(level: str, message: str, source: str = "backend", context: Optional[dict] = None) -> LogEntry:
+OVERFLOW_POLICIES = ("block", "drop_oldest", "sample")
+
+
+class _PendingLog:
+    __slots__ = ("entry", "done")
+
+    def __init__(self, entry: LogEntry, done: Optional[threading.Event]) -> None:
+        self.entry = entry
+        self.done = done
+
+
+def _write_batch(entries: List[LogEntry]) -> None:
     with get_session() as session:
-        entry = LogEntry(level=level.upper(), message=message, source=source, context=context)
-        session.add(entry)
-        session.commit()
-        session.refresh(entry)
+        session.add_all(entries)
+
+
+class LogSink:
+    """Bounded in-memory log queue drained by a background writer thread.
+
+    Entries are bulk-inserted once ``batch_size`` are pending or the oldest pending
+    entry is ``flush_interval`` seconds old. When the queue is full the overflow
+    policy decides what happens: ``block`` waits for room, ``drop_oldest`` evicts
+    the oldest pending entry, and ``sample`` keeps one in every ``sample_every``
+    overflowing entries (evicting the oldest) and drops the rest. Entries submitted
+    with ``wait=True`` are never dropped; when the queue is full of them, the
+    dropping policies reject the new entry instead of evicting one.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        overflow: str = "drop_oldest",
+        sample_every: int = 10,
+        writer: Callable[[List[LogEntry]], None] = _write_batch,
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log overflow policy: {overflow}")
+        self.capacity = max(1, capacity)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_every = max(1, sample_every)
+        self.dropped = 0
+        self._writer = writer
+        self._pending: Deque[_PendingLog] = deque()
+        self._oldest_at = 0.0
+        self._accepted = 0
+        self._completed = 0
+        self._overflowed = 0
+        self._urgent = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def submit(self, entry: LogEntry, wait: bool = False) -> LogEntry:
+        """Queue an entry; with ``wait`` block until it is persisted and has an id."""
+
+        done = threading.Event() if wait else None
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Log sink is closed")
+            self._ensure_thread()
+            if len(self._pending) >= self.capacity:
+                if done is not None or self.overflow == "block":
+                    while len(self._pending) >= self.capacity and not self._closed:
+                        self._cond.wait()
+                elif self.overflow == "drop_oldest":
+                    if not self._drop_oldest():
+                        self.dropped += 1
+                        return entry
+                else:
+                    self._overflowed += 1
+                    if self._overflowed % self.sample_every or not self._drop_oldest():
+                        self.dropped += 1
+                        return entry
+            if not self._pending:
+                self._oldest_at = time.monotonic()
+            self._pending.append(_PendingLog(entry, done))
+            self._accepted += 1
+            if done is not None:
+                self._urgent += 1
+            self._cond.notify_all()
+        if done is not None:
+            done.wait()
         return entry
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far; return False if ``timeout`` expired first."""
+
+        with self._cond:
+            target = self._accepted
+            if self._completed >= target:
+                return True
+            self._urgent += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: self._completed >= target, timeout)
+            finally:
+                self._urgent -= 1
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _drop_oldest(self) -> bool:
+        """Evict the oldest entry nobody waits on; returns False if every entry is waited on."""
+
+        for position, pending in enumerate(self._pending):
+            if pending.done is None:
+                del self._pending[position]
+                self.dropped += 1
+                self._completed += 1
+                return True
+        return False
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> Optional[List[_PendingLog]]:
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            while len(self._pending) < self.batch_size and not self._urgent and not self._closed:
+                remaining = self._oldest_at + self.flush_interval - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(count)]
+            self._oldest_at = time.monotonic()
+            self._cond.notify_all()
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._writer([pending.entry for pending in batch])
+            except Exception:
+                logger.exception("Failed to write %d log entries", len(batch))
+            with self._cond:
+                self._completed += len(batch)
+                self._urgent -= sum(1 for pending in batch if pending.done is not None)
+                self._cond.notify_all()
+            for pending in batch:
+                if pending.done is not None:
+                    pending.done.set()
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def collect_log_metrics() -> None:
+    if _sink is not None:
+        metrics.LOG_BUFFER_DEPTH.set(_sink.depth)
+        metrics.LOG_DROPPED.set(_sink.dropped)
+
+
+def get_log_sink() -> LogSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            settings = get_settings()
+            _sink = LogSink(
+                capacity=settings.log_queue_size,
+                batch_size=settings.log_batch_size,
+                flush_interval=settings.log_flush_interval,
+                overflow=settings.log_overflow_policy,
+                sample_every=settings.log_sample_every,
+            )
+            atexit.register(_sink.close)
+        return _sink
+
+
+def flush_logs(timeout: Optional[float] = None) -> bool:
+    return _sink.flush(timeout) if _sink is not None else True
+
+
+def shutdown_logs() -> None:
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
+
+
+def record_log(
+    level: str,
+    message: str,
+    source: str = "backend",
+    context: Optional[dict] = None,
+    wait: bool = False,
+) -> LogEntry:
+    """Record a log entry through the buffered sink.
+
+    The entry is returned immediately and persisted in the background; pass
+    ``wait=True`` when the caller needs the stored row (including its id).
+    """
+
+    entry = LogEntry(level=level.upper(), message=message, source=source, context=context)
+    if not get_settings().log_buffer_enabled:
+        _write_batch([entry])
+        return entry
+    return get_log_sink().submit(entry, wait=wait)
+
 
 def record_client_log(payload: ClientLogEntry) -> LogEntryResponse:
-    entry = record_log(payload.level, payload.message, payload.source, payload.context)
+    entry = record_log(payload.level, payload.message, payload.source, payload.context, wait=True)
     return LogEntryResponse(
         id=entry.id,
         level=entry.level,
@@ -28,14 +256,78 @@ def record_client_log(payload: ClientLogEntry) -> LogEntryResponse:
     )
 
 
-def fetch_logs(level: Optional[str] = None, source: Optional[str] = None, limit: int = 100) -> LogsPayload:
-    with get_session() as session:
-        query = select(LogEntry).order_by(LogEntry.created_at.desc()).limit(limit)
-        if level:
-            query = query.where(LogEntry.level == level.upper())
-        if source:
-            query = query.where(LogEntry.source == source)
-        entries = list(session.exec(query))
+def _logs_query(
+    level: Optional[str],
+    source: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+):
+    query = select(LogEntry).order_by(LogEntry.created_at.desc(), LogEntry.id.desc()).limit(limit + 1)
+    if level:
+        query = query.where(LogEntry.level == level.upper())
+    if source:
+        query = query.where(LogEntry.source == source)
+    if since:
+        query = query.where(LogEntry.created_at >= to_naive_utc(since))
+    if until:
+        query = query.where(LogEntry.created_at < to_naive_utc(until))
+    if cursor:
+        created_at, last_id = _cursor_key(cursor)
+        query = query.where(
+            or_(
+                LogEntry.created_at < created_at,
+                and_(LogEntry.created_at == created_at, LogEntry.id < last_id),
+            )
+        )
+    return query
+
+
+def _cursor_key(cursor: str) -> Tuple[datetime, int]:
+    values = decode_cursor(cursor)
+    created_at = parse_cursor_datetime(values.get("created_at"))
+    last_id = values.get("id")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid pagination cursor")
+    return created_at, last_id
+
+
+def _with_archived(
+    entries: List[LogEntry],
+    level: Optional[str],
+    source: Optional[str],
+    limit: int,
+    cursor: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> List[LogEntry]:
+    """Merge archived entries into a live page when the page reaches back into the archive.
+
+    The archive is only read when the live page is short or its oldest row is not
+    newer than the newest archived entry that could match.
+    """
+
+    archive = get_log_archive()
+    level = level.upper() if level else None
+    since, until = to_naive_utc(since), to_naive_utc(until)
+    newest = archive.newest(level, source, since, until)
+    if newest is None or (len(entries) > limit and to_naive_utc(entries[-1].created_at) > newest):
+        return entries
+    archived = archive.read(level, source, since, until, _cursor_key(cursor) if cursor else None, limit + 1)
+    merged = {entry.id: entry for entry in archived}
+    merged.update((entry.id, entry) for entry in entries)
+    return sorted(merged.values(), key=lambda entry: (to_naive_utc(entry.created_at), entry.id), reverse=True)[
+        : limit + 1
+    ]
+
+
+def _logs_payload(entries: List[LogEntry], limit: int) -> LogsPayload:
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor({"created_at": last.created_at, "id": last.id})
     items = [
         LogEntryResponse(
             id=entry.id,
@@ -47,4 +339,43 @@ def fetch_logs(level: Optional[str] = None, source: Optional[str] = None, limit:
         )
         for entry in entries
     ]
-    return LogsPayload(items=items)
+    return LogsPayload(items=items, next_cursor=next_cursor)
+
+
+def fetch_logs(
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> LogsPayload:
+    """Return log entries newest first, one keyset page at a time.
+
+    Pages are ordered by ``(created_at, id)`` descending; ``next_cursor`` points just
+    past the last returned row and is ``None`` on the final page. Pages continue
+    seamlessly into archived segments once the live table runs out.
+    """
+
+    query = _logs_query(level, source, limit, cursor, since, until)
+    with get_read_session() as session:
+        entries = list(session.exec(query))
+    entries = _with_archived(entries, level, source, limit, cursor, since, until)
+    return _logs_payload(entries, limit)
+
+
+async def fetch_logs_async(
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> LogsPayload:
+    """Async variant of :func:`fetch_logs`; archived segments are read in a thread."""
+
+    query = _logs_query(level, source, limit, cursor, since, until)
+    async with get_async_read_session() as session:
+        entries = list(await session.exec(query))
+    entries = await asyncio.to_thread(_with_archived, entries, level, source, limit, cursor, since, until)
+    return _logs_payload(entries, limit)
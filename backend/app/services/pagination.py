@@ -0,0 +1,46 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode keyset values into an opaque, URL-safe cursor string."""
+
+    raw = json.dumps(values, separators=(",", ":"), default=_encode_value).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor produced by :func:`encode_cursor`; raise ``ValueError`` if malformed."""
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
+    if not isinstance(values, dict):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid pagination cursor") from exc
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to the naive UTC form timestamps are stored in."""
+
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
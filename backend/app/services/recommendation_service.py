@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import select
+
+from ..database import get_async_read_session, get_read_session, get_session
+from ..models import DEFAULT_USER, Book, BookTrope, Feedback, Recommendation, RecommendationState, SyncJob
+from ..schemas import BookResponse, FeedCursor, RecommendationResponse, RecommendationsPayload
+from .job_queue import enqueue_job
+from .log_service import record_log
+from .pagination import decode_cursor, encode_cursor
+
+REACTION_WEIGHTS: Dict[str, float] = {
+    "liked": 1.0,
+    "like": 1.0,
+    "loved": 1.5,
+    "skipped": -1.0,
+    "skip": -1.0,
+    "disliked": -1.5,
+}
+
+FALLBACK_EXPLANATIONS = [
+    "Shares the same slow-burn magic academy vibe you love.",
+    "Features a fierce heroine and a brooding mage love interest.",
+    "Combines political intrigue with enchanting worldbuilding.",
+]
+
+# Reentrant so a stale refresh can re-check staleness under the lock it precomputes with.
+_refresh_lock = threading.RLock()
+
+# Receives the cover URLs of the page after the one being served, found in the same pass.
+UpcomingCovers = Callable[[List[str]], None]
+
+# Job type and dedupe key of the queued stale refresh; concurrent stale reads coalesce onto one job.
+REFRESH_JOB = "recommendations_refresh"
+
+
+def _state(session) -> RecommendationState:
+    state = session.get(RecommendationState, 1)
+    if state is None:
+        state = RecommendationState(id=1)
+        session.add(state)
+        session.flush()
+    return state
+
+
+def mark_recommendations_stale(reason: str) -> None:
+    """Flag the materialized recommendations as out of date."""
+
+    with get_session() as session:
+        state = _state(session)
+        state.stale = True
+        state.stale_reason = reason
+        session.add(state)
+
+
+def _is_stale(state: Optional[RecommendationState]) -> bool:
+    return state is None or state.stale or state.generation == 0
+
+
+def recommendations_are_stale() -> bool:
+    with get_read_session() as session:
+        return _is_stale(session.get(RecommendationState, 1))
+
+
+async def recommendations_are_stale_async() -> bool:
+    async with get_async_read_session() as session:
+        return _is_stale(await session.get(RecommendationState, 1))
+
+
+def _score_library(session) -> List[Tuple[int, float, str]]:
+    """Score every book deterministically from trope frequency and feedback.
+
+    A trope's weight is its share of the library's trope counts plus a damped sum of
+    the reactions left on books carrying it; a book scores the mean weight of its
+    tropes, nudged by its own feedback, mapped onto ``[0.7, 0.99]``.
+    """
+
+    tropes_by_book: Dict[int, List[str]] = defaultdict(list)
+    for book_id, trope in session.exec(select(BookTrope.book_id, BookTrope.trope).order_by(BookTrope.id)):
+        tropes_by_book[book_id].append(trope)
+    profile = Counter(trope for tropes in tropes_by_book.values() for trope in tropes)
+    top_count = max(profile.values(), default=1)
+
+    feedback_by_book: Dict[int, float] = defaultdict(float)
+    for book_id, reaction, count in session.exec(
+        select(Feedback.book_id, Feedback.reaction, func.count()).group_by(Feedback.book_id, Feedback.reaction)
+    ):
+        feedback_by_book[book_id] += REACTION_WEIGHTS.get(reaction, 0.0) * count
+    trope_feedback: Dict[str, float] = defaultdict(float)
+    for book_id, weight in feedback_by_book.items():
+        for trope in tropes_by_book.get(book_id, []):
+            trope_feedback[trope] += weight
+
+    scored: List[Tuple[int, float, str]] = []
+    for book_id, reason in session.exec(select(Book.id, Book.reason).order_by(Book.id)):
+        tropes = tropes_by_book.get(book_id, [])
+        weights = {trope: profile[trope] / top_count + 0.5 * math.tanh(trope_feedback[trope]) for trope in tropes}
+        affinity = sum(weights.values()) / len(weights) if weights else 0.0
+        affinity += 0.25 * math.tanh(feedback_by_book.get(book_id, 0.0))
+        score = round(0.7 + 0.29 * min(1.0, max(0.0, affinity)), 3)
+        if reason:
+            explanation = reason
+        elif weights:
+            leading = sorted(weights, key=lambda trope: (-weights[trope], trope))[:2]
+            explanation = f"Leans into {' and '.join(leading)}, tropes that run through your library."
+        else:
+            explanation = FALLBACK_EXPLANATIONS[zlib.crc32(str(book_id).encode()) % len(FALLBACK_EXPLANATIONS)]
+        scored.append((book_id, score, explanation))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored
+
+
+def precompute_recommendations(reason: str = "manual") -> int:
+    """Score the whole library and swap in a new materialized generation.
+
+    New rows are inserted under the next generation number and the state row is
+    pointed at it in the same transaction, so readers never see a partial ranking.
+    The previous generation is kept until the next swap so cursors into it stay valid.
+    """
+
+    with _refresh_lock:
+        with get_session() as session:
+            if session.exec(select(Book.id).limit(1)).first() is None:
+                # Imported here: sync_service refreshes recommendations after a sync.
+                from .sync_service import _seed_books
+
+                _seed_books(session)
+            scored = _score_library(session)
+            state = _state(session)
+            generation = state.generation + 1
+            generated_at = datetime.utcnow()
+            rows = [
+                {
+                    "book_id": book_id,
+                    "score": score,
+                    "explanation": explanation,
+                    "generated_at": generated_at,
+                    "generation": generation,
+                    "rank": rank,
+                }
+                for rank, (book_id, score, explanation) in enumerate(scored)
+            ]
+            for start in range(0, len(rows), 1000):
+                session.execute(insert(Recommendation), rows[start : start + 1000])
+            session.execute(delete(Recommendation).where(Recommendation.generation < generation - 1))
+            state.generation = generation
+            state.stale = False
+            state.stale_reason = None
+            state.refreshed_at = generated_at
+            session.add(state)
+
+    record_log(
+        "INFO",
+        "Recommendations precomputed",
+        source="recommendation-engine",
+        context={"generation": generation, "books": len(rows), "reason": reason},
+    )
+    return len(rows)
+
+
+def refresh_stale_recommendations() -> Optional[int]:
+    """Precompute if the ranking is stale; returns ``None`` when it is already current.
+
+    Staleness is checked again under the refresh lock, so refreshes that queued up
+    behind a running one do not each rebuild the same generation.
+    """
+
+    if not recommendations_are_stale():
+        return None
+    with _refresh_lock:
+        if not recommendations_are_stale():
+            return None
+        return precompute_recommendations(reason="stale")
+
+
+def request_recommendations_refresh() -> SyncJob:
+    """Queue a stale refresh; one that is already waiting is returned instead."""
+
+    job, _ = enqueue_job(REFRESH_JOB, dedupe_key=REFRESH_JOB, message="Recommendation refresh scheduled")
+    return job
+
+
+def run_refresh_job(job: SyncJob) -> str:
+    """Queue handler for ``recommendations_refresh`` jobs."""
+
+    refreshed = refresh_stale_recommendations()
+    if refreshed is None:
+        return "Recommendations already current"
+    return f"Refreshed {refreshed} recommendations"
+
+
+def _generation_query(generation: int, limit: Optional[int], after_rank: Optional[int] = None):
+    # Ranks follow the (score desc, book id) order they were materialized in.
+    query = (
+        select(Recommendation, Book)
+        .join(Book, Book.id == Recommendation.book_id)
+        .where(Recommendation.generation == generation)
+    )
+    if after_rank is not None:
+        query = query.where(Recommendation.rank > after_rank)
+    return query.order_by(Recommendation.rank).limit(limit)
+
+
+def _parse_cursor(cursor: str) -> Tuple[int, int]:
+    values = decode_cursor(cursor)
+    generation, rank = values.get("generation"), values.get("rank")
+    if not isinstance(generation, int) or not isinstance(rank, int):
+        raise ValueError("Invalid pagination cursor")
+    return generation, rank
+
+
+def _next_cursor(recommendation: Recommendation) -> str:
+    return encode_cursor({"generation": recommendation.generation, "rank": recommendation.rank})
+
+
+def _expired(generation: int) -> ValueError:
+    return ValueError(f"Pagination cursor has expired (generation {generation} was replaced)")
+
+
+def _to_response(recommendation: Recommendation, book: Book) -> RecommendationResponse:
+    return RecommendationResponse(
+        id=recommendation.id,
+        book=BookResponse(
+            id=book.id,
+            title=book.title,
+            author=book.author,
+            description=book.description,
+            cover_url=book.cover_url,
+            reason=book.reason,
+        ),
+        score=recommendation.score,
+        explanation=recommendation.explanation,
+        generated_at=recommendation.generated_at,
+    )
+
+
+def _to_responses(rows) -> List[RecommendationResponse]:
+    return [_to_response(recommendation, book) for recommendation, book in rows]
+
+
+def _page(rows, limit: int) -> RecommendationsPayload:
+    next_cursor = _next_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return RecommendationsPayload(items=_to_responses(rows[:limit]), next_cursor=next_cursor)
+
+
+def get_recommendations(limit: int = 10, user_id: str = DEFAULT_USER) -> List[RecommendationResponse]:
+    """Serve the current materialized generation ordered by score."""
+
+    return fetch_recommendations(limit, user_id=user_id).items
+
+
+async def get_recommendations_async(limit: int = 10, user_id: str = DEFAULT_USER) -> List[RecommendationResponse]:
+    return (await fetch_recommendations_async(limit, user_id=user_id)).items
+
+
+def _seen_filter(user_id: str) -> Callable[[int], bool]:
+    # Imported here: user_state reaches this module through trope_profile.
+    from .user_state import get_user_state
+
+    state, _ = get_user_state(user_id)
+    return state.has_seen
+
+
+async def _seen_filter_async(user_id: str) -> Callable[[int], bool]:
+    from .user_state import get_user_state_async
+
+    state, _ = await get_user_state_async(user_id)
+    return state.has_seen
+
+
+def _unseen_rows(session, generation: int, limit: int, after: Optional[int], seen: Callable[[int], bool]) -> list:
+    """Up to ``limit + 1`` rows after ``after`` whose book the reader has not reacted to."""
+
+    rows: list = []
+    while True:
+        batch = session.exec(_generation_query(generation, limit + 1, after)).all()
+        rows.extend(row for row in batch if not seen(row[1].id))
+        if len(rows) > limit or len(batch) <= limit:
+            return rows[: limit + 1]
+        after = batch[-1][0].rank
+
+
+async def _unseen_rows_async(
+    session, generation: int, limit: int, after: Optional[int], seen: Callable[[int], bool]
+) -> list:
+    rows: list = []
+    while True:
+        batch = (await session.exec(_generation_query(generation, limit + 1, after))).all()
+        rows.extend(row for row in batch if not seen(row[1].id))
+        if len(rows) > limit or len(batch) <= limit:
+            return rows[: limit + 1]
+        after = batch[-1][0].rank
+
+
+def _current_generation() -> int:
+    with get_read_session() as session:
+        state = session.get(RecommendationState, 1)
+    if state is None or state.generation == 0:
+        precompute_recommendations(reason="initial")
+        with get_read_session() as session:
+            state = session.get(RecommendationState, 1)
+    return state.generation
+
+
+async def _current_generation_async() -> int:
+    """Async variant of :func:`_current_generation`; the first-run precompute goes to a thread."""
+
+    async with get_async_read_session() as session:
+        state = await session.get(RecommendationState, 1)
+    if state is None or state.generation == 0:
+        await asyncio.to_thread(precompute_recommendations, "initial")
+        async with get_async_read_session() as session:
+            state = await session.get(RecommendationState, 1)
+    return state.generation
+
+
+def fetch_recommendations(
+    limit: int = 10, cursor: Optional[str] = None, user_id: str = DEFAULT_USER
+) -> RecommendationsPayload:
+    """Return one page of the ranking, best first, skipping books the reader reacted to.
+
+    Without a cursor the page starts at the top of the current generation; with one
+    it continues the generation the cursor was issued for, so a refresh between pages
+    never reshuffles a feed being paged through. Raises ``ValueError`` for a malformed
+    cursor or one whose generation has since been dropped.
+    """
+
+    generation, after = _parse_cursor(cursor) if cursor else (_current_generation(), None)
+    seen = _seen_filter(user_id)
+    with get_read_session() as session:
+        rows = _unseen_rows(session, generation, limit, after, seen)
+        if not rows and cursor and session.exec(_generation_query(generation, 1)).first() is None:
+            raise _expired(generation)
+    return _page(rows, limit)
+
+
+async def fetch_recommendations_async(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    user_id: str = DEFAULT_USER,
+    upcoming: Optional[UpcomingCovers] = None,
+) -> RecommendationsPayload:
+    """Async variant of :func:`fetch_recommendations`.
+
+    With ``upcoming``, the same query reads up to ``limit`` rows past the page and
+    passes their cover URLs on, so the next page can be warmed without re-reading it.
+    """
+
+    generation, after = _parse_cursor(cursor) if cursor else (await _current_generation_async(), None)
+    seen = await _seen_filter_async(user_id)
+    lookahead = limit if upcoming is not None else 0
+    async with get_async_read_session() as session:
+        rows = await _unseen_rows_async(session, generation, limit + lookahead, after, seen)
+        if not rows and cursor and (await session.exec(_generation_query(generation, 1))).first() is None:
+            raise _expired(generation)
+    if upcoming is not None:
+        _pass_upcoming(upcoming, [book for _, book in rows[limit : limit + lookahead]])
+    return _page(rows, limit)
+
+
+def _pass_upcoming(upcoming: UpcomingCovers, books: List[Book]) -> None:
+    urls = [book.cover_url for book in books if book.cover_url]
+    if urls:
+        upcoming(urls)
+
+
+async def stream_recommendations_async(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    user_id: str = DEFAULT_USER,
+    upcoming: Optional[UpcomingCovers] = None,
+) -> AsyncIterator[Union[RecommendationResponse, FeedCursor]]:
+    """Yield a page card by card as rows arrive, then a :class:`FeedCursor` trailer.
+
+    An expired cursor can only be detected on an empty page, so any error surfaces
+    from the first ``__anext__`` and callers can still answer 400. ``upcoming``
+    works as in :func:`fetch_recommendations_async`, before the trailer is sent.
+    """
+
+    generation, after = _parse_cursor(cursor) if cursor else (await _current_generation_async(), None)
+    seen = await _seen_filter_async(user_id)
+    async with get_async_read_session() as session:
+        # Unbounded: rows the reader has seen are skipped as they stream past.
+        result = await session.stream(_generation_query(generation, None, after))
+        last: Optional[Recommendation] = None
+        count = 0
+        ahead: List[Book] = []
+        lookahead = limit if upcoming is not None else 1
+        async for recommendation, book in result:
+            if seen(book.id):
+                continue
+            if count == limit:
+                ahead.append(book)
+                if len(ahead) == lookahead:
+                    break
+                continue
+            count += 1
+            last = recommendation
+            yield _to_response(recommendation, book)
+        await result.close()
+        more = bool(ahead)
+        if count == 0 and cursor and (await session.exec(_generation_query(generation, 1))).first() is None:
+            raise _expired(generation)
+    if upcoming is not None:
+        _pass_upcoming(upcoming, ahead)
+    yield FeedCursor(next_cursor=_next_cursor(last) if more and last is not None else None)
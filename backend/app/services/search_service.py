@@ -0,0 +1,372 @@
+"""Full-text search over the library's books.
+
+On SQLite the ``book_fts`` FTS5 table indexes title, author and description as
+external content of ``book``; triggers keep it current on every insert, update and
+delete, whichever code path writes the row. Other engines (or SQLite builds
+without FTS5) use :class:`BookSearchIndex`, an in-process inverted index rebuilt
+whenever the ``book`` data version moves. Both rank with BM25 weighted towards
+titles, match every query term as a prefix and page with an opaque cursor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import html
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect, text
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_async_read_session, get_engine, get_read_session
+from ..models import Book
+from ..schemas import BookResponse, BookSearchPayload, BookSearchResult
+from ..versioning import get_data_versions
+from .pagination import decode_cursor, encode_cursor
+
+FTS_TABLE = "book_fts"
+COLUMNS = ("title", "author", "description")
+# BM25 weight of a match in each column, in COLUMNS order.
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+MARK_START, MARK_END = "<mark>", "</mark>"
+# FTS5 wraps matches in these control characters; the text is then HTML-escaped and
+# they become MARK_START/MARK_END, so markup in a title is never passed through.
+_FTS_OPEN, _FTS_CLOSE = "\x02", "\x03"
+SNIPPET_TOKENS = 12
+
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, author, description, content='book', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author, description ON book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END""",
+)
+
+# Letters and digits only, like unicode61 (which also splits on underscores).
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Split text the way FTS5's ``unicode61`` tokenizer does: casefolded, accents removed."""
+
+    if not value:
+        return []
+    folded = unicodedata.normalize("NFKD", value.casefold())
+    stripped = "".join(char for char in folded if not unicodedata.combining(char))
+    return _TOKEN.findall(stripped)
+
+
+def search_index_ddl(dialect_name: str) -> Tuple[str, ...]:
+    """Statements :func:`install_search_index` runs on ``dialect_name``; part of the schema fingerprint."""
+
+    if dialect_name != "sqlite" or get_settings().search_backend == "memory":
+        return ()
+    return _FTS_DDL
+
+
+def install_search_index(connection) -> bool:
+    """Create the FTS5 table and its triggers on SQLite; returns whether FTS5 is in use.
+
+    A freshly created table is filled from ``book`` with FTS5's ``rebuild`` command.
+    """
+
+    statements = search_index_ddl(connection.dialect.name)
+    if not statements:
+        return False
+    created = FTS_TABLE not in inspect(connection).get_table_names()
+    try:
+        for statement in statements:
+            connection.execute(text(statement))
+    except Exception:  # SQLite built without FTS5
+        return False
+    if created:
+        connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+_fts_enabled: Optional[bool] = None
+
+
+def uses_fts() -> bool:
+    global _fts_enabled
+    if _fts_enabled is None:
+        engine = get_engine()
+        if not search_index_ddl(engine.dialect.name):
+            _fts_enabled = False
+        else:
+            with engine.connect() as connection:
+                _fts_enabled = FTS_TABLE in inspect(connection).get_table_names()
+    return _fts_enabled
+
+
+def _fts_query(terms: Sequence[str]) -> str:
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _parse_cursor(cursor: str, query: str) -> Tuple[float, int]:
+    values = decode_cursor(cursor)
+    score, book_id = values.get("score"), values.get("id")
+    if values.get("q") != query or not isinstance(score, (int, float)) or not isinstance(book_id, int):
+        raise ValueError("Invalid pagination cursor")
+    return float(score), book_id
+
+
+def _book_response(book: Book) -> BookResponse:
+    return BookResponse(
+        id=book.id,
+        title=book.title,
+        author=book.author,
+        description=book.description,
+        cover_url=book.cover_url,
+        reason=book.reason,
+    )
+
+
+def _payload(query: str, hits: List[Tuple[Book, float, str, str, Optional[str]]], limit: int) -> BookSearchPayload:
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        book, score = hits[-1][0], hits[-1][1]
+        next_cursor = encode_cursor({"q": query, "score": score, "id": book.id})
+    items = [
+        BookSearchResult(book=_book_response(book), score=score, title=title, author=author, snippet=snippet)
+        for book, score, title, author, snippet in hits
+    ]
+    return BookSearchPayload(items=items, next_cursor=next_cursor)
+
+
+# bm25() is lower-is-better; results expose its negation so higher scores rank first.
+_BM25 = f"bm25({FTS_TABLE}, {', '.join(str(weight) for weight in COLUMN_WEIGHTS)})"
+_FTS_SELECT = f"""
+    SELECT {FTS_TABLE}.rowid AS id, {_BM25} AS rank,
+        highlight({FTS_TABLE}, 0, :open, :close) AS title_hl,
+        highlight({FTS_TABLE}, 1, :open, :close) AS author_hl,
+        snippet({FTS_TABLE}, 2, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet
+    FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH :match {{after}}
+    ORDER BY rank, {FTS_TABLE}.rowid
+    LIMIT :limit
+"""
+
+
+def _fts_statement(terms: Sequence[str], after: Optional[Tuple[float, int]], limit: int):
+    params = {"match": _fts_query(terms), "limit": limit, "open": _FTS_OPEN, "close": _FTS_CLOSE}
+    clause = ""
+    if after is not None:
+        clause = f"AND ({_BM25} > :rank OR ({_BM25} = :rank AND {FTS_TABLE}.rowid > :id))"
+        params.update(rank=-after[0], id=after[1])
+    return text(_FTS_SELECT.format(after=clause)).bindparams(**params)
+
+
+def _fts_markup(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return value
+    return html.escape(value).replace(_FTS_OPEN, MARK_START).replace(_FTS_CLOSE, MARK_END)
+
+
+def _fts_hits(rows, books: Dict[int, Book]) -> List[Tuple[Book, float, str, str, Optional[str]]]:
+    return [
+        (
+            books[row.id],
+            -row.rank,
+            _fts_markup(row.title_hl),
+            _fts_markup(row.author_hl),
+            _fts_markup(row.snippet) or None,
+        )
+        for row in rows
+        if row.id in books
+    ]
+
+
+class _Posting(NamedTuple):
+    book_id: int
+    counts: Tuple[int, ...]
+
+
+class BookSearchIndex:
+    """In-process inverted index reproducing the FTS5 search for non-SQLite engines.
+
+    Postings map each token to ``(book_id, per-column counts)``; prefix terms expand
+    through the sorted vocabulary with ``bisect``. Scores follow FTS5's ``bm25``:
+    per-column weighted term frequency, Okapi saturation with ``k1=1.2``, ``b=0.75``
+    over each book's total token count, and IDF floored at ``1e-6``.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, books: Sequence[Book]) -> None:
+        self.books: Dict[int, Book] = {}
+        self.lengths: Dict[int, int] = {}
+        postings: Dict[str, List[_Posting]] = defaultdict(list)
+        for book in books:
+            self.books[book.id] = book
+            columns = [tokenize(getattr(book, column)) for column in COLUMNS]
+            self.lengths[book.id] = sum(len(tokens) for tokens in columns)
+            counts: Dict[str, List[int]] = defaultdict(lambda: [0] * len(COLUMNS))
+            for position, tokens in enumerate(columns):
+                for token in tokens:
+                    counts[token][position] += 1
+            for token, per_column in counts.items():
+                postings[token].append(_Posting(book.id, tuple(per_column)))
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        self.average_length = sum(self.lengths.values()) / len(self.lengths) if self.lengths else 0.0
+
+    def _term_score(self, book_id: int, frequency: float, total: int, hits: int) -> float:
+        idf = max(1e-6, math.log((total - hits + 0.5) / (hits + 0.5)))
+        norm = 1 - self.B + self.B * self.lengths[book_id] / (self.average_length or 1.0)
+        return idf * frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+
+    def _expand(self, term: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + "\U0010ffff")
+        return self.vocabulary[start:end]
+
+    def search(
+        self, terms: Sequence[str], after: Optional[Tuple[float, int]], limit: int
+    ) -> List[Tuple[Book, float, str, str, Optional[str]]]:
+        if not terms or not self.books:
+            return []
+        total = len(self.books)
+        scores: Dict[int, float] = {}
+        matched_tokens = set()
+        for position, term in enumerate(terms):
+            frequencies: Dict[int, float] = defaultdict(float)
+            containing = set()
+            for token in self._expand(term):
+                matched_tokens.add(token)
+                for posting in self.postings[token]:
+                    containing.add(posting.book_id)
+                    if position and posting.book_id not in scores:
+                        continue  # every term must match
+                    frequencies[posting.book_id] += sum(
+                        weight * count for weight, count in zip(COLUMN_WEIGHTS, posting.counts)
+                    )
+            if not frequencies:
+                return []
+            scores = {
+                book_id: scores.get(book_id, 0.0) + self._term_score(book_id, freq, total, len(containing))
+                for book_id, freq in frequencies.items()
+            }
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if after is not None:
+            ranked = [(book_id, score) for book_id, score in ranked if (-score, book_id) > (-after[0], after[1])]
+        hits = []
+        for book_id, score in ranked[:limit]:
+            book = self.books[book_id]
+            hits.append(
+                (
+                    book,
+                    score,
+                    _highlight(book.title, matched_tokens),
+                    _highlight(book.author, matched_tokens),
+                    _snippet(book.description, matched_tokens),
+                )
+            )
+        return hits
+
+
+def _spans(value: str) -> List[Tuple[int, int, str]]:
+    return [(match.start(), match.end(), tokenize(match.group())[0]) for match in _TOKEN.finditer(value)]
+
+
+def _highlight(value: Optional[str], tokens) -> str:
+    """HTML-escape ``value`` and wrap the matched tokens in ``<mark>``."""
+
+    if not value:
+        return value or ""
+    parts, last = [], 0
+    for start, end, token in _spans(value):
+        if token in tokens:
+            parts += [html.escape(value[last:start]), MARK_START, html.escape(value[start:end]), MARK_END]
+            last = end
+    return "".join(parts) + html.escape(value[last:])
+
+
+def _snippet(value: Optional[str], tokens) -> Optional[str]:
+    """Up to ``SNIPPET_TOKENS`` tokens around the first match, like FTS5's ``snippet``."""
+
+    if not value:
+        return None
+    spans = _spans(value)
+    first = next((position for position, span in enumerate(spans) if span[2] in tokens), None)
+    if first is None:
+        return None
+    start = max(0, min(first - SNIPPET_TOKENS // 4, len(spans) - SNIPPET_TOKENS))
+    window = spans[start : start + SNIPPET_TOKENS]
+    begin = window[0][0] if start else 0
+    end = window[-1][1] if start + SNIPPET_TOKENS < len(spans) else len(value)
+    marked = _highlight(value[begin:end], tokens)
+    return ("…" if begin else "") + marked + ("…" if end < len(value) else "")
+
+
+_memory_index: Optional[Tuple[int, BookSearchIndex]] = None
+_memory_lock = threading.Lock()
+
+
+def _get_memory_index() -> BookSearchIndex:
+    """Return the in-process index, rebuilding it when the ``book`` data version moved."""
+
+    global _memory_index
+    version = get_data_versions(["book"])["book"]
+    with _memory_lock:
+        if _memory_index is None or _memory_index[0] != version:
+            with get_read_session() as session:
+                books = session.exec(select(Book)).all()
+            _memory_index = (version, BookSearchIndex(books))
+        return _memory_index[1]
+
+
+def _prepare(query: str, cursor: Optional[str]) -> Tuple[List[str], Optional[Tuple[float, int]]]:
+    after = _parse_cursor(cursor, query) if cursor else None
+    return tokenize(query), after
+
+
+def search_books(query: str, limit: int = 20, cursor: Optional[str] = None) -> BookSearchPayload:
+    """Rank books matching every term of ``query`` (each as a prefix), best first.
+
+    Raises ``ValueError`` for a malformed cursor or one issued for another query.
+    """
+
+    terms, after = _prepare(query, cursor)
+    if not terms:
+        return BookSearchPayload(items=[])
+    if not uses_fts():
+        return _payload(query, _get_memory_index().search(terms, after, limit + 1), limit)
+    with get_read_session() as session:
+        rows = session.execute(_fts_statement(terms, after, limit + 1)).all()
+        books = {book.id: book for book in session.exec(select(Book).where(Book.id.in_([row.id for row in rows])))}
+    return _payload(query, _fts_hits(rows, books), limit)
+
+
+async def search_books_async(query: str, limit: int = 20, cursor: Optional[str] = None) -> BookSearchPayload:
+    """Async variant of :func:`search_books`; the in-process fallback runs in a thread."""
+
+    terms, after = _prepare(query, cursor)
+    if not terms:
+        return BookSearchPayload(items=[])
+    if not uses_fts():
+        return await asyncio.to_thread(search_books, query, limit, cursor)
+    async with get_async_read_session() as session:
+        rows = (await session.execute(_fts_statement(terms, after, limit + 1))).all()
+        ids = [row.id for row in rows]
+        books = {book.id: book for book in (await session.exec(select(Book).where(Book.id.in_(ids)))).all()}
+    return _payload(query, _fts_hits(rows, books), limit)
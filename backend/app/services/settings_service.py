@@ -1,20 +1,105 @@
+import threading
+import time
+from typing import Optional, Tuple
+
 from sqlmodel import select
 
-from ..database import get_session
-from ..models import AppSettings
+from ..config import get_settings
+from ..database import get_async_read_session, get_read_session, get_session
+from ..models import AppSettings, DataVersion
 from ..schemas import SettingsResponse, SettingsUpdate
+from ..versioning import get_data_versions, get_data_versions_async
 from .log_service import record_log
 
 
-def get_settings_snapshot() -> SettingsResponse:
+class _SettingsCache:
+    """Process-wide snapshot of the ``AppSettings`` row.
+
+    Reads within ``check_interval`` seconds of the last check are served from memory.
+    After that, one primary-key lookup of the ``appsettings`` data version tells
+    whether another worker has written since; only then is the row reloaded. The
+    snapshot is one ``(value, version)`` tuple, replaced by a single assignment, so
+    async readers can swap it without taking ``lock``.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.entry: Optional[Tuple[AppSettings, int]] = None
+        self.checked_at = 0.0
+
+    def store(self, row: Optional[AppSettings], version: int) -> AppSettings:
+        """Install a snapshot unless a newer version is already cached; returns the cached value."""
+
+        value = AppSettings(**row.model_dump()) if row is not None else AppSettings()
+        current = self.entry
+        if current is not None and current[1] > version:
+            return current[0]
+        self.entry = (value, version)
+        self.checked_at = time.monotonic()
+        return value
+
+    def invalidate(self) -> None:
+        self.entry = None
+
+
+_cache = _SettingsCache()
+
+
+def _current_version() -> int:
+    return get_data_versions(["appsettings"])["appsettings"]
+
+
+def ensure_settings_row() -> None:
+    """Create the singleton settings row; called once at startup."""
+
     with get_session() as session:
-        settings = session.exec(select(AppSettings)).first()
-        if not settings:
-            settings = AppSettings()
-            session.add(settings)
-            session.commit()
-            session.refresh(settings)
-    response = SettingsResponse(
+        if session.exec(select(AppSettings.id)).first() is None:
+            session.add(AppSettings())
+    _cache.invalidate()
+
+
+def get_app_settings() -> AppSettings:
+    """Return the cached settings row. Treat the result as read-only."""
+
+    with _cache.lock:
+        now = time.monotonic()
+        entry = _cache.entry
+        if entry is not None and now - _cache.checked_at < get_settings().settings_cache_check_interval:
+            return entry[0]
+        version = _current_version()
+        entry = _cache.entry
+        if entry is not None and version == entry[1]:
+            _cache.checked_at = now
+            return entry[0]
+        with get_read_session() as session:
+            row = session.exec(select(AppSettings)).first()
+        return _cache.store(row, version)
+
+
+async def get_app_settings_async() -> AppSettings:
+    """Async variant of :func:`get_app_settings`.
+
+    It never takes the cache lock, which the sync path holds across DB round
+    trips; the snapshot is read and replaced as a whole, so the event loop never
+    waits on a writer thread.
+    """
+
+    now = time.monotonic()
+    entry, checked_at = _cache.entry, _cache.checked_at
+    if entry is not None and now - checked_at < get_settings().settings_cache_check_interval:
+        return entry[0]
+    version = (await get_data_versions_async(["appsettings"]))["appsettings"]
+    entry = _cache.entry
+    if entry is not None and version == entry[1]:
+        _cache.checked_at = now
+        return entry[0]
+    async with get_async_read_session() as session:
+        row = (await session.exec(select(AppSettings))).first()
+    return _cache.store(row, version)
+
+
+def _to_response(settings: AppSettings) -> SettingsResponse:
+    return SettingsResponse(
         abs_url=settings.abs_url,
         google_books_api_key=settings.google_books_api_key,
         open_library_enabled=settings.open_library_enabled,
@@ -24,7 +109,14 @@ def get_settings_snapshot() -> SettingsResponse:
         llm_model=settings.llm_model,
         demo_mode=settings.demo_mode,
     )
-    return response
+
+
+def get_settings_snapshot() -> SettingsResponse:
+    return _to_response(get_app_settings())
+
+
+async def get_settings_snapshot_async() -> SettingsResponse:
+    return _to_response(await get_app_settings_async())
 
 
 def update_settings(payload: SettingsUpdate) -> SettingsResponse:
@@ -32,28 +124,23 @@ def update_settings(payload: SettingsUpdate) -> SettingsResponse:
         settings = session.exec(select(AppSettings)).first()
         if not settings:
             settings = AppSettings()
-            session.add(settings)
-            session.commit()
-            session.refresh(settings)
         update_data = payload.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(settings, key, value)
         session.add(settings)
+        session.flush()
+        # Read the version bumped by this transaction so a concurrent write from
+        # another worker can't be masked by our snapshot.
+        current = session.get(DataVersion, "appsettings")
+        version = current.version if current else 0
         session.commit()
         session.refresh(settings)
-    response = SettingsResponse(
-        abs_url=settings.abs_url,
-        google_books_api_key=settings.google_books_api_key,
-        open_library_enabled=settings.open_library_enabled,
-        embedding_provider=settings.embedding_provider,
-        embedding_model=settings.embedding_model,
-        llm_provider=settings.llm_provider,
-        llm_model=settings.llm_model,
-        demo_mode=settings.demo_mode,
-    )
+    # Only the swap is locked; the write above may queue for the writer connection.
+    with _cache.lock:
+        cached = _cache.store(settings, version)
     record_log(
         "INFO",
         "Settings updated",
-        context={"abs_url": bool(settings.abs_url), "demo_mode": settings.demo_mode},
+        context={"abs_url": bool(cached.abs_url), "demo_mode": cached.demo_mode},
     )
-    return response
+    return _to_response(cached)
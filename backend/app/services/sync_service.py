@@ -1,14 +1,33 @@
-import random
-import time
-from datetime import datetime
-from typing import List
+from __future__ import annotations
 
+import asyncio
+import math
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from sqlalchemy import delete, insert, update
 from sqlmodel import select
 
-from ..database import get_session
-from ..models import Book, SyncJob
-from ..schemas import BookResponse, RecommendationResponse
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..lazy import lazy_import
+from ..models import Book, BookTrope, Feedback, LibrarySyncState, Recommendation, SyncJob
+from ..versioning import bump_data_versions, user_scope
+from .abs_client import AbsClient
+from .enrichment_service import run_enrichment
+from .job_queue import enqueue_job
 from .log_service import record_log
+from .pagination import to_naive_utc
+from .recommendation_service import precompute_recommendations
+from .settings_service import get_app_settings
+from .trope_profile import apply_profile_deltas
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = lazy_import("httpx")
 
 
 SEED_BOOKS: List[dict] = [
@@ -48,78 +67,310 @@ def _seed_books(session) -> None:
     session.commit()
 
 
-def run_sync_job(job: SyncJob) -> None:
-    """Simulate a sync against external services."""
+@dataclass
+class _PageBatch:
+    library_id: str
+    page: int
+    total_pages: int
+    items: List[dict]
+
+
+@dataclass
+class _LibraryDone:
+    library_id: str
+    name: Optional[str]
+    high_water_mark: Optional[int]
+    items: int
+    # Every item id seen by a full pass; ``None`` for incremental passes.
+    seen: Optional[Set[str]] = None
+
+
+def _book_values(item: dict, library_id: str, client: AbsClient) -> dict:
+    metadata = (item.get("media") or {}).get("metadata") or {}
+    return {
+        "title": metadata.get("title") or "Untitled",
+        "author": metadata.get("authorName") or metadata.get("author") or "Unknown author",
+        "description": metadata.get("description"),
+        "cover_url": client.cover_url(item["id"]),
+        "book_metadata": {
+            "abs": {
+                key: metadata.get(key)
+                for key in ("subtitle", "seriesName", "genres", "publishedYear", "isbn", "asin", "narratorName")
+                if metadata.get(key)
+            }
+        },
+        "abs_item_id": item["id"],
+        "abs_library_id": library_id,
+        "abs_updated_at": item.get("updatedAt"),
+    }
 
-    record_log("INFO", "Starting demo sync job", context={"job_id": job.id})
-    time.sleep(0.5)
+
+def _write_page(job_id: int, batch: _PageBatch, client: AbsClient) -> int:
+    """Upsert one page of ABS items and record page progress on the job row."""
+
+    rows = [_book_values(item, batch.library_id, client) for item in batch.items]
     with get_session() as session:
-        persisted_job = session.get(SyncJob, job.id)
-        if not persisted_job:
-            return
-        persisted_job.status = "running"
-        session.add(persisted_job)
-        session.commit()
-        session.refresh(persisted_job)
+        if rows:
+            existing = dict(
+                session.exec(
+                    select(Book.abs_item_id, Book.id).where(Book.abs_item_id.in_([row["abs_item_id"] for row in rows]))
+                ).all()
+            )
+            inserts = [row for row in rows if row["abs_item_id"] not in existing]
+            updates = [{"id": existing[row["abs_item_id"]], **row} for row in rows if row["abs_item_id"] in existing]
+            if inserts:
+                session.execute(insert(Book), inserts)
+            if updates:
+                session.execute(update(Book), updates)
+        job = session.get(SyncJob, job_id)
+        if job:
+            progress = dict(job.progress or {})
+            library = dict(progress.get(batch.library_id) or {})
+            library["pages"] = library.get("pages", 0) + 1
+            library["total_pages"] = batch.total_pages
+            library["items"] = library.get("items", 0) + len(rows)
+            progress[batch.library_id] = library
+            job.progress = progress
+            job.items_processed += len(rows)
+            job.message = f"Synced page {batch.page + 1}/{batch.total_pages} of library {batch.library_id}"
+            session.add(job)
+    return len(rows)
+
+
+def _remove_missing_books(session, library_id: str, seen: Set[str]) -> int:
+    """Delete the library's books that a full pass no longer found in ABS, with their dependants."""
 
+    missing = [
+        book_id
+        for book_id, item_id in session.exec(
+            select(Book.id, Book.abs_item_id).where(Book.abs_library_id == library_id)
+        ).all()
+        if item_id not in seen
+    ]
+    if not missing:
+        return 0
+    tropes = Counter()
+    for (trope,) in session.exec(select(BookTrope.trope).where(BookTrope.book_id.in_(missing))).all():
+        tropes[trope] -= 1
+    apply_profile_deltas(session, tropes)
+    readers = set(session.exec(select(Feedback.user_id).where(Feedback.book_id.in_(missing))).all())
+    if readers:
+        bump_data_versions(session, [user_scope(reader) for reader in readers])
+    for model in (BookTrope, Feedback, Recommendation):
+        session.exec(delete(model).where(model.book_id.in_(missing)))
+    session.exec(delete(Book).where(Book.id.in_(missing)))
+    return len(missing)
+
+
+def _write_library_state(done: _LibraryDone) -> int:
+    """Record a finished library pass; a full pass also removes books deleted from ABS."""
+
+    removed = 0
     with get_session() as session:
-        _seed_books(session)
-        persisted_job = session.get(SyncJob, job.id)
-        if not persisted_job:
-            return
-        persisted_job.status = "completed"
-        persisted_job.finished_at = datetime.utcnow()
-        persisted_job.message = "Demo sync populated seed titles"
-        session.add(persisted_job)
-        session.commit()
-    record_log("INFO", "Demo sync completed", context={"job_id": job.id})
+        state = session.get(LibrarySyncState, done.library_id) or LibrarySyncState(library_id=done.library_id)
+        state.name = done.name
+        if done.high_water_mark is not None:
+            state.high_water_mark = max(state.high_water_mark or 0, done.high_water_mark)
+        state.items_synced += done.items
+        state.last_synced_at = datetime.utcnow()
+        if done.seen is not None:
+            removed = _remove_missing_books(session, done.library_id, done.seen)
+            state.last_full_sync_at = state.last_synced_at
+        session.add(state)
+    return removed
 
 
-def start_sync_job() -> SyncJob:
+def _library_states() -> Dict[str, LibrarySyncState]:
+    with get_read_session() as session:
+        return {state.library_id: state for state in session.exec(select(LibrarySyncState))}
+
+
+def _needs_full_pass(state: Optional[LibrarySyncState], interval_hours: float) -> bool:
+    if state is None or state.high_water_mark is None or state.last_full_sync_at is None:
+        return True
+    return datetime.utcnow() - to_naive_utc(state.last_full_sync_at) >= timedelta(hours=interval_hours)
+
+
+async def _produce_library(
+    client: AbsClient,
+    library: dict,
+    high_water_mark: Optional[int],
+    queue: "asyncio.Queue",
+    page_size: int,
+    parallelism: int,
+    full: bool = False,
+) -> None:
+    """Page through one library newest-first and stop at the high-water mark.
+
+    After the first page reveals the total, pages are fetched in concurrent waves of
+    ``parallelism``; a page holding an item at or below the mark ends the scan. A
+    ``full`` pass ignores the mark, reads every page and reports every item id it saw
+    so deletions can be reconciled.
+
+    The new mark is the newest ``updatedAt`` on the first page, not the newest item
+    seen anywhere in the scan: an item edited mid-scan jumps to page 0 after it was
+    read and may be missed by the offset pages, but its ``updatedAt`` is then above
+    that snapshot, so the next sync picks it up.
+    """
+
+    library_id = library["id"]
+    mark = None if full else high_water_mark
+    seen: Optional[Set[str]] = set() if full else None
+    count = 0
+    first = await client.library_items_page(library_id, 0, page_size)
+    newest = max((item.get("updatedAt") or 0 for item in first.get("results") or []), default=None)
+    total_pages = max(1, math.ceil((first.get("total") or 0) / page_size))
+    pending = [(0, first)]
+    next_page = 1
+    while pending:
+        reached_mark = False
+        for page, payload in pending:
+            items = payload.get("results") or []
+            fresh = [item for item in items if mark is None or (item.get("updatedAt") or 0) > mark]
+            if seen is not None:
+                seen.update(item["id"] for item in items)
+            count += len(fresh)
+            await queue.put(_PageBatch(library_id, page, total_pages, fresh))
+            if len(fresh) < len(items) or not items:
+                reached_mark = True
+                break
+        if reached_mark or next_page >= total_pages:
+            break
+        wave = list(range(next_page, min(total_pages, next_page + parallelism)))
+        payloads = await asyncio.gather(*(client.library_items_page(library_id, page, page_size) for page in wave))
+        pending = list(zip(wave, payloads))
+        next_page += len(wave)
+    await queue.put(_LibraryDone(library_id, library.get("name"), newest, count, seen))
+
+
+async def _produce_all(
+    client: AbsClient, queue: "asyncio.Queue", page_size: int, parallelism: int, full_sync_hours: float
+) -> None:
+    states = await asyncio.to_thread(_library_states)
+    libraries = await client.libraries()
+    try:
+        await asyncio.gather(
+            *(
+                _produce_library(
+                    client,
+                    library,
+                    getattr(states.get(library["id"]), "high_water_mark", None),
+                    queue,
+                    page_size,
+                    parallelism,
+                    full=_needs_full_pass(states.get(library["id"]), full_sync_hours),
+                )
+                for library in libraries
+            )
+        )
+    finally:
+        await queue.put(None)
+
+
+async def sync_library(
+    job_id: int,
+    base_url: str,
+    token: str,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> int:
+    """Incrementally sync every ABS book library into the ``Book`` table.
+
+    Pages flow through a bounded queue to a single writer, so at most a few pages are
+    held in memory and SQLite sees one writer. A library's high-water mark only
+    advances after all of its pages have been written. Every
+    ``abs_full_sync_interval_hours`` a library gets a full pass instead, which also
+    deletes local books whose ABS items are gone.
+    """
+
+    settings = get_settings()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.abs_max_concurrency * 2)
+    written = 0
+    async with AbsClient(
+        base_url,
+        token,
+        max_concurrency=settings.abs_max_concurrency,
+        timeout=settings.abs_timeout,
+        transport=transport,
+    ) as client:
+        producer = asyncio.create_task(
+            _produce_all(
+                client,
+                queue,
+                settings.abs_page_size,
+                settings.abs_max_concurrency,
+                settings.abs_full_sync_interval_hours,
+            )
+        )
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            if isinstance(message, _PageBatch):
+                written += await asyncio.to_thread(_write_page, job_id, message, client)
+            else:
+                removed = await asyncio.to_thread(_write_library_state, message)
+                if removed:
+                    record_log(
+                        "INFO",
+                        "Removed books deleted from Audiobookshelf",
+                        context={"library_id": message.library_id, "removed": removed},
+                    )
+        await producer
+    return written
+
+
+def _update_job(job_id: int, **values) -> None:
     with get_session() as session:
-        job = SyncJob(status="queued", message="Sync scheduled")
+        job = session.get(SyncJob, job_id)
+        if not job:
+            return
+        for key, value in values.items():
+            setattr(job, key, value)
         session.add(job)
-        session.commit()
-        session.refresh(job)
-    return job
 
 
-def get_last_job() -> SyncJob | None:
-    with get_session() as session:
-        return session.exec(select(SyncJob).order_by(SyncJob.started_at.desc())).first()
+def run_sync_job(job: SyncJob, transport: Optional[httpx.AsyncBaseTransport] = None) -> str:
+    """Sync from Audiobookshelf, or seed demo titles when no server is configured.
 
+    Runs as the ``abs_sync`` queue handler: errors propagate so the queue can retry
+    the job, and the returned text becomes the job's final message.
+    """
 
-def get_recommendations(limit: int = 10) -> List[RecommendationResponse]:
-    with get_session() as session:
-        books = list(session.exec(select(Book).limit(limit)))
-        if not books:
+    snapshot = get_app_settings()
+    abs_token = snapshot.abs_token
+    if snapshot.demo_mode or not snapshot.abs_url or not abs_token:
+        record_log("INFO", "Starting demo sync job", context={"job_id": job.id})
+        with get_session() as session:
             _seed_books(session)
-            books = list(session.exec(select(Book).limit(limit)))
-        recommendations = []
-        for book in books:
-            explanation = book.reason or random.choice(
-                [
-                    "Shares the same slow-burn magic academy vibe you love.",
-                    "Features a fierce heroine and a brooding mage love interest.",
-                    "Combines political intrigue with enchanting worldbuilding.",
-                ]
-            )
-            score = round(random.uniform(0.7, 0.99), 3)
-            book_payload = {
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "description": book.description,
-                "cover_url": book.cover_url,
-                "reason": book.reason,
-            }
-            recommendations.append(
-                RecommendationResponse(
-                    id=book.id,
-                    book=BookResponse(**book_payload),
-                    score=score,
-                    explanation=explanation,
-                    generated_at=datetime.utcnow(),
-                )
-            )
-    return recommendations
+        record_log("INFO", "Demo sync completed", context={"job_id": job.id})
+        precompute_recommendations(reason="sync")
+        return "Demo sync populated seed titles"
+
+    record_log("INFO", "Starting Audiobookshelf sync job", context={"job_id": job.id, "abs_url": snapshot.abs_url})
+    _update_job(job.id, message="Contacting Audiobookshelf")
+    try:
+        written = asyncio.run(sync_library(job.id, snapshot.abs_url, abs_token, transport=transport))
+    except (httpx.HTTPError, KeyError, ValueError) as exc:
+        record_log("ERROR", "Audiobookshelf sync failed", context={"job_id": job.id, "error": str(exc)})
+        raise
+    record_log("INFO", "Audiobookshelf sync completed", context={"job_id": job.id, "items": written})
+    try:
+        run_enrichment()
+    except httpx.HTTPError as exc:
+        record_log("ERROR", "Metadata enrichment failed", source="enrichment", context={"error": str(exc)})
+    precompute_recommendations(reason="sync")
+    return f"Synced {written} changed items"
+
+
+def start_sync_job() -> SyncJob:
+    """Queue an ABS sync; a sync that is already waiting is returned instead."""
+
+    job, _ = enqueue_job("abs_sync", message="Sync scheduled")
+    return job
+
+
+def get_last_job(job_type: str = "abs_sync") -> SyncJob | None:
+    with get_read_session() as session:
+        return session.exec(
+            select(SyncJob).where(SyncJob.job_type == job_type).order_by(SyncJob.started_at.desc(), SyncJob.id.desc())
+        ).first()
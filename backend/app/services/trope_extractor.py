@@ -0,0 +1,352 @@
+"""Trope extraction providers and the content-hash result cache.
+
+Providers tag many books per call: books are sent ``trope_llm_batch_size`` to a
+prompt with at most ``trope_llm_concurrency`` prompts in flight. Results are cached
+in ``tropeextractioncache`` under a hash of the book's text, the provider and model,
+and :data:`PROMPT_VERSION`, so re-running extraction only calls the provider for
+books whose text, model or prompt changed. Each batch is cached as it completes and
+transient provider errors are retried, so one failed prompt costs only its own books.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..lazy import lazy_import
+from ..models import TropeExtractionCache
+from .http_cache import RETRYABLE_STATUS, TokenBucket, retry_after_seconds
+from .log_service import record_log
+from .settings_service import get_app_settings
+
+if TYPE_CHECKING:
+    import httpx
+else:
+    httpx = lazy_import("httpx")
+
+# Bump when the prompt or response parsing changes; it invalidates every cached result.
+PROMPT_VERSION = 1
+MAX_TROPES = 5
+# Base delay in seconds before retrying a prompt that has no Retry-After header.
+RETRY_BACKOFF = 1.0
+
+TROPE_LIBRARY: List[str] = [
+    "enemies to lovers",
+    "forbidden romance",
+    "forced proximity",
+    "mates bond",
+    "magical academy",
+    "morally gray hero",
+    "slow burn",
+    "found family",
+    "royal intrigue",
+    "redemption arc",
+]
+
+BOOK_TROPE_ASSIGNMENTS = {
+    "Dragon's Embrace": ["mates bond", "morally gray hero", "forbidden romance"],
+    "Moonlit Oath": ["forced proximity", "slow burn", "royal intrigue"],
+    "Academy of Thorns": ["magical academy", "enemies to lovers", "found family"],
+    "Stormbound Hearts": ["redemption arc", "slow burn", "forbidden romance"],
+}
+
+# Words that make the local provider pick a trope before falling back to hashing.
+TROPE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "enemies to lovers": ("rival", "rivals", "enemy", "enemies", "nemesis"),
+    "forbidden romance": ("forbidden", "forbid", "taboo"),
+    "forced proximity": ("stranded", "trapped", "engagement", "bargain", "bound"),
+    "mates bond": ("mate", "mates", "soulmate", "bond", "fated"),
+    "magical academy": ("academy", "school", "student", "scholarship"),
+    "morally gray hero": ("brooding", "assassin", "villain", "pirate"),
+    "slow burn": ("slowly", "longing", "yearning"),
+    "found family": ("crew", "family", "companions", "guardians"),
+    "royal intrigue": ("throne", "court", "prince", "princess", "queen", "king", "politics"),
+    "redemption arc": ("redemption", "exiled", "atone", "reconcile"),
+}
+
+ExtractedTropes = List[Tuple[str, float]]
+
+
+@dataclass(frozen=True)
+class TropeBook:
+    id: int
+    title: str
+    author: str
+    description: Optional[str]
+
+
+class TropeProvider(Protocol):
+    name: str
+    model: str
+    source: str
+
+    async def extract_batch(self, http: httpx.AsyncClient, books: Sequence[TropeBook]) -> Dict[int, ExtractedTropes]:
+        """Return ``{book_id: [(trope, confidence), ...]}`` for the books it could tag."""
+
+
+def _digest(*parts: str) -> int:
+    return int.from_bytes(hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class LocalTropeProvider:
+    """Deterministic offline tagger used in demo mode and tests.
+
+    Seeded titles keep their curated tropes; other books get keyword-matched tropes
+    topped up to three by a stable hash of the book's text.
+    """
+
+    name = "local"
+    model = "keyword-stub"
+    source = "demo-llm"
+
+    def tropes_for(self, book: TropeBook) -> ExtractedTropes:
+        text = " ".join(part for part in (book.title, book.author, book.description) if part)
+        chosen = list(BOOK_TROPE_ASSIGNMENTS.get(book.title, []))
+        if not chosen:
+            words = set(text.lower().replace("-", " ").split())
+            chosen = [trope for trope in TROPE_LIBRARY if words & set(TROPE_KEYWORDS.get(trope, ()))][:3]
+            for trope in sorted(TROPE_LIBRARY, key=lambda trope: _digest(text, trope)):
+                if len(chosen) >= 3:
+                    break
+                if trope not in chosen:
+                    chosen.append(trope)
+        return [(trope, round(0.6 + (_digest(text, trope, "confidence") % 36) / 100, 3)) for trope in chosen]
+
+    async def extract_batch(self, http: httpx.AsyncClient, books: Sequence[TropeBook]) -> Dict[int, ExtractedTropes]:
+        return {book.id: self.tropes_for(book) for book in books}
+
+
+SYSTEM_PROMPT = (
+    "You tag books with reader-facing romance and fantasy tropes. For each book in the user's JSON list, "
+    f"return up to {MAX_TROPES} short lowercase tropes with a confidence between 0 and 1. Prefer these when "
+    "they fit: {library}. Respond with JSON: "
+    '{{"books": [{{"id": <id>, "tropes": [{{"trope": "<trope>", "confidence": <0-1>}}]}}]}}.'
+)
+
+
+def _parse_tropes(entries) -> ExtractedTropes:
+    tropes: ExtractedTropes = []
+    for entry in entries or []:
+        trope = str(entry.get("trope", "")).strip().lower() if isinstance(entry, dict) else ""
+        if not trope or any(trope == seen for seen, _ in tropes):
+            continue
+        try:
+            confidence = min(1.0, max(0.0, float(entry.get("confidence", 0.5))))
+        except (TypeError, ValueError):
+            confidence = 0.5
+        tropes.append((trope, round(confidence, 3)))
+    return tropes[:MAX_TROPES]
+
+
+class OpenAITropeProvider:
+    """Chat-completions tagger that sends a whole batch of books in one JSON prompt."""
+
+    name = "openai"
+    source = "llm"
+
+    def __init__(self, model: str, api_key: str) -> None:
+        self.model = model
+        self.api_key = api_key
+
+    async def extract_batch(self, http: httpx.AsyncClient, books: Sequence[TropeBook]) -> Dict[int, ExtractedTropes]:
+        payload = [
+            {"id": book.id, "title": book.title, "author": book.author, "description": book.description or ""}
+            for book in books
+        ]
+        response = await http.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model,
+                "temperature": 0,
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": SYSTEM_PROMPT.format(library=", ".join(TROPE_LIBRARY))},
+                    {"role": "user", "content": json.dumps(payload)},
+                ],
+            },
+        )
+        response.raise_for_status()
+        content = json.loads(response.json()["choices"][0]["message"]["content"])
+        wanted = {book.id for book in books}
+        results: Dict[int, ExtractedTropes] = {}
+        for item in content.get("books", []):
+            book_id = item.get("id") if isinstance(item, dict) else None
+            if book_id in wanted:
+                results[book_id] = _parse_tropes(item.get("tropes"))
+        return results
+
+
+def get_trope_provider() -> TropeProvider:
+    """Resolve the configured LLM provider, falling back to the local stub when offline."""
+
+    snapshot = get_app_settings()
+    settings = get_settings()
+    if snapshot.llm_provider == "openai" and settings.openai_api_key and not snapshot.demo_mode:
+        return OpenAITropeProvider(model=snapshot.llm_model, api_key=settings.openai_api_key)
+    return LocalTropeProvider()
+
+
+def content_hash(book: TropeBook, provider: TropeProvider) -> str:
+    key = [PROMPT_VERSION, provider.name, provider.model, book.title, book.author, book.description or ""]
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+
+
+def _load_cached(hashes: Sequence[str]) -> Dict[str, ExtractedTropes]:
+    cached: Dict[str, ExtractedTropes] = {}
+    with get_read_session() as session:
+        for start in range(0, len(hashes), 500):
+            for key, tropes in session.exec(
+                select(TropeExtractionCache.content_hash, TropeExtractionCache.tropes).where(
+                    TropeExtractionCache.content_hash.in_(hashes[start : start + 500])
+                )
+            ):
+                cached[key] = [(trope, confidence) for trope, confidence in tropes]
+    return cached
+
+
+def _store_cached(provider: TropeProvider, rows: Dict[str, ExtractedTropes]) -> None:
+    created_at = datetime.utcnow()
+    values = [
+        {
+            "content_hash": key,
+            "provider": provider.name,
+            "model": provider.model,
+            "prompt_version": PROMPT_VERSION,
+            "tropes": [list(pair) for pair in tropes],
+            "created_at": created_at,
+        }
+        for key, tropes in rows.items()
+    ]
+    with get_session() as session:
+        dialect = session.get_bind().dialect.name
+        if dialect == "sqlite":
+            statement = sqlite_insert(TropeExtractionCache).on_conflict_do_nothing(index_elements=["content_hash"])
+        elif dialect == "postgresql":
+            statement = postgresql_insert(TropeExtractionCache).on_conflict_do_nothing(index_elements=["content_hash"])
+        else:
+            statement = insert(TropeExtractionCache)
+        for start in range(0, len(values), 500):
+            session.execute(statement, values[start : start + 500])
+
+
+async def _extract_batch(
+    provider: TropeProvider,
+    http: httpx.AsyncClient,
+    batch: Sequence[TropeBook],
+    bucket: TokenBucket,
+    stats: Dict[str, int],
+) -> Dict[int, ExtractedTropes]:
+    """Run one prompt, retrying 429/5xx/network errors with backoff; counts attempts in ``stats``.
+
+    A ``Retry-After`` longer than ``http_max_retry_after`` fails the batch instead of
+    parking a worker slot on it.
+    """
+
+    settings = get_settings()
+    max_retries = settings.trope_llm_max_retries
+    attempt = 0
+    while True:
+        await bucket.acquire()
+        stats["provider_calls"] += 1
+        try:
+            return await provider.extract_batch(http, batch)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code not in RETRYABLE_STATUS or attempt >= max_retries:
+                raise
+            delay = retry_after_seconds(exc.response.headers.get("Retry-After"))
+            if delay is not None and delay > settings.http_max_retry_after:
+                raise
+        except httpx.TransportError:
+            if attempt >= max_retries:
+                raise
+            delay = None
+        if delay is None:
+            delay = RETRY_BACKOFF * (2**attempt) * (1 + random.random())
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _extract(
+    provider: TropeProvider,
+    books: Sequence[TropeBook],
+    hashes: Mapping[int, str],
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Tuple[Dict[int, ExtractedTropes], Dict[str, int]]:
+    """Send ``books`` to the provider in batches, caching each batch as it completes.
+
+    A batch that still fails after its retries is skipped, so its books come back
+    untagged instead of discarding the batches that succeeded.
+    """
+
+    settings = get_settings()
+    size = max(1, settings.trope_llm_batch_size)
+    batches = [books[start : start + size] for start in range(0, len(books), size)]
+    concurrency = max(1, settings.trope_llm_concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(settings.trope_llm_rate_limit, concurrency)
+    results: Dict[int, ExtractedTropes] = {}
+    stats = {"provider_calls": 0, "failed": 0}
+
+    async with httpx.AsyncClient(timeout=settings.trope_llm_timeout, transport=transport) as http:
+
+        async def run(batch: Sequence[TropeBook]) -> None:
+            async with semaphore:
+                try:
+                    extracted = await _extract_batch(provider, http, batch, bucket, stats)
+                except (httpx.HTTPError, ValueError, KeyError, IndexError) as exc:
+                    stats["failed"] += len(batch)
+                    record_log(
+                        "WARNING",
+                        "Trope extraction batch failed",
+                        source="trope-engine",
+                        context={"books": len(batch), "provider": provider.name, "error": str(exc)},
+                    )
+                    return
+            if extracted:
+                await asyncio.to_thread(
+                    _store_cached, provider, {hashes[book_id]: tropes for book_id, tropes in extracted.items()}
+                )
+            results.update(extracted)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+    return results, stats
+
+
+def resolve_tropes(
+    books: Sequence[TropeBook],
+    provider: Optional[TropeProvider] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Tuple[Dict[int, ExtractedTropes], Dict[str, int]]:
+    """Return tropes for each book the provider could tag, plus cache statistics.
+
+    Cached results are reused; the rest go to the provider in batches and each
+    batch is cached as soon as it returns. Books the provider left out, or whose
+    batch failed after retries (counted in ``failed``), are missing from the result.
+    """
+
+    provider = provider or get_trope_provider()
+    hashes = {book.id: content_hash(book, provider) for book in books}
+    cached = _load_cached(sorted(set(hashes.values())))
+    missing = [book for book in books if hashes[book.id] not in cached]
+    extracted, calls = (
+        asyncio.run(_extract(provider, missing, hashes, transport))
+        if missing
+        else ({}, {"provider_calls": 0, "failed": 0})
+    )
+    results = {book.id: cached[hashes[book.id]] for book in books if hashes[book.id] in cached}
+    results.update(extracted)
+    stats = {"cached": len(books) - len(missing), "extracted": len(extracted), **calls}
+    return results, stats
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from ..lazy import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+
+# Padding slot in the candidate x trope matrix. Indexing a per-trope array of
+# length ``vocab + 1`` with -1 lands on the trailing slot, which always holds 0.
+_PAD = -1
+
+
+class ScoredCandidate(NamedTuple):
+    index: int
+    score: float
+    matched_tropes: List[str]
+
+
+class TropeScoringIndex:
+    """Array-backed trope index over a candidate catalog.
+
+    Candidates are stored as a padded ``(n_candidates, max_tropes)`` int32 matrix of
+    interned trope ids (in the candidate's own trope order) plus a trope -> candidate
+    inverted index. Scoring touches only candidates that share a trope with the
+    profile and reproduces the per-candidate formula used by the trope feed exactly.
+    """
+
+    def __init__(self, candidate_tropes: Sequence[Sequence[str]]) -> None:
+        trope_ids: Dict[str, int] = {}
+        rows: List[int] = []
+        columns: List[int] = []
+        ids: List[int] = []
+        for row, tropes in enumerate(candidate_tropes):
+            for column, trope in enumerate(tropes):
+                rows.append(row)
+                columns.append(column)
+                ids.append(trope_ids.setdefault(trope, len(trope_ids)))
+        self._build(len(candidate_tropes), rows, columns, ids, list(trope_ids))
+
+    @classmethod
+    def from_arrays(
+        cls,
+        size: int,
+        rows: Sequence[int],
+        columns: Sequence[int],
+        trope_ids: Sequence[int],
+        vocabulary: Sequence[str],
+    ) -> "TropeScoringIndex":
+        """Build from parallel ``(row, column, trope id)`` arrays over interned ``vocabulary``.
+
+        Lets a large catalog be loaded straight from its membership rows without
+        materializing a list of trope lists per candidate.
+        """
+
+        index = cls.__new__(cls)
+        index._build(size, rows, columns, trope_ids, vocabulary)
+        return index
+
+    def _build(
+        self,
+        size: int,
+        rows: Sequence[int],
+        columns: Sequence[int],
+        trope_ids: Sequence[int],
+        vocabulary: Sequence[str],
+    ) -> None:
+        self.vocabulary: List[str] = list(vocabulary)
+        self.trope_ids: Dict[str, int] = {trope: trope_id for trope_id, trope in enumerate(self.vocabulary)}
+        rows = np.asarray(rows, dtype=np.int32)
+        columns = np.asarray(columns, dtype=np.int32)
+        trope_ids = np.asarray(trope_ids, dtype=np.int32)
+        width = int(columns.max()) + 1 if columns.size else 1
+        matrix = np.full((size, width), _PAD, dtype=np.int32)
+        matrix[rows, columns] = trope_ids
+        self.matrix = matrix
+        # Group rows by trope id; each posting list is then one slice of the sorted rows.
+        order = np.lexsort((rows, trope_ids))
+        sorted_rows = rows[order]
+        bounds = np.searchsorted(trope_ids[order], np.arange(len(self.vocabulary) + 1))
+        self.postings: List[np.ndarray] = [
+            np.unique(sorted_rows[bounds[trope_id] : bounds[trope_id + 1]]) for trope_id in range(len(self.vocabulary))
+        ]
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def tropes(self, row: int) -> List[str]:
+        """The tropes of candidate ``row`` in its own order."""
+
+        return [self.vocabulary[trope_id] for trope_id in self.matrix[row] if trope_id != _PAD]
+
+    def top_k(
+        self,
+        profile: Mapping[str, int],
+        limit: int,
+        after: Optional[Tuple[float, int]] = None,
+        feedback: Optional[Mapping[str, float]] = None,
+    ) -> List[ScoredCandidate]:
+        """Return the ``limit`` best candidates for a trope frequency profile.
+
+        Each matched trope contributes its inverse frequency plus its ``feedback``
+        term, so liked tropes lift their candidates and skipped ones push them down.
+        Ordering matches a stable descending sort on the rounded feed score, so ties
+        keep catalog order. ``after`` is a ``(score, index)`` key from a previous page;
+        only candidates ranked strictly below it are considered.
+        """
+
+        if limit <= 0 or not len(self):
+            return []
+        weights = np.zeros(len(self.vocabulary) + 1, dtype=np.float64)
+        member = np.zeros(len(self.vocabulary) + 1, dtype=bool)
+        shared: List[np.ndarray] = []
+        for trope, freq in profile.items():
+            trope_id = self.trope_ids.get(trope)
+            if trope_id is None or freq <= 0:
+                continue
+            weights[trope_id] = 1.0 / (freq + 1.0) + (feedback.get(trope, 0.0) if feedback else 0.0)
+            member[trope_id] = True
+            shared.append(self.postings[trope_id])
+        if not shared:
+            return []
+
+        rows = np.unique(np.concatenate(shared))
+        ids = self.matrix[rows]
+        # Accumulate column by column so the float sum follows the same order as
+        # iterating a candidate's tropes, keeping results bit-identical.
+        score = np.zeros(rows.shape[0], dtype=np.float64)
+        overlap = np.zeros(rows.shape[0], dtype=np.int64)
+        for column in range(ids.shape[1]):
+            score += weights[ids[:, column]]
+            overlap += member[ids[:, column]]
+        normalized = np.clip(0.55 + score / (overlap * 2), 0.0, 0.99) * 100
+        if after is not None:
+            rows, normalized = self._after(rows, normalized, after)
+            if not rows.shape[0]:
+                return []
+
+        # Partial selection: anything within rounding distance of the k-th value may
+        # still tie with it once rounded to two decimals.
+        if rows.shape[0] > limit:
+            kth = np.partition(normalized, rows.shape[0] - limit)[rows.shape[0] - limit]
+            keep = np.flatnonzero(normalized >= kth - 0.01)
+        else:
+            keep = np.arange(rows.shape[0])
+        ranked = sorted(
+            ((round(float(normalized[pos]), 2), int(rows[pos])) for pos in keep),
+            key=lambda item: (-item[0], item[1]),
+        )[:limit]
+
+        results: List[ScoredCandidate] = []
+        for value, row in ranked:
+            matched = [
+                self.vocabulary[trope_id]
+                for trope_id in self.matrix[row]
+                if trope_id != _PAD and member[trope_id]
+            ]
+            results.append(ScoredCandidate(index=row, score=value, matched_tropes=matched))
+        return results
+
+    @staticmethod
+    def _after(rows: np.ndarray, normalized: np.ndarray, after: Tuple[float, int]) -> Tuple[np.ndarray, np.ndarray]:
+        # Values more than a rounding step from the key are decided in bulk; only the
+        # narrow band around it needs the exact rounded comparison.
+        value, index = after
+        keep = normalized < value - 0.01
+        for pos in np.flatnonzero(np.abs(normalized - value) <= 0.01):
+            rounded = round(float(normalized[pos]), 2)
+            keep[pos] = rounded < value or (rounded == value and int(rows[pos]) > index)
+        return rows[keep], normalized[keep]
@@ -0,0 +1,115 @@
+"""Persisted trope profile: one aggregate row per trope, maintained incrementally.
+
+A trope's row holds the number of library books carrying it, which the trope feed
+uses as the frequency term of its score. Writers apply deltas inside the same
+transaction as the change that caused them; ``python -m app.services.trope_profile
+rebuild`` recomputes the table from scratch and ``verify`` checks it against the
+source tables. Feedback is per reader and lives in :mod:`.user_state`; the helpers
+here convert reactions into decayed feedback weights for it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import select
+
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..models import BookTrope, TropeProfile
+from .recommendation_service import REACTION_WEIGHTS
+
+
+def _decay(since: Optional[datetime], now: datetime) -> float:
+    half_life = get_settings().trope_profile_half_life_days
+    if not half_life or since is None:
+        return 1.0
+    age_days = max(0.0, (now - since).total_seconds()) / 86400
+    return 0.5 ** (age_days / half_life)
+
+
+def feedback_weight(reaction: str, created_at: Optional[datetime], now: datetime) -> float:
+    return REACTION_WEIGHTS.get(reaction, 0.0) * _decay(created_at, now)
+
+
+def apply_profile_deltas(session, book_counts: Mapping[str, int]) -> None:
+    """Add book count deltas to the touched tropes' rows.
+
+    Rows are locked for update (a no-op on SQLite, where the single writer already
+    serializes this) and then incremented.
+    """
+
+    tropes = sorted(trope for trope, delta in book_counts.items() if delta)
+    if not tropes:
+        return
+    rows = {
+        row.trope: row
+        for row in session.exec(select(TropeProfile).where(TropeProfile.trope.in_(tropes)).with_for_update())
+    }
+    for trope in tropes:
+        row = rows.get(trope) or TropeProfile(trope=trope)
+        row.book_count += book_counts[trope]
+        session.add(row)
+
+
+def profile_cache_epoch() -> int:
+    """Hour bucket for feed cache keys while decay is on, so cached feeds age out."""
+
+    return int(time.time() // 3600) if get_settings().trope_profile_half_life_days else 0
+
+
+def compute_trope_profile(session) -> Dict[str, int]:
+    """Recompute ``{trope: book_count}`` from the source tables."""
+
+    return dict(session.exec(select(BookTrope.trope, func.count()).group_by(BookTrope.trope)).all())
+
+
+def rebuild_trope_profile() -> int:
+    """Replace the aggregate with a full recomputation; returns the number of rows."""
+
+    with get_session() as session:
+        profile = compute_trope_profile(session)
+        session.execute(delete(TropeProfile))
+        rows = [{"trope": trope, "book_count": count} for trope, count in sorted(profile.items())]
+        if rows:
+            session.execute(insert(TropeProfile), rows)
+    return len(rows)
+
+
+def verify_trope_profile() -> List[str]:
+    """Compare the stored aggregate with a recomputation; returns the mismatches."""
+
+    with get_read_session() as session:
+        expected = compute_trope_profile(session)
+        stored = dict(session.exec(select(TropeProfile.trope, TropeProfile.book_count)).all())
+    return [
+        f"{trope}: stored {stored.get(trope, 0)} != expected {expected.get(trope, 0)}"
+        for trope in sorted(set(expected) | set(stored))
+        if stored.get(trope, 0) != expected.get(trope, 0)
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild or verify the persisted trope profile.")
+    parser.add_argument("command", choices=("rebuild", "verify"))
+    args = parser.parse_args(argv)
+
+    from ..database import create_db_and_tables
+
+    create_db_and_tables()
+    if args.command == "rebuild":
+        print(f"Rebuilt {rebuild_trope_profile()} trope profile rows")
+    problems = verify_trope_profile()
+    for problem in problems:
+        print(problem)
+    print("Trope profile OK" if not problems else f"{len(problems)} trope profile rows differ")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,172 +1,379 @@
 from __future__ import annotations
 
-import random
+import asyncio
 from collections import Counter
-from typing import List
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlmodel import delete, select
 
-from ..database import get_session
-from ..models import Book, BookTrope
-from ..schemas import TropeRecommendationResponse
+from ..config import get_settings
+from ..database import get_read_session, get_session
+from ..models import Book, BookTrope, CatalogCandidate, SyncJob
+from ..schemas import FeedCursor, TropeRecommendationResponse, TropeRecommendationsPayload
+from .catalog_service import CandidateCatalog, get_candidate_catalog, get_candidate_catalog_async
 from .log_service import record_log
+from .pagination import decode_cursor, encode_cursor
+from .recommendation_service import UpcomingCovers, precompute_recommendations
+from .trope_extractor import TropeBook, get_trope_provider, resolve_tropes
+from .trope_index import ScoredCandidate
+from .trope_profile import apply_profile_deltas, rebuild_trope_profile
+from .user_state import DEFAULT_USER, get_user_state, get_user_state_async
 
-TROPE_LIBRARY: List[str] = [
-    "enemies to lovers",
-    "forbidden romance",
-    "forced proximity",
-    "mates bond",
-    "magical academy",
-    "morally gray hero",
-    "slow burn",
-    "found family",
-    "royal intrigue",
-    "redemption arc",
-]
-
-BOOK_TROPE_ASSIGNMENTS = {
-    "Dragon's Embrace": ["mates bond", "morally gray hero", "forbidden romance"],
-    "Moonlit Oath": ["forced proximity", "slow burn", "royal intrigue"],
-    "Academy of Thorns": ["magical academy", "enemies to lovers", "found family"],
-    "Stormbound Hearts": ["redemption arc", "slow burn", "forbidden romance"],
-}
-
-TROPE_CANDIDATES = [
-    {
-        "id": "shadow-court-bargain",
-        "title": "Shadow Court Bargain",
-        "author": "Mira Lark",
-        "description": "A human negotiator is bound to a fae prince after a perilous bargain for her sister's freedom.",
-        "cover_url": "https://placehold.co/400x600?text=Shadow",
-        "tropes": ["enemies to lovers", "forbidden romance", "royal intrigue"],
-        "explanation": "This pick leans hard into the enemies-to-lovers tension and royal intrigue you keep revisiting.",
-    },
-    {
-        "id": "ashborne-vow",
-        "title": "Ashborne Vow",
-        "author": "Khalia Dusk",
-        "description": "An exiled fire mage must fake an engagement with her rival to reclaim her throne.",
-        "cover_url": "https://placehold.co/400x600?text=Ashborne",
-        "tropes": ["forced proximity", "enemies to lovers", "redemption arc"],
-        "explanation": "A fiery forced-proximity partnership that mirrors your favorite redemption arcs.",
-    },
-    {
-        "id": "celestial-threads",
-        "title": "Celestial Threads",
-        "author": "Rowan Illyr",
-        "description": "Twin seers are drafted into a celestial academy where fate knots their hearts together.",
-        "cover_url": "https://placehold.co/400x600?text=Celestial",
-        "tropes": ["magical academy", "slow burn", "found family"],
-        "explanation": "A lush academy setting with the slow-burn tension and found family comfort you crave.",
-    },
-    {
-        "id": "siren-of-the-tempest",
-        "title": "Siren of the Tempest",
-        "author": "Elara Voss",
-        "description": "A stormcaller and a pirate queen must join forces to calm a raging sea god.",
-        "cover_url": "https://placehold.co/400x600?text=Tempest",
-        "tropes": ["found family", "mates bond", "morally gray hero"],
-        "explanation": "This sea-swept adventure pairs a morally gray hero with a fated mate bond twist.",
-    },
-    {
-        "id": "gilded-sanctum",
-        "title": "Gilded Sanctum",
-        "author": "Aster Quinn",
-        "description": "A healer infiltrates a holy order and discovers her soulmate among the sworn protectors.",
-        "cover_url": "https://placehold.co/400x600?text=Sanctum",
-        "tropes": ["mates bond", "forbidden romance", "slow burn"],
-        "explanation": "Sweeping forbidden romance with a patient slow burn and undeniable soulmate pull.",
-    },
-]
-
-
-def _random_tropes() -> List[str]:
-    return random.sample(TROPE_LIBRARY, 3)
-
-
-def extract_tropes(force: bool = False) -> int:
-    """Populate the book_tropes table with demo data."""
 
+# Candidate rows read per query while streaming the trope feed.
+STREAM_BATCH = 5
+
+
+def _build_trope_response(
+    candidate: CatalogCandidate, match: ScoredCandidate, tropes: List[str]
+) -> TropeRecommendationResponse:
+    return TropeRecommendationResponse(
+        id=candidate.external_id,
+        title=candidate.title,
+        author=candidate.author,
+        description=candidate.description,
+        cover_url=candidate.cover_url,
+        matched_tropes=match.matched_tropes,
+        all_tropes=tropes,
+        score=match.score,
+        explanation=candidate.explanation or f"Matches your taste for {', '.join(match.matched_tropes)}.",
+    )
+
+
+def _insert_tropes(session, rows: List[dict]) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        statement = sqlite_insert(BookTrope).on_conflict_do_nothing(index_elements=["book_id", "trope"])
+    elif dialect == "postgresql":
+        statement = postgresql_insert(BookTrope).on_conflict_do_nothing(constraint="uix_book_trope")
+    else:
+        statement = insert(BookTrope)
+    session.execute(statement, rows)
+
+
+@dataclass
+class _BookWrites:
+    """Pending trope rows of one book; a book's rows are always written in the same commit."""
+
+    inserts: List[dict] = field(default_factory=list)
+    refreshes: List[dict] = field(default_factory=list)
+    stale: List[Tuple[Tuple[int, str], int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.inserts) + len(self.refreshes) + len(self.stale)
+
+
+def _book_chunks(writes: Mapping[int, _BookWrites], size: int) -> Iterator[List[_BookWrites]]:
+    """Group whole books into chunks of about ``size`` rows."""
+
+    chunk: List[_BookWrites] = []
+    rows = 0
+    for book_id in sorted(writes):
+        book = writes[book_id]
+        if not book:
+            continue
+        if chunk and rows + len(book) > size:
+            yield chunk
+            chunk, rows = [], 0
+        chunk.append(book)
+        rows += len(book)
+    if chunk:
+        yield chunk
+
+
+def _update_profile(session, pairs: List[Tuple[int, str]], sign: int) -> None:
+    """Apply added (``sign=1``) or removed (``-1``) book/trope pairs to the trope profile."""
+
+    counts: Counter = Counter()
+    for _, trope in pairs:
+        counts[trope] += sign
+    apply_profile_deltas(session, counts)
+
+
+def extract_tropes(force: bool = False, batch_size: Optional[int] = None) -> int:
+    """Tag books with tropes from the configured extraction provider.
+
+    Without ``force`` only books that have no tropes yet are tagged; with ``force``
+    every book is re-tagged, and provider results cached under the same content hash
+    are reused, so only books whose text or model changed reach the provider.
+    Existing (book_id, trope) pairs are loaded in a single query and only the missing
+    pairs are bulk-inserted. Writes are committed in chunks of about ``batch_size``
+    rows that never split a book, so each book's trope set changes atomically and
+    the writer is released between chunks even during a forced refresh.
+    """
+
+    batch_size = batch_size or get_settings().trope_write_batch_size
+    provider = get_trope_provider()
+    with get_read_session() as session:
+        query = select(Book.id, Book.title, Book.author, Book.description)
+        if not force:
+            query = query.where(~select(BookTrope.id).where(BookTrope.book_id == Book.id).exists())
+        books = [TropeBook(*row) for row in session.exec(query)]
+    # The provider runs outside the writer session so slow prompts never hold the write lock.
+    tagged, stats = resolve_tropes(books, provider)
+
+    with get_read_session() as session:
+        existing = {
+            (book_id, trope): row_id
+            for row_id, book_id, trope in session.exec(select(BookTrope.id, BookTrope.book_id, BookTrope.trope))
+        }
+    extracted_at = datetime.utcnow()
+    writes: Dict[int, _BookWrites] = {}
+    desired = set()
+    for book_id, tropes in tagged.items():
+        book = writes.setdefault(book_id, _BookWrites())
+        for trope, confidence in tropes:
+            pair = (book_id, trope)
+            if pair in desired:
+                continue
+            desired.add(pair)
+            row = {
+                "book_id": book_id,
+                "trope": trope,
+                "source": provider.source,
+                "confidence": confidence,
+                "extracted_at": extracted_at,
+            }
+            if pair not in existing:
+                book.inserts.append(row)
+            elif force:
+                book.refreshes.append({"id": existing[pair], **row})
+    if force:
+        # Books the provider could not tag keep their previous tropes.
+        for pair, row_id in existing.items():
+            if pair[0] in tagged and pair not in desired:
+                writes[pair[0]].stale.append((pair, row_id))
+
+    processed = 0
     with get_session() as session:
-        if force:
-            session.exec(delete(BookTrope))
-        books = list(session.exec(select(Book)))
-        processed = 0
-        for book in books:
-            assigned = BOOK_TROPE_ASSIGNMENTS.get(book.title) or _random_tropes()
-            for trope in assigned:
-                existing = session.exec(
-                    select(BookTrope).where(
-                        BookTrope.book_id == book.id, BookTrope.trope == trope
-                    )
-                ).first()
-                if existing:
-                    continue
-                session.add(
-                    BookTrope(
-                        book_id=book.id,
-                        trope=trope,
-                        source="demo-llm",
-                        confidence=round(random.uniform(0.6, 0.95), 3),
-                    )
-                )
-                processed += 1
-        session.commit()
+        for chunk in _book_chunks(writes, batch_size):
+            inserts = [row for book in chunk for row in book.inserts]
+            refreshes = [row for book in chunk for row in book.refreshes]
+            stale = [item for book in chunk for item in book.stale]
+            if inserts:
+                _insert_tropes(session, inserts)
+                _update_profile(session, [(row["book_id"], row["trope"]) for row in inserts], 1)
+            if stale:
+                session.exec(delete(BookTrope).where(BookTrope.id.in_([row_id for _, row_id in stale])))
+                _update_profile(session, [pair for pair, _ in stale], -1)
+            if refreshes:
+                session.execute(update(BookTrope), refreshes)
+            # Committing per chunk releases the writer between chunks, so job heartbeats
+            # and other writes get through during a long refresh.
+            session.commit()
+            processed += len(inserts) + len(refreshes)
 
     record_log(
         "INFO",
         "Trope extraction completed",
         source="trope-engine",
-        context={"force": force, "processed": processed},
+        context={"force": force, "processed": processed, "provider": provider.name, **stats},
     )
+    if processed:
+        precompute_recommendations(reason="trope-extraction")
     return processed
 
 
-def get_trope_recommendations(limit: int = 10) -> List[TropeRecommendationResponse]:
-    with get_session() as session:
-        if not list(session.exec(select(BookTrope).limit(1))):
-            extract_tropes(force=False)
-        trope_rows = list(session.exec(select(BookTrope)))
-        if not trope_rows:
-            return []
-        profile = Counter(row.trope for row in trope_rows)
+def run_trope_job(job: SyncJob) -> str:
+    """Queue handler for ``trope_extract`` jobs; ``payload["force"]`` selects a refresh."""
 
-    if not profile:
-        return []
+    processed = extract_tropes(force=bool((job.payload or {}).get("force")))
+    return f"Extracted {processed} book tropes"
 
-    scored_candidates: List[TropeRecommendationResponse] = []
-    for candidate in TROPE_CANDIDATES:
-        candidate_tropes = candidate["tropes"]
-        overlap = [trope for trope in candidate_tropes if trope in profile]
-        if not overlap:
-            continue
-        score = 0.0
-        for trope in overlap:
-            freq = profile[trope]
-            score += 1.0 / (freq + 1.0)
-        normalized = min(0.99, 0.55 + score / (len(overlap) * 2))
-        explanation = candidate["explanation"]
-        scored_candidates.append(
-            TropeRecommendationResponse(
-                id=candidate["id"],
-                title=candidate["title"],
-                author=candidate["author"],
-                description=candidate.get("description"),
-                cover_url=candidate.get("cover_url"),
-                matched_tropes=overlap,
-                all_tropes=candidate_tropes,
-                score=round(normalized * 100, 2),
-                explanation=explanation,
-            )
-        )
-
-    scored_candidates.sort(key=lambda item: item.score, reverse=True)
-    top_results = scored_candidates[:limit]
+
+def _parse_cursor(cursor: str) -> Tuple[float, int]:
+    values = decode_cursor(cursor)
+    score, candidate_id = values.get("score"), values.get("id")
+    if not isinstance(score, (int, float)) or isinstance(score, bool) or not isinstance(candidate_id, int):
+        raise ValueError("Invalid pagination cursor")
+    return float(score), candidate_id
+
+
+def _rank_candidates(
+    catalog: CandidateCatalog,
+    profile: Mapping[str, int],
+    limit: int,
+    after: Optional[Tuple[float, int]] = None,
+    feedback: Optional[Mapping[str, float]] = None,
+    lookahead: int = 0,
+) -> Tuple[List[ScoredCandidate], Optional[str], List[ScoredCandidate]]:
+    """Return one page of candidate matches, the cursor for the next one and the lookahead.
+
+    Pages follow the feed's stable ``(score desc, candidate id)`` ranking; the cursor
+    holds the last card's score and candidate id, so the next page resumes just below
+    it even if the catalog was re-imported in between. Up to ``lookahead`` matches
+    past the page are ranked in the same pass and returned last.
+    """
+
+    if not profile:
+        return [], None, []
+    if after is not None:
+        after = (after[0], catalog.row_before(after[1]))
+    matches = catalog.index.top_k(profile, limit + max(1, lookahead), after, feedback)
+    matches, ahead = matches[:limit], matches[limit:]
+    next_cursor = None
+    if ahead:
+        next_cursor = encode_cursor({"score": matches[-1].score, "id": catalog.candidate_id(matches[-1].index)})
 
     record_log(
         "INFO",
         "Generated trope-based recommendations",
         source="trope-engine",
-        context={"results": len(top_results)},
+        context={"results": len(matches), "paged": after is not None, "catalog": len(catalog)},
     )
-    return top_results
+    return matches, next_cursor, ahead[:lookahead]
+
+
+def _trope_cards(catalog: CandidateCatalog, matches: List[ScoredCandidate]) -> List[TropeRecommendationResponse]:
+    return _cards_from(catalog, matches, catalog.load([match.index for match in matches]))
+
+
+def _cards_from(
+    catalog: CandidateCatalog, matches: List[ScoredCandidate], candidates: Mapping[int, CatalogCandidate]
+) -> List[TropeRecommendationResponse]:
+    return [
+        _build_trope_response(candidates[match.index], match, catalog.index.tropes(match.index))
+        for match in matches
+        if match.index in candidates
+    ]
+
+
+def _trope_page(
+    profile: Mapping[str, int],
+    limit: int,
+    after: Optional[Tuple[float, int]],
+    feedback: Optional[Mapping[str, float]] = None,
+) -> TropeRecommendationsPayload:
+    catalog = get_candidate_catalog()
+    matches, next_cursor, _ = _rank_candidates(catalog, profile, limit, after, feedback)
+    return TropeRecommendationsPayload(items=_trope_cards(catalog, matches), next_cursor=next_cursor)
+
+
+def _ensure_profile(has_tropes: bool) -> None:
+    """Fill an empty profile: extract tropes first, or rebuild from existing ones."""
+
+    if not has_tropes:
+        extract_tropes(force=False)
+    else:
+        rebuild_trope_profile()
+
+
+def _load_profile(user_id: str = DEFAULT_USER) -> Tuple[Dict[str, int], Dict[str, float]]:
+    """The library trope counts and the reader's own feedback term per trope."""
+
+    state, counts = get_user_state(user_id)
+    if not counts:
+        with get_read_session() as session:
+            has_tropes = session.exec(select(BookTrope.id).limit(1)).first() is not None
+        _ensure_profile(has_tropes)
+        state, counts = get_user_state(user_id)
+    return counts, state.feedback()
+
+
+async def _load_profile_async(user_id: str = DEFAULT_USER) -> Tuple[Dict[str, int], Dict[str, float]]:
+    """Async variant of :func:`_load_profile`; only filling an empty profile goes to a thread."""
+
+    state, counts = await get_user_state_async(user_id)
+    if not counts:
+        return await asyncio.to_thread(_load_profile, user_id)
+    return counts, state.feedback()
+
+
+def get_trope_recommendations(limit: int = 10, user_id: str = DEFAULT_USER) -> List[TropeRecommendationResponse]:
+    """Rank the candidate catalog against the reader's trope profile."""
+
+    return fetch_trope_recommendations(limit, user_id=user_id).items
+
+
+async def get_trope_recommendations_async(
+    limit: int = 10, user_id: str = DEFAULT_USER
+) -> List[TropeRecommendationResponse]:
+    return (await fetch_trope_recommendations_async(limit, user_id=user_id)).items
+
+
+def _trope_feed(limit: int, after: Optional[Tuple[float, int]], user_id: str) -> TropeRecommendationsPayload:
+    counts, feedback = _load_profile(user_id)
+    return _trope_page(counts, limit, after, feedback)
+
+
+def fetch_trope_recommendations(
+    limit: int = 10, cursor: Optional[str] = None, user_id: str = DEFAULT_USER
+) -> TropeRecommendationsPayload:
+    """Return one page of the trope feed; raises ``ValueError`` for a malformed cursor."""
+
+    after = _parse_cursor(cursor) if cursor else None
+    return _trope_feed(limit, after, user_id)
+
+
+async def _rank_page_async(
+    limit: int, cursor: Optional[str], user_id: str, lookahead: int
+) -> Tuple[CandidateCatalog, List[ScoredCandidate], Optional[str], List[ScoredCandidate]]:
+    after = _parse_cursor(cursor) if cursor else None
+    counts, feedback = await _load_profile_async(user_id)
+    catalog = await get_candidate_catalog_async()
+    matches, next_cursor, ahead = _rank_candidates(catalog, counts, limit, after, feedback, lookahead)
+    return catalog, matches, next_cursor, ahead
+
+
+def _pass_upcoming(
+    upcoming: UpcomingCovers, ahead: List[ScoredCandidate], candidates: Mapping[int, CatalogCandidate]
+) -> None:
+    urls = [candidates[match.index].cover_url for match in ahead if match.index in candidates]
+    urls = [url for url in urls if url]
+    if urls:
+        upcoming(urls)
+
+
+async def fetch_trope_recommendations_async(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    user_id: str = DEFAULT_USER,
+    upcoming: Optional[UpcomingCovers] = None,
+) -> TropeRecommendationsPayload:
+    """Async variant of :func:`fetch_trope_recommendations`.
+
+    Profile and candidate rows load on the async read pool; ranking is one
+    vectorized pass on the event loop. With ``upcoming``, that pass also ranks the
+    next page, whose rows are read in the same query as this page's, and their
+    cover URLs are passed on.
+    """
+
+    lookahead = limit if upcoming is not None else 0
+    catalog, matches, next_cursor, ahead = await _rank_page_async(limit, cursor, user_id, lookahead)
+    candidates = await catalog.load_async([match.index for match in matches + ahead])
+    if upcoming is not None:
+        _pass_upcoming(upcoming, ahead, candidates)
+    return TropeRecommendationsPayload(items=_cards_from(catalog, matches, candidates), next_cursor=next_cursor)
+
+
+async def stream_trope_recommendations_async(
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    user_id: str = DEFAULT_USER,
+    upcoming: Optional[UpcomingCovers] = None,
+) -> AsyncIterator[Union[TropeRecommendationResponse, FeedCursor]]:
+    """Yield a trope feed page as its cards are built, then a :class:`FeedCursor` trailer.
+
+    The page is ranked up front, since the vectorized pass costs far less than the
+    row reads. Candidate rows are then loaded ``STREAM_BATCH`` at a time, and each
+    batch's cards go out before the next batch is read. ``upcoming`` works as in
+    :func:`fetch_trope_recommendations_async`; the next page's rows are read with
+    the last batch.
+    """
+
+    lookahead = limit if upcoming is not None else 0
+    catalog, matches, next_cursor, ahead = await _rank_page_async(limit, cursor, user_id, lookahead)
+    for start in range(0, len(matches), STREAM_BATCH):
+        batch = matches[start : start + STREAM_BATCH]
+        last = start + STREAM_BATCH >= len(matches)
+        candidates = await catalog.load_async([match.index for match in batch + (ahead if last else [])])
+        for card in _cards_from(catalog, batch, candidates):
+            yield card
+        if last and upcoming is not None:
+            _pass_upcoming(upcoming, ahead, candidates)
+    yield FeedCursor(next_cursor=next_cursor)
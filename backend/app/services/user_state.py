@@ -0,0 +1,286 @@
+"""Per-reader scoring state kept in a bounded, memory-accounted LRU.
+
+A reader's state is what their feeds need beyond the shared library data: the
+feedback score of each trope (from their own reactions) and the sorted ids of the
+books they already reacted to, which the taste feed skips. It is computed from the
+reader's feedback rows on first use and cached until that reader writes feedback
+or the book tropes change, both detected through data versions so writes in other
+workers invalidate it too. Readers are evicted least recently used first once the
+cache exceeds ``user_state_cache_max_bytes``, so idle readers cost no memory.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import select
+
+from .. import metrics
+from ..config import get_settings
+from ..database import get_async_read_session, get_read_session
+from ..lazy import lazy_import
+from ..models import DEFAULT_USER, BookTrope, Feedback, TropeProfile
+from ..versioning import get_data_versions, get_data_versions_async, user_scope
+from .trope_profile import _decay, feedback_weight
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+_USER_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}")
+
+
+def normalize_user_id(value: Optional[str]) -> str:
+    """Return the reader id for a request header value; raises ``ValueError`` if malformed."""
+
+    if value is None or not value.strip():
+        return DEFAULT_USER
+    value = value.strip()
+    if not _USER_ID.fullmatch(value):
+        raise ValueError("Invalid user id: use up to 64 letters, digits, '.', '_', '@' or '-'")
+    return value
+
+
+def _dict_bytes(values: Dict) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in values.items())
+
+
+@dataclass
+class UserState:
+    user_id: str
+    # Trope feedback scores decayed up to ``as_of``.
+    scores: Dict[str, float]
+    as_of: datetime
+    seen: np.ndarray
+    version: Tuple[int, int]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + _dict_bytes(self.scores) + self.seen.nbytes
+
+    def has_seen(self, book_id: int) -> bool:
+        position = int(np.searchsorted(self.seen, book_id))
+        return position < self.seen.shape[0] and int(self.seen[position]) == book_id
+
+    def feedback(self, now: Optional[datetime] = None) -> Dict[str, float]:
+        """The feed-score term of each trope this reader reacted to, decayed to ``now``.
+
+        It is added to the trope's weight alongside the library frequency term, so
+        positive scores lift matching candidates and negative ones push them down.
+        """
+
+        scale = get_settings().trope_profile_feedback_weight * _decay(self.as_of, now or datetime.utcnow())
+        return {trope: scale * score for trope, score in self.scores.items() if score}
+
+
+def _feedback_query(user_id: str):
+    return select(Feedback.book_id, Feedback.reaction, Feedback.created_at).where(Feedback.user_id == user_id)
+
+
+def _tropes_query(book_ids: List[int]):
+    return select(BookTrope.book_id, BookTrope.trope).where(BookTrope.book_id.in_(book_ids))
+
+
+def _weigh_feedback(rows: Iterable[Tuple[int, str, datetime]], now: datetime) -> Dict[int, float]:
+    by_book: Dict[int, float] = defaultdict(float)
+    for book_id, reaction, created_at in rows:
+        by_book[book_id] += feedback_weight(reaction, created_at, now)
+    return by_book
+
+
+def _build_state(
+    user_id: str,
+    version: Tuple[int, int],
+    now: datetime,
+    by_book: Dict[int, float],
+    pairs: Iterable[Tuple[int, str]],
+) -> UserState:
+    scores: Dict[str, float] = defaultdict(float)
+    for book_id, trope in pairs:
+        scores[trope] += by_book[book_id]
+    return UserState(
+        user_id=user_id,
+        scores=dict(scores),
+        as_of=now,
+        seen=np.asarray(sorted(by_book), dtype=np.int64),
+        version=version,
+    )
+
+
+def _load_state(user_id: str, version: Tuple[int, int]) -> UserState:
+    now = datetime.utcnow()
+    pairs: List[Tuple[int, str]] = []
+    with get_read_session() as session:
+        by_book = _weigh_feedback(session.exec(_feedback_query(user_id)), now)
+        ids = sorted(by_book)
+        for start in range(0, len(ids), 500):
+            pairs.extend(session.exec(_tropes_query(ids[start : start + 500])))
+    return _build_state(user_id, version, now, by_book, pairs)
+
+
+async def _load_state_async(user_id: str, version: Tuple[int, int]) -> UserState:
+    now = datetime.utcnow()
+    pairs: List[Tuple[int, str]] = []
+    async with get_async_read_session() as session:
+        by_book = _weigh_feedback((await session.exec(_feedback_query(user_id))).all(), now)
+        ids = sorted(by_book)
+        for start in range(0, len(ids), 500):
+            pairs.extend((await session.exec(_tropes_query(ids[start : start + 500]))).all())
+    return _build_state(user_id, version, now, by_book, pairs)
+
+
+class UserStateCache:
+    """LRU of :class:`UserState` bounded by the estimated bytes it holds."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, UserState]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str, version: Tuple[int, int]) -> UserState:
+        state = self._lookup(user_id, version)
+        if state is None:
+            state = _load_state(user_id, version)
+            self._put(state)
+        return state
+
+    async def get_async(self, user_id: str, version: Tuple[int, int]) -> UserState:
+        """Async variant of :meth:`get`; a miss loads on the async read pool."""
+
+        state = self._lookup(user_id, version)
+        if state is None:
+            state = await _load_state_async(user_id, version)
+            self._put(state)
+        return state
+
+    def _lookup(self, user_id: str, version: Tuple[int, int]) -> Optional[UserState]:
+        with self._lock:
+            state = self._entries.get(user_id)
+            if state is not None and state.version == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                metrics.USER_STATE_LOOKUPS.inc(result="hit")
+                return state
+            self.misses += 1
+        metrics.USER_STATE_LOOKUPS.inc(result="miss")
+        return None
+
+    def _put(self, state: UserState) -> None:
+        with self._lock:
+            self._discard(state.user_id)
+            size = state.nbytes
+            if size > self.max_bytes:
+                return
+            self._entries[state.user_id] = state
+            self._sizes[state.user_id] = size
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                user_id, _ = self._entries.popitem(last=False)
+                self.nbytes -= self._sizes.pop(user_id)
+                self.evictions += 1
+
+    def _discard(self, user_id: str) -> None:
+        if self._entries.pop(user_id, None) is not None:
+            self.nbytes -= self._sizes.pop(user_id)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop one reader's state, or everyone's."""
+
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._sizes.clear()
+                self.nbytes = 0
+            else:
+                self._discard(user_id)
+
+
+_cache: Optional[UserStateCache] = None
+_cache_lock = threading.Lock()
+_library: Optional[Tuple[int, Dict[str, int]]] = None
+
+
+def get_user_state_cache() -> UserStateCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UserStateCache(get_settings().user_state_cache_max_bytes)
+        return _cache
+
+
+def _cached_library(version: int) -> Optional[Dict[str, int]]:
+    with _cache_lock:
+        if _library is not None and _library[0] == version:
+            return _library[1]
+    return None
+
+
+def _store_library(version: int, counts: Dict[str, int]) -> Dict[str, int]:
+    global _library
+    with _cache_lock:
+        _library = (version, counts)
+    return counts
+
+
+def _library_counts(version: int) -> Dict[str, int]:
+    """Library-wide ``{trope: book_count}``, shared by every reader and reloaded per version."""
+
+    counts = _cached_library(version)
+    if counts is None:
+        with get_read_session() as session:
+            rows = session.exec(select(TropeProfile.trope, TropeProfile.book_count)).all()
+        counts = _store_library(version, dict(rows))
+    return counts
+
+
+async def _library_counts_async(version: int) -> Dict[str, int]:
+    counts = _cached_library(version)
+    if counts is None:
+        async with get_async_read_session() as session:
+            rows = (await session.exec(select(TropeProfile.trope, TropeProfile.book_count))).all()
+        counts = _store_library(version, dict(rows))
+    return counts
+
+
+def get_user_state(user_id: str) -> Tuple[UserState, Dict[str, int]]:
+    """Return the reader's state and the library trope counts, both current.
+
+    One data-version lookup checks the reader's feedback, the book tropes and the
+    library profile; only stale parts are reloaded.
+    """
+
+    scope = user_scope(user_id)
+    versions = get_data_versions([scope, "booktrope", "tropeprofile"])
+    state = get_user_state_cache().get(user_id, (versions[scope], versions["booktrope"]))
+    return state, _library_counts(versions["tropeprofile"])
+
+
+async def get_user_state_async(user_id: str) -> Tuple[UserState, Dict[str, int]]:
+    """Async variant of :func:`get_user_state` on the async read pool."""
+
+    scope = user_scope(user_id)
+    versions = await get_data_versions_async([scope, "booktrope", "tropeprofile"])
+    state = await get_user_state_cache().get_async(user_id, (versions[scope], versions["booktrope"]))
+    return state, await _library_counts_async(versions["tropeprofile"])
+
+
+def collect_user_state_metrics() -> None:
+    cache = get_user_state_cache()
+    metrics.USER_STATE_CACHE_USERS.set(len(cache))
+    metrics.USER_STATE_CACHE_BYTES.set(cache.nbytes)
+    metrics.USER_STATE_CACHE_EVICTIONS.set(cache.evictions)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple
+
+from ..lazy import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+
+# Rows are scored in blocks so brute-force search over a memory-mapped matrix
+# never materializes more than this many rows at once.
+_BLOCK_ROWS = 65_536
+
+
+class VectorStore:
+    """Float32 vector matrix persisted on disk and opened memory-mapped.
+
+    A store is a directory holding ``vectors.npy`` (``n x dim`` float32), ``ids.json``
+    (the row -> external id mapping) and ``meta.json`` (dimension, provider, model
+    and a fingerprint of the source data used to detect staleness).
+    """
+
+    def __init__(self, path: Path, vectors: np.ndarray, ids: List, meta: dict) -> None:
+        self.path = path
+        self.vectors = vectors
+        self.ids = ids
+        self.meta = meta
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self.meta.get("fingerprint")
+
+    @classmethod
+    def write(cls, path: Path, vectors: np.ndarray, ids: Sequence, meta: dict) -> "VectorStore":
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        staged = np.lib.format.open_memmap(
+            path / "vectors.npy.tmp", mode="w+", dtype=np.float32, shape=vectors.shape
+        )
+        staged[:] = vectors
+        staged.flush()
+        del staged
+        _write_json(path / "ids.json", list(ids))
+        os.replace(path / "vectors.npy.tmp", path / "vectors.npy")
+        # meta.json is written last: a store without it is treated as missing.
+        _write_json(path / "meta.json", {**meta, "count": int(vectors.shape[0]), "dim": int(vectors.shape[1])})
+        return cls.open(path)
+
+    @classmethod
+    def write_chunks(
+        cls, path: Path, count: int, chunks: Iterable[np.ndarray], ids: Sequence, meta: dict
+    ) -> "VectorStore":
+        """Like :meth:`write`, filling ``count`` rows from successive row blocks.
+
+        Only one block is held in memory; the file is sized from the first block's
+        width. Raises ``ValueError`` if the blocks do not add up to ``count`` rows.
+        """
+
+        path.mkdir(parents=True, exist_ok=True)
+        staged = None
+        filled = 0
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=np.float32)
+            if staged is None:
+                staged = np.lib.format.open_memmap(
+                    path / "vectors.npy.tmp", mode="w+", dtype=np.float32, shape=(count, chunk.shape[1])
+                )
+            staged[filled : filled + chunk.shape[0]] = chunk
+            filled += chunk.shape[0]
+        if filled != count:
+            raise ValueError(f"Expected {count} vectors, got {filled}")
+        if staged is None:
+            return cls.write(path, np.zeros((0, 1), dtype=np.float32), ids, meta)
+        dim = int(staged.shape[1])
+        staged.flush()
+        del staged
+        _write_json(path / "ids.json", list(ids))
+        os.replace(path / "vectors.npy.tmp", path / "vectors.npy")
+        _write_json(path / "meta.json", {**meta, "count": count, "dim": dim})
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["VectorStore"]:
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            ids = json.loads((path / "ids.json").read_text())
+            vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if vectors.shape[0] != len(ids):
+            return None
+        return cls(path, vectors, ids, meta)
+
+
+def _write_json(path: Path, payload) -> None:
+    staged = path.with_suffix(path.suffix + ".tmp")
+    staged.write_text(json.dumps(payload))
+    os.replace(staged, path)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if scores.shape[0] > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class VectorIndex:
+    """Nearest-neighbour search over L2-normalized vectors by inner product.
+
+    ``exact`` mode scores every row. ``ivf`` mode partitions rows around spherical
+    k-means centroids and scores only the ``nprobe`` closest partitions; ``auto``
+    picks IVF once the matrix has at least ``ivf_threshold`` rows.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        mode: str = "auto",
+        ivf_threshold: int = 50_000,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        seed: int = 0,
+    ) -> None:
+        if mode not in ("auto", "exact", "ivf"):
+            raise ValueError(f"Unknown vector index mode: {mode}")
+        self.vectors = vectors
+        count = vectors.shape[0]
+        self.mode = mode if mode != "auto" else ("ivf" if count >= ivf_threshold else "exact")
+        self.nprobe = max(1, nprobe)
+        self.centroids: Optional[np.ndarray] = None
+        self.list_rows: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None
+        if self.mode == "ivf" and count:
+            self._train(nlist or max(1, int(np.sqrt(count))), seed)
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def _assign(self, rows: np.ndarray) -> np.ndarray:
+        return np.argmax(rows @ self.centroids.T, axis=1)
+
+    def _train(self, nlist: int, seed: int, iterations: int = 10) -> None:
+        rng = np.random.default_rng(seed)
+        count = self.vectors.shape[0]
+        nlist = min(nlist, count)
+        sample_rows = np.sort(rng.choice(count, size=min(count, nlist * 64), replace=False))
+        sample = np.asarray(self.vectors[sample_rows], dtype=np.float32)
+        self.centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            populated = norms[:, 0] > 0
+            self.centroids[populated] = sums[populated] / norms[populated]
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, _BLOCK_ROWS):
+            block = np.asarray(self.vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+            assignment[start : start + block.shape[0]] = self._assign(block)
+        self.list_rows = np.argsort(assignment, kind="stable")
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist))))
+
+    def search(self, query: np.ndarray, k: int, exclude: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(row, score)`` pairs, best first."""
+
+        if k <= 0 or not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        if self.mode == "ivf" and self.centroids is not None:
+            probes = _top_k(self.centroids @ query, min(self.nprobe, self.centroids.shape[0]))
+            rows = np.sort(
+                np.concatenate([self.list_rows[self.list_offsets[p] : self.list_offsets[p + 1]] for p in probes])
+            )
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        else:
+            rows = None
+            scores = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), _BLOCK_ROWS):
+                block = np.asarray(self.vectors[start : start + _BLOCK_ROWS], dtype=np.float32)
+                scores[start : start + block.shape[0]] = block @ query
+        if exclude is not None and exclude.size:
+            mask = np.isin(rows, exclude) if rows is not None else np.isin(np.arange(len(self)), exclude)
+            scores = np.where(mask, -np.inf, scores)
+        order = _top_k(scores, min(k, scores.shape[0]))
+        positions = rows[order] if rows is not None else order
+        return [
+            (int(position), float(scores[idx]))
+            for position, idx in zip(positions, order)
+            if np.isfinite(scores[idx])
+        ]
@@ -0,0 +1,100 @@
+"""Process startup pipeline and its timing report.
+
+:func:`run_startup` brings the schema up to date, ensures the settings row and
+starts the embedded worker, timing each phase. The report rides on the "started"
+log line, is exported as ``startup_phase_seconds`` and is checked against
+``STARTUP_BUDGET_SECONDS``. To time a cold API boot (imports included)::
+
+    python -m app.startup            # prints the report; exits 1 when over budget
+"""
+
+import argparse
+import json
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from . import IMPORT_STARTED, metrics
+from .config import get_settings
+from .database import create_db_and_tables, get_engine
+from .services.job_queue import JobWorker
+from .services.log_service import record_log, shutdown_logs
+from .services.settings_service import ensure_settings_row
+
+
+@dataclass
+class StartupReport:
+    phases: List[Tuple[str, float]] = field(default_factory=list)
+    schema_applied: bool = False
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def over_budget(self, budget: float) -> bool:
+        return budget > 0 and self.total_seconds > budget
+
+    def as_dict(self) -> dict:
+        return {
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases},
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "schema_applied": self.schema_applied,
+        }
+
+
+def run_startup(
+    worker: Optional[JobWorker] = None,
+    imports_seconds: Optional[float] = None,
+    force_schema: bool = False,
+    message: str = "BookDiscoverAI backend started",
+) -> StartupReport:
+    """Run the startup phases in order and log the timing report."""
+
+    report = StartupReport()
+    if imports_seconds is not None:
+        report.phases.append(("imports", imports_seconds))
+    with report.phase("engine"):
+        get_engine()
+    with report.phase("schema"):
+        report.schema_applied = create_db_and_tables(force=force_schema)
+    with report.phase("settings"):
+        ensure_settings_row()
+    if worker is not None:
+        with report.phase("worker"):
+            worker.start()
+
+    for name, seconds in report.phases:
+        metrics.STARTUP_PHASE_SECONDS.set(seconds, phase=name)
+    budget = get_settings().startup_budget_seconds
+    over = report.over_budget(budget)
+    context = dict(report.as_dict(), budget_ms=round(budget * 1000, 1))
+    record_log("WARNING" if over else "INFO", message + (" over startup budget" if over else ""), context=context)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time a BookDiscoverAI API cold start.")
+    parser.add_argument("--force-schema", action="store_true", help="Apply the schema even if its fingerprint matches.")
+    args = parser.parse_args(argv)
+
+    from .main import app  # noqa: F401  (imported to time the API's own imports)
+
+    report = run_startup(imports_seconds=time.perf_counter() - IMPORT_STARTED, force_schema=args.force_schema)
+    shutdown_logs()
+    budget = get_settings().startup_budget_seconds
+    print(json.dumps(dict(report.as_dict(), budget_ms=round(budget * 1000, 1)), indent=2))
+    return 1 if report.over_budget(budget) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
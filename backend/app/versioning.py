@@ -0,0 +1,118 @@
+"""Per-table data version counters shared by every worker through the database.
+
+Writes to tracked tables bump a ``DataVersion`` row inside the writing transaction,
+so any process can tell whether cached data is current with one small query.
+"""
+
+from typing import Dict, Iterable
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from .models import DataVersion
+
+TRACKED_TABLES = frozenset(
+    {
+        "appsettings",
+        "book",
+        "booktrope",
+        "catalogcandidate",
+        "catalogtrope",
+        "feedback",
+        "recommendationstate",
+        "tropeprofile",
+    }
+)
+
+_BUMPED_KEY = "data_version_bumped"
+
+
+def user_scope(user_id: str) -> str:
+    """Version scope bumped by writes to one reader's feedback."""
+
+    return f"user:{user_id}"
+
+
+def bump_data_versions(session: Session, scopes: Iterable[str]) -> None:
+    """Bump arbitrary scopes (such as :func:`user_scope`) inside the session's transaction."""
+
+    _bump_scopes(session, set(scopes))
+
+
+def _bump(session: Session, tables: Iterable[str]) -> None:
+    _bump_scopes(session, set(tables) & TRACKED_TABLES)
+
+
+def _bump_scopes(session: Session, scopes: set) -> None:
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    pending = sorted(scopes - bumped)
+    if not pending:
+        return
+    connection = session.connection()
+    dialect = connection.dialect.name
+    for scope in pending:
+        if dialect in ("sqlite", "postgresql"):
+            statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(DataVersion).values(
+                scope=scope, version=1
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=["scope"], set_={"version": DataVersion.version + 1}
+            )
+            connection.execute(statement)
+        else:
+            result = connection.execute(
+                update(DataVersion).where(DataVersion.scope == scope).values(version=DataVersion.version + 1)
+            )
+            if not result.rowcount:
+                connection.execute(insert(DataVersion).values(scope=scope, version=1))
+    bumped.update(pending)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    changed = list(session.new) + list(session.deleted)
+    changed += [instance for instance in session.dirty if session.is_modified(instance)]
+    tables = {instance.__table__.name for instance in changed if hasattr(instance, "__table__")}
+    _bump(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _bump(state.session, {table.name})
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset(session: Session) -> None:
+    session.info.pop(_BUMPED_KEY, None)
+
+
+def _versions_query(scopes):
+    return select(DataVersion.scope, DataVersion.version).where(DataVersion.scope.in_(scopes))
+
+
+def get_data_versions(scopes: Iterable[str]) -> Dict[str, int]:
+    """Return the current version of each scope (0 if never written)."""
+
+    from .database import get_read_session
+
+    scopes = sorted(scopes)
+    with get_read_session() as session:
+        found = dict(session.exec(_versions_query(scopes)).all())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+async def get_data_versions_async(scopes: Iterable[str]) -> Dict[str, int]:
+    """Async counterpart of :func:`get_data_versions` for async endpoints."""
+
+    from .database import get_async_read_session
+
+    scopes = sorted(scopes)
+    async with get_async_read_session() as session:
+        found = dict((await session.exec(_versions_query(scopes))).all())
+    return {scope: found.get(scope, 0) for scope in scopes}
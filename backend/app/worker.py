@@ -0,0 +1,40 @@
+"""Standalone job worker, run separately from the API: ``python -m app.worker``."""
+
+import argparse
+import signal
+import threading
+from typing import List, Optional
+
+from .services.job_queue import JobWorker
+from .services.log_service import record_log, shutdown_logs
+from .startup import run_startup
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run BookDiscoverAI background jobs.")
+    parser.add_argument("--threads", type=int, default=None, help="Jobs to run at once (default: JOB_WORKER_THREADS).")
+    parser.add_argument(
+        "--job-type", action="append", dest="job_types", help="Only claim this job type (repeatable)."
+    )
+    parser.add_argument("--once", action="store_true", help="Run every runnable job, then exit.")
+    args = parser.parse_args(argv)
+
+    run_startup(message="Job worker started")
+    worker = JobWorker(threads=args.threads, job_types=args.job_types)
+    try:
+        if args.once:
+            ran = worker.run_pending()
+            record_log("INFO", "Job worker drained queue", source="job-queue", context={"jobs": ran})
+            return
+        stopped = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopped.set())
+        worker.start()
+        stopped.wait()
+        worker.stop()
+    finally:
+        shutdown_logs()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Synthetic-data benchmarks for the BookDiscoverAI backend (``python -m benchmarks.run``)."""
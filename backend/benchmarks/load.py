@@ -0,0 +1,87 @@
+"""In-process HTTP load driver: concurrent requests through ``httpx.ASGITransport``.
+
+No server or sockets are involved, so results measure the app itself (routing,
+validation, services, the database) rather than the network stack.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import httpx
+
+from .stats import summarize
+
+DEFAULT_ENDPOINTS = (
+    "/api/recommendations?limit=25",
+    "/api/discovery/trope-feed?limit=25",
+    "/api/logs?limit=100",
+    "/api/logs?level=ERROR&limit=100",
+    "/api/feedback",
+    "/api/settings",
+)
+
+# cold: the feed response cache is cleared before every request, so each one does
+# the full work; warm: the cache behaves as in production; revalidate: clients send
+# If-None-Match with the ETag from a previous response.
+CACHE_MODES = ("cold", "warm", "revalidate")
+
+
+async def _drive(
+    client: httpx.AsyncClient, path: str, requests: int, concurrency: int, mode: str
+) -> Tuple[List[float], Counter, float]:
+    from app.api.cache import feed_cache
+
+    headers = {}
+    if mode == "revalidate":
+        etag = (await client.get(path)).headers.get("etag")
+        if etag:
+            headers["If-None-Match"] = etag
+    else:
+        await client.get(path)  # warm-up: first-run precomputes, pools, imports
+
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if mode == "cold":
+                feed_cache.clear()
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            samples.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, statuses, time.perf_counter() - started
+
+
+async def run_load(
+    endpoints: Iterable[str] = DEFAULT_ENDPOINTS,
+    requests: int = 200,
+    concurrency: int = 8,
+    modes: Iterable[str] = ("cold",),
+) -> Dict[str, Dict]:
+    """Return latency percentiles, throughput and status counts per endpoint and mode."""
+
+    from app.main import app
+
+    results: Dict[str, Dict] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for path in endpoints:
+            for mode in modes:
+                if mode not in CACHE_MODES:
+                    raise ValueError(f"Unknown cache mode: {mode}")
+                samples, statuses, elapsed = await _drive(client, path, requests, concurrency, mode)
+                summary = summarize(samples, elapsed)
+                summary["status"] = {str(code): count for code, count in sorted(statuses.items())}
+                results[f"GET {path} [{mode}]"] = summary
+    return results
@@ -0,0 +1,72 @@
+"""Microbenchmarks for the service functions behind the hot endpoints."""
+
+from __future__ import annotations
+
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional
+
+from .stats import summarize
+
+
+def time_call(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def _deep_log_cursor(pages: int) -> Optional[str]:
+    from app.services.log_service import fetch_logs
+
+    cursor = None
+    for _ in range(pages):
+        cursor = fetch_logs(limit=100, cursor=cursor).next_cursor
+        if cursor is None:
+            break
+    return cursor
+
+
+def service_benchmarks() -> Dict[str, Callable[[], object]]:
+    from app.services.feedback_service import fetch_feedback
+    from app.services.log_service import fetch_logs
+    from app.services.recommendation_service import get_recommendations, precompute_recommendations
+    from app.services.trope_profile import rebuild_trope_profile, verify_trope_profile
+    from app.services.catalog_service import get_candidate_catalog
+    from app.services.trope_service import extract_tropes, get_trope_recommendations
+
+    deep_cursor = _deep_log_cursor(50)
+    index = get_candidate_catalog().index
+    profile = Counter({trope: n + 1 for n, trope in enumerate(index.vocabulary[:12])})
+    return {
+        "get_recommendations": lambda: get_recommendations(25),
+        "get_trope_recommendations": lambda: get_trope_recommendations(25),
+        "trope_index_top_k": lambda: index.top_k(profile, 25),
+        "fetch_logs_first_page": lambda: fetch_logs(limit=100),
+        "fetch_logs_level_filter": lambda: fetch_logs(level="ERROR", limit=100),
+        "fetch_logs_deep_cursor": lambda: fetch_logs(limit=100, cursor=deep_cursor),
+        "fetch_feedback": lambda: fetch_feedback(),
+        "rebuild_trope_profile": rebuild_trope_profile,
+        "verify_trope_profile": verify_trope_profile,
+        "precompute_recommendations": lambda: precompute_recommendations(reason="benchmark"),
+        # Last: replaces the synthetic tropes with demo assignments (and re-precomputes).
+        "extract_tropes_force": lambda: extract_tropes(force=True),
+    }
+
+
+# Whole-library rewrites: run fewer times than the read paths.
+HEAVY = {"extract_tropes_force", "rebuild_trope_profile", "verify_trope_profile", "precompute_recommendations"}
+
+
+def run_microbenchmarks(repeat: int = 20, only: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+    selected = set(only) if only else None
+    results = {}
+    for name, fn in service_benchmarks().items():
+        if selected is not None and name not in selected:
+            continue
+        results[name] = time_call(fn, max(1, repeat // 5) if name in HEAVY else repeat)
+    return results
@@ -0,0 +1,189 @@
+"""Benchmark runner: ``python -m benchmarks.run --scale 100k --output results.json``.
+
+Builds a synthetic library in a scratch SQLite database (unless ``--database-url``
+is given), times setup, service microbenchmarks and in-process HTTP load, and
+writes one JSON document. Setup and several microbenchmarks rewrite tables, so
+``--database-url`` is refused unless ``--allow-writes`` is passed. ``--compare baseline.json`` exits non-zero when any
+benchmark's p95 regressed by more than ``--threshold``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .stats import compare
+
+SCALES = {
+    "1k": dict(books=1_000, feedback=200, logs=5_000, candidates=500),
+    "10k": dict(books=10_000, feedback=2_000, logs=50_000, candidates=5_000),
+    "100k": dict(books=100_000, feedback=20_000, logs=500_000, candidates=20_000),
+    "1m": dict(books=1_000_000, feedback=200_000, logs=2_000_000, candidates=50_000),
+}
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run BookDiscoverAI benchmarks on synthetic data.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k", help="Preset table sizes.")
+    for name in ("books", "tropes-per-book", "vocabulary", "feedback", "logs", "candidates", "seed"):
+        parser.add_argument(f"--{name}", type=int, default=None, help="Override the preset value.")
+    parser.add_argument("--suites", default="micro,load", help="Comma-separated: micro, load.")
+    parser.add_argument("--only", default=None, help="Comma-separated microbenchmark names to run.")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls per microbenchmark.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and cache mode.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight requests.")
+    parser.add_argument("--modes", default="cold,warm", help="Feed cache modes: cold, warm, revalidate.")
+    parser.add_argument("--database-url", default=None, help="Benchmark this database instead of a scratch one.")
+    parser.add_argument(
+        "--allow-writes",
+        action="store_true",
+        help="Let setup and microbenchmarks write to --database-url (seeding, precompute, forced extraction).",
+    )
+    parser.add_argument("--skip-load", action="store_true", help="Don't generate data (use with --database-url).")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON results here.")
+    parser.add_argument("--compare", type=Path, default=None, help="Baseline results to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative p95 growth.")
+    args = parser.parse_args(argv)
+    if args.database_url and not args.allow_writes:
+        parser.error("--database-url rewrites tables in that database; pass --allow-writes to confirm")
+    return args
+
+
+def _configure_environment(database_url: Optional[str]) -> str:
+    scratch = tempfile.mkdtemp(prefix="bookdiscover-bench-")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ["EMBEDDING_STORE_DIR"] = os.path.join(scratch, "embeddings")
+    os.environ["ENRICHMENT_CACHE_DIR"] = os.path.join(scratch, "http-cache")
+    os.environ["LOG_ARCHIVE_DIR"] = os.path.join(scratch, "log-archive")
+    os.environ["CATALOG_IMPORT_DIR"] = os.path.join(scratch, "catalog")
+    os.environ["COVER_CACHE_DIR"] = os.path.join(scratch, "covers")
+    # Timed feed requests must not fetch upstream covers in the background.
+    os.environ["COVER_PREFETCH_ENABLED"] = "false"
+    os.environ["JOB_EMBEDDED_WORKER"] = "false"
+    return os.environ["DATABASE_URL"]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(timings: Dict[str, float], name: str, fn):
+    started = time.perf_counter()
+    result = fn()
+    timings[name] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    database_url = _configure_environment(args.database_url)
+
+    # App modules read settings at import time, so import them only after the
+    # environment points at the benchmark database.
+    from app.database import create_db_and_tables
+    from app.services.catalog_service import get_candidate_catalog, import_records
+    from app.services.log_service import flush_logs, shutdown_logs
+    from app.services.recommendation_service import precompute_recommendations
+    from app.services.settings_service import ensure_settings_row
+    from app.services.trope_profile import rebuild_trope_profile
+
+    from .load import run_load
+    from .micro import run_microbenchmarks
+    from .synthetic import LibrarySpec, candidate_catalog, load_library
+
+    overrides = {
+        key: value
+        for key, value in (
+            ("books", args.books),
+            ("tropes_per_book", args.tropes_per_book),
+            ("vocabulary", args.vocabulary),
+            ("feedback", args.feedback),
+            ("logs", args.logs),
+            ("candidates", args.candidates),
+            ("seed", args.seed),
+        )
+        if value is not None
+    }
+    spec = replace(LibrarySpec(**SCALES[args.scale]), **overrides)
+    random.seed(spec.seed)
+    suites = {suite.strip() for suite in args.suites.split(",") if suite.strip()}
+
+    setup: Dict[str, object] = {}
+    _timed(setup, "create_schema_s", create_db_and_tables)
+    ensure_settings_row()
+    if not args.skip_load:
+        setup["rows"] = _timed(setup, "load_library_s", lambda: load_library(spec))
+    _timed(setup, "import_catalog_s", lambda: import_records(enumerate(candidate_catalog(spec), start=1)))
+    _timed(setup, "build_candidate_index_s", get_candidate_catalog)
+    _timed(setup, "rebuild_trope_profile_s", rebuild_trope_profile)
+    _timed(setup, "precompute_recommendations_s", lambda: precompute_recommendations(reason="benchmark"))
+    flush_logs()
+
+    results: Dict[str, object] = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split("://", 1)[0],
+            "spec": spec.as_dict(),
+            "repeat": args.repeat,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "setup": setup,
+    }
+    if "load" in suites:
+        # Before the microbenchmarks: extract_tropes_force rewrites the trope table.
+        modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+        results["load"] = asyncio.run(run_load(requests=args.requests, concurrency=args.concurrency, modes=modes))
+    if "micro" in suites:
+        only = [name.strip() for name in args.only.split(",")] if args.only else None
+        results["micro"] = run_microbenchmarks(repeat=args.repeat, only=only)
+    shutdown_logs()
+
+    document = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        args.output.write_text(document + "\n")
+    else:
+        print(document)
+    _print_summary(results)
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), results, threshold=args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def _print_summary(results: Dict[str, object]) -> None:
+    for section in ("load", "micro"):
+        for name, stats in (results.get(section) or {}).items():
+            throughput = f" {stats['throughput_rps']:>9.1f} rps" if "throughput_rps" in stats else ""
+            print(
+                f"{section:<5} {name:<55} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms"
+                f"  p99 {stats['p99_ms']:>9.2f}ms{throughput}",
+                file=sys.stderr,
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
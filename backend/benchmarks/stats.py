@@ -0,0 +1,52 @@
+"""Latency summaries and run-to-run comparison."""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Mapping, Sequence
+
+
+def percentile(sorted_samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def summarize(samples: Sequence[float], elapsed: float = 0.0) -> Dict[str, float]:
+    """Summarize per-call durations in seconds as milliseconds (plus throughput if ``elapsed``)."""
+
+    ordered = sorted(samples)
+    summary = {
+        "count": len(ordered),
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "min_ms": round(1000 * ordered[0], 3) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 50), 3),
+        "p95_ms": round(1000 * percentile(ordered, 95), 3),
+        "p99_ms": round(1000 * percentile(ordered, 99), 3),
+        "max_ms": round(1000 * ordered[-1], 3) if ordered else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(ordered) / elapsed, 2)
+    return summary
+
+
+def compare(
+    baseline: Mapping[str, Mapping], current: Mapping[str, Mapping], threshold: float = 0.2, metric: str = "p95_ms"
+) -> List[str]:
+    """Return a line per benchmark whose ``metric`` grew by more than ``threshold``.
+
+    Both arguments are result documents as written by ``benchmarks.run``; every
+    section (``micro``, ``load``) is compared benchmark by benchmark.
+    """
+
+    regressions = []
+    for section in ("micro", "load"):
+        before, after = baseline.get(section) or {}, current.get(section) or {}
+        for name in sorted(set(before) & set(after)):
+            old, new = before[name].get(metric), after[name].get(metric)
+            if old and new and new > old * (1 + threshold):
+                regressions.append(f"{section}/{name}: {metric} {old:.3f} -> {new:.3f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
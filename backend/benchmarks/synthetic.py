@@ -0,0 +1,163 @@
+"""Deterministic synthetic library generator.
+
+Every table draws from its own ``random.Random`` seeded with ``(seed, table)``, so
+the rows for one table don't change when another table's scale does. Rows are
+yielded as plain dicts and written with Core bulk inserts.
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+# Fixed reference time so generated timestamps are identical across runs.
+EPOCH = datetime(2024, 1, 1)
+
+_ADJECTIVES = ["Crimson", "Silver", "Hollow", "Gilded", "Shattered", "Moonlit", "Ashen", "Veiled", "Wild", "Frozen"]
+_NOUNS = ["Crown", "Oath", "Throne", "Tide", "Ember", "Court", "Grimoire", "Bargain", "Spire", "Thorn"]
+_FIRST = ["Mira", "Rowan", "Isla", "Khalia", "Aster", "Elara", "Lena", "Cass", "Nyx", "Theo"]
+_LAST = ["Lark", "Dusk", "Illyr", "Quinn", "Voss", "Hargrave", "Fenwick", "Rook", "Rowen", "Vale"]
+_REACTIONS = ["liked", "loved", "skipped", "disliked", "neutral"]
+_REACTION_WEIGHTS = [40, 15, 30, 10, 5]
+_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+_LEVEL_WEIGHTS = [10, 75, 10, 5]
+_SOURCES = ["backend", "frontend", "trope-engine", "recommendation-engine", "enrichment", "job-queue"]
+
+
+@dataclass(frozen=True)
+class LibrarySpec:
+    books: int = 10_000
+    tropes_per_book: int = 3
+    vocabulary: int = 60
+    feedback: int = 2_000
+    logs: int = 50_000
+    candidates: int = 5_000
+    seed: int = 42
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def _rng(seed: int, table: str) -> random.Random:
+    return random.Random(f"{seed}:{table}")
+
+
+def trope_vocabulary(size: int) -> List[str]:
+    from app.services.trope_extractor import TROPE_LIBRARY
+
+    extra = [f"synthetic trope {n}" for n in range(max(0, size - len(TROPE_LIBRARY)))]
+    return (TROPE_LIBRARY + extra)[:size]
+
+
+def book_rows(spec: LibrarySpec, first_id: int = 1) -> Iterator[dict]:
+    rng = _rng(spec.seed, "book")
+    for n in range(spec.books):
+        title = f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {n}"
+        yield {
+            "id": first_id + n,
+            "title": title,
+            "author": f"{rng.choice(_FIRST)} {rng.choice(_LAST)}",
+            "description": f"A synthetic {rng.choice(_NOUNS).lower()} story for benchmarking.",
+            "cover_url": f"https://placehold.co/400x600?text={n}",
+            "reason": None,
+        }
+
+
+def book_trope_rows(spec: LibrarySpec, first_id: int = 1) -> Iterator[dict]:
+    rng = _rng(spec.seed, "booktrope")
+    vocabulary = trope_vocabulary(spec.vocabulary)
+    # Zipf-like popularity so a few tropes dominate, as in a real library.
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    extracted_at = EPOCH
+    for n in range(spec.books):
+        chosen: List[str] = []
+        while len(chosen) < min(spec.tropes_per_book, len(vocabulary)):
+            trope = rng.choices(vocabulary, weights)[0]
+            if trope not in chosen:
+                chosen.append(trope)
+        for trope in chosen:
+            yield {
+                "book_id": first_id + n,
+                "trope": trope,
+                "source": "synthetic",
+                "confidence": round(rng.uniform(0.6, 0.95), 3),
+                "extracted_at": extracted_at,
+            }
+
+
+def feedback_rows(spec: LibrarySpec, first_id: int = 1) -> Iterator[dict]:
+    rng = _rng(spec.seed, "feedback")
+    for _ in range(spec.feedback if spec.books else 0):
+        yield {
+            "book_id": first_id + rng.randrange(spec.books),
+            "reaction": rng.choices(_REACTIONS, _REACTION_WEIGHTS)[0],
+            "note": None,
+            "created_at": EPOCH + timedelta(seconds=rng.randrange(90 * 86400)),
+        }
+
+
+def log_rows(spec: LibrarySpec) -> Iterator[dict]:
+    rng = _rng(spec.seed, "logentry")
+    for n in range(spec.logs):
+        yield {
+            "level": rng.choices(_LEVELS, _LEVEL_WEIGHTS)[0],
+            "source": rng.choice(_SOURCES),
+            "message": f"Synthetic event {n}",
+            "context": {"n": n},
+            "created_at": EPOCH + timedelta(seconds=rng.randrange(30 * 86400), microseconds=n % 1_000_000),
+        }
+
+
+def candidate_catalog(spec: LibrarySpec) -> Iterator[dict]:
+    """Catalog dump records, as read by ``catalog_service.import_records``."""
+
+    rng = _rng(spec.seed, "candidate")
+    vocabulary = trope_vocabulary(spec.vocabulary)
+    for n in range(spec.candidates):
+        tropes = rng.sample(vocabulary, rng.randint(1, min(5, len(vocabulary))))
+        yield {
+            "id": f"candidate-{n}",
+            "title": f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} (candidate {n})",
+            "author": f"{rng.choice(_FIRST)} {rng.choice(_LAST)}",
+            "description": "A synthetic catalog candidate.",
+            "cover_url": None,
+            "tropes": tropes,
+            "explanation": f"Leans into {tropes[0]}.",
+        }
+
+
+def _bulk_insert(connection, table, rows: Iterable[dict], chunk_size: int) -> int:
+    from sqlalchemy import insert
+
+    written = 0
+    chunk: List[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            connection.execute(insert(table), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+        written += len(chunk)
+    return written
+
+
+def load_library(spec: LibrarySpec, chunk_size: int = 5_000) -> Dict[str, int]:
+    """Insert the synthetic library after any existing books; returns rows per table."""
+
+    from sqlalchemy import func, select
+
+    from app.database import get_engine
+    from app.models import Book, BookTrope, Feedback, LogEntry
+
+    with get_engine().begin() as connection:
+        first_id = (connection.execute(select(func.max(Book.id))).scalar() or 0) + 1
+        return {
+            "book": _bulk_insert(connection, Book.__table__, book_rows(spec, first_id), chunk_size),
+            "booktrope": _bulk_insert(connection, BookTrope.__table__, book_trope_rows(spec, first_id), chunk_size),
+            "feedback": _bulk_insert(connection, Feedback.__table__, feedback_rows(spec, first_id), chunk_size),
+            "logentry": _bulk_insert(connection, LogEntry.__table__, log_rows(spec), chunk_size),
+        }
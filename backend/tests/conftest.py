@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="bookdiscover-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
+os.environ.setdefault("EMBEDDING_STORE_DIR", os.path.join(_DB_DIR, "embeddings"))
+os.environ.setdefault("ENRICHMENT_CACHE_DIR", os.path.join(_DB_DIR, "http-cache"))
+os.environ.setdefault("LOG_ARCHIVE_DIR", os.path.join(_DB_DIR, "log-archive"))
+os.environ.setdefault("CATALOG_IMPORT_DIR", os.path.join(_DB_DIR, "catalog"))
+os.environ.setdefault("COVER_CACHE_DIR", os.path.join(_DB_DIR, "covers"))
+# Feeds would otherwise fetch the demo covers from the network after each page.
+os.environ.setdefault("COVER_PREFETCH_ENABLED", "false")
+os.environ.setdefault("GOOGLE_BOOKS_RATE_LIMIT", "1000")
+os.environ.setdefault("OPEN_LIBRARY_RATE_LIMIT", "1000")
+os.environ.setdefault("TROPE_LLM_RATE_LIMIT", "1000")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _create_schema() -> None:
+    from app.database import create_db_and_tables
+
+    create_db_and_tables()
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException
+from sqlmodel import select
+
+from app.database import get_session
+from app.models import Book, LibrarySyncState, SyncJob
+from app.services.sync_service import sync_library
+
+
+def _stand_in_abs(libraries: dict, requests: list) -> FastAPI:
+    server = FastAPI()
+
+    @server.get("/api/libraries")
+    def list_libraries(authorization: str = Header("")) -> dict:
+        if authorization != "Bearer secret":
+            raise HTTPException(status_code=401)
+        return {"libraries": [{"id": key, "name": key.title(), "mediaType": "book"} for key in libraries]}
+
+    @server.get("/api/libraries/{library_id}/items")
+    def list_items(library_id: str, limit: int, page: int, sort: str, desc: int) -> dict:
+        requests.append((library_id, page))
+        items = sorted(libraries[library_id], key=lambda item: item["updatedAt"], reverse=bool(desc))
+        return {"results": items[page * limit : (page + 1) * limit], "total": len(items), "limit": limit, "page": page}
+
+    return server
+
+
+def _item(library: str, n: int, updated: int) -> dict:
+    return {
+        "id": f"{library}-{n}",
+        "updatedAt": updated,
+        "media": {"metadata": {"title": f"{library} title {n}", "authorName": "Stand In", "description": "A test item."}},
+    }
+
+
+def test_incremental_sync_against_stand_in_server(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.sync_service.get_settings", lambda: _settings())
+    libraries = {
+        "fantasy": [_item("fantasy", n, 1_000 + n) for n in range(23)],
+        "romance": [_item("romance", n, 2_000 + n) for n in range(7)],
+    }
+    requests: list = []
+    transport = httpx.ASGITransport(app=_stand_in_abs(libraries, requests))
+    with get_session() as session:
+        job = SyncJob(status="running")
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    written = asyncio.run(sync_library(job.id, "http://abs.local", "secret", transport=transport))
+    assert written == 30
+    with get_session() as session:
+        synced = list(session.exec(select(Book).where(Book.abs_library_id.in_(["fantasy", "romance"]))))
+        marks = {state.library_id: state.high_water_mark for state in session.exec(select(LibrarySyncState))}
+        progress = session.get(SyncJob, job.id).progress
+    assert len(synced) == 30
+    assert marks == {"fantasy": 1_022, "romance": 2_006}
+    assert progress["fantasy"] == {"pages": 5, "total_pages": 5, "items": 23}
+
+    libraries["fantasy"][3]["updatedAt"] = 5_000
+    libraries["fantasy"][3]["media"]["metadata"]["title"] = "Retitled"
+    requests.clear()
+    written = asyncio.run(sync_library(job.id, "http://abs.local", "secret", transport=transport))
+    assert written == 1
+    assert sorted(requests) == [("fantasy", 0), ("romance", 0)]
+    with get_session() as session:
+        retitled = session.exec(select(Book).where(Book.abs_item_id == "fantasy-3")).one()
+        total = len(list(session.exec(select(Book.id).where(Book.abs_library_id == "fantasy"))))
+    assert retitled.title == "Retitled"
+    assert total == 23
+
+
+def _settings():
+    from app.config import Settings
+
+    return Settings(abs_page_size=5, abs_max_concurrency=2)
+
+
+def test_full_pass_removes_books_deleted_from_abs(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.sync_service.get_settings", lambda: _settings())
+    libraries = {"history": [_item("history", n, 3_000 + n) for n in range(8)]}
+    transport = httpx.ASGITransport(app=_stand_in_abs(libraries, []))
+    with get_session() as session:
+        job = SyncJob(status="running")
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    asyncio.run(sync_library(job.id, "http://abs.local", "secret", transport=transport))
+    removed = libraries["history"].pop(2)
+    written = asyncio.run(sync_library(job.id, "http://abs.local", "secret", transport=transport))
+    assert written == 0
+    with get_session() as session:
+        assert session.exec(select(Book).where(Book.abs_item_id == removed["id"])).first() is not None
+        state = session.get(LibrarySyncState, "history")
+        state.last_full_sync_at = None
+        session.add(state)
+
+    asyncio.run(sync_library(job.id, "http://abs.local", "secret", transport=transport))
+    with get_session() as session:
+        remaining = set(session.exec(select(Book.abs_item_id).where(Book.abs_library_id == "history")))
+    assert remaining == {item["id"] for item in libraries["history"]}
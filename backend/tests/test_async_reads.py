@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import async_database_url, get_async_read_session
+from app.services.feedback_service import fetch_feedback, fetch_feedback_async
+from app.services.log_service import fetch_logs, fetch_logs_async, flush_logs, record_log
+from app.services.recommendation_service import get_recommendations, get_recommendations_async
+from app.services.settings_service import get_settings_snapshot, get_settings_snapshot_async
+from app.services.trope_service import get_trope_recommendations, get_trope_recommendations_async
+
+
+def test_async_database_url() -> None:
+    assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert async_database_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u@h/db")
+
+
+def test_async_services_match_sync_services() -> None:
+    for n in range(3):
+        record_log("INFO", f"async {n}", source="async-reads")
+    flush_logs()
+    # The first trope feed may extract tropes and precompute a new generation.
+    asyncio.run(get_trope_recommendations_async(5))
+
+    async def scenario():
+        return (
+            await get_trope_recommendations_async(5),
+            await get_recommendations_async(5),
+            await fetch_logs_async(source="async-reads", limit=2),
+            await fetch_feedback_async(),
+            await get_settings_snapshot_async(),
+        )
+
+    tropes, recommendations, logs, feedback, settings = asyncio.run(scenario())
+    assert recommendations == get_recommendations(5)
+    assert tropes == get_trope_recommendations(5)
+    assert logs == fetch_logs(source="async-reads", limit=2)
+    assert logs.next_cursor is not None
+    assert feedback == fetch_feedback()
+    assert settings == get_settings_snapshot()
+
+
+def test_async_read_session_is_query_only() -> None:
+    async def scenario() -> None:
+        async with get_async_read_session() as session:
+            await session.exec(text("INSERT INTO logentry (level, source, message) VALUES ('INFO', 'x', 'y')"))
+
+    with pytest.raises(OperationalError):
+        asyncio.run(scenario())
@@ -0,0 +1,25 @@
+from dataclasses import replace
+
+from benchmarks.stats import compare, summarize
+from benchmarks.synthetic import LibrarySpec, book_trope_rows, candidate_catalog, feedback_rows, log_rows
+
+
+def test_generator_is_deterministic_per_table() -> None:
+    spec = LibrarySpec(books=200, feedback=50, logs=100, candidates=30, seed=7)
+    assert list(book_trope_rows(spec)) == list(book_trope_rows(spec))
+    assert list(candidate_catalog(spec)) == list(candidate_catalog(spec))
+    # Changing another table's scale leaves this table's rows untouched.
+    assert list(log_rows(spec)) == list(log_rows(replace(spec, books=500, feedback=10)))
+    assert list(feedback_rows(spec)) != list(feedback_rows(replace(spec, seed=8)))
+    pairs = [(row["book_id"], row["trope"]) for row in book_trope_rows(spec)]
+    assert len(pairs) == len(set(pairs)) == 200 * spec.tropes_per_book
+
+
+def test_summary_percentiles_and_regression_check() -> None:
+    summary = summarize([n / 1000 for n in range(1, 101)], elapsed=2.0)
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert summary["throughput_rps"] == 50.0
+
+    baseline = {"micro": {"fast": {"p95_ms": 10.0}, "slow": {"p95_ms": 10.0}}}
+    current = {"micro": {"fast": {"p95_ms": 11.0}, "slow": {"p95_ms": 15.0}}}
+    assert [line.split(":")[0] for line in compare(baseline, current, threshold=0.2)] == ["micro/slow"]
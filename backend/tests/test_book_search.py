@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.database import get_session
+from app.main import app
+from app.models import Book
+from app.services import search_service
+from app.services.search_service import search_books
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _library() -> None:
+    with get_session() as session:
+        session.add_all(
+            [
+                Book(title="Quillfire Chronicles", author="Ada Marrow", description="A quillsmith forges enchanted pens."),
+                Book(title="The Glass Quillmaker", author="Ben Ostry", description="Quillfire burns in a desert city of glass."),
+                Book(title="Harbor Lights", author="Quill Ashby", description="A lighthouse keeper's quiet summer."),
+                Book(title="Ember Vows", author="Rhea Dunmore", description="Two quillfire duelists bargain with a café oracle."),
+            ]
+        )
+
+
+def test_search_ranks_prefixes_and_highlights() -> None:
+    client = TestClient(app)
+    body = client.get("/api/books/search", params={"q": "quillf"}).json()
+    titles = [item["book"]["title"] for item in body["items"]]
+    # Title matches outrank description-only matches.
+    assert titles[0] == "Quillfire Chronicles"
+    assert set(titles) == {"Quillfire Chronicles", "The Glass Quillmaker", "Ember Vows"}
+    assert body["items"][0]["title"] == "<mark>Quillfire</mark> Chronicles"
+    snippets = {item["book"]["title"]: item["snippet"] for item in body["items"]}
+    assert "<mark>quillfire</mark> duelists" in snippets["Ember Vows"]
+
+    # Every term must match, and accents fold.
+    both = client.get("/api/books/search", params={"q": "quillfire cafe"}).json()
+    assert [item["book"]["title"] for item in both["items"]] == ["Ember Vows"]
+
+    with get_session() as session:
+        book = session.exec(select(Book).where(Book.title == "Harbor Lights")).one()
+        book.title = "Harbor Quillfire"
+        session.add(book)
+    retitled = client.get("/api/books/search", params={"q": "harbor"}).json()
+    assert retitled["items"][0]["title"] == "<mark>Harbor</mark> Quillfire"
+
+
+def test_search_pages_with_cursor() -> None:
+    full = search_books("quill", limit=50).items
+    seen, cursor = [], None
+    while True:
+        page = search_books("quill", limit=1, cursor=cursor)
+        seen += page.items
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert [item.book.id for item in seen] == [item.book.id for item in full]
+    with pytest.raises(ValueError):
+        search_books("other", cursor=search_books("quill", limit=1).next_cursor)
+    assert TestClient(app).get("/api/books/search", params={"q": "quill", "cursor": "bad"}).status_code == 400
+
+
+def test_memory_index_matches_fts(monkeypatch) -> None:
+    for query in ("quill", "quillfire", "glass quill", "ember"):
+        fts = search_books(query, limit=50).items
+        monkeypatch.setattr(search_service, "_fts_enabled", False)
+        memory = search_books(query, limit=50).items
+        monkeypatch.setattr(search_service, "_fts_enabled", True)
+        assert [item.book.id for item in memory] == [item.book.id for item in fts]
+        assert [item.title for item in memory] == [item.title for item in fts]
+        for a, b in zip(memory, fts):
+            assert a.score == pytest.approx(b.score, rel=1e-6, abs=1e-9)
+
+
+def test_highlights_escape_stored_markup(monkeypatch) -> None:
+    with get_session() as session:
+        session.add(Book(title="<img src=x> Zanzibar & Sons", author="Q", description="Zanzibar <b>tides</b> rise."))
+    fts = search_books("zanzibar").items[0]
+    assert fts.title == "&lt;img src=x&gt; <mark>Zanzibar</mark> &amp; Sons"
+    assert fts.snippet == "<mark>Zanzibar</mark> &lt;b&gt;tides&lt;/b&gt; rise."
+    monkeypatch.setattr(search_service, "_fts_enabled", False)
+    memory = search_books("zanzibar").items[0]
+    assert (memory.title, memory.snippet) == (fts.title, fts.snippet)
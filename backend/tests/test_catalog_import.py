@@ -0,0 +1,100 @@
+import gzip
+import json
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import get_read_session
+from app.main import app
+from app.models import CatalogCandidate, CatalogTrope
+from app.services import catalog_service
+from app.services.catalog_service import get_candidate_catalog, import_catalog
+from app.services.job_queue import JobWorker
+
+
+def _record(n: int, **overrides) -> dict:
+    return {
+        "id": f"import-test-{n}",
+        "title": f"Import Test {n}",
+        "author": "Catalog Author",
+        "tropes": ["Slow  Burn", "space opera", "slow burn"],
+        **overrides,
+    }
+
+
+def _stored_tropes(external_id: str) -> list:
+    with get_read_session() as session:
+        return list(
+            session.exec(
+                select(CatalogTrope.trope)
+                .join(CatalogCandidate, CatalogCandidate.id == CatalogTrope.candidate_id)
+                .where(CatalogCandidate.external_id == external_id)
+                .order_by(CatalogTrope.position)
+            )
+        )
+
+
+def test_streaming_import_validates_and_upserts(tmp_path: Path) -> None:
+    dump = tmp_path / "catalog.jsonl.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as handle:
+        for n in range(5):
+            handle.write(json.dumps(_record(n)) + "\n")
+        handle.write(json.dumps(_record(5, title="")) + "\n")
+        handle.write("{not json\n")
+        handle.write(json.dumps(_record(1, tropes=["found family"])) + "\n")
+
+    progress = []
+    report = import_catalog(dump, chunk_size=2, progress=lambda report: progress.append(report.read))
+    assert (report.read, report.inserted, report.updated, report.invalid) == (8, 5, 1, 2)
+    assert report.errors == ["line 6: missing title", "line 7: invalid JSON (Expecting property name enclosed in double quotes)"]
+    assert progress == [2, 4, 8]
+    assert _stored_tropes("import-test-0") == ["slow burn", "space opera"]
+    assert _stored_tropes("import-test-1") == ["found family"]
+
+    csv_dump = tmp_path / "update.csv"
+    csv_dump.write_text("id,title,author,tropes\nimport-test-0,Import Test 0,Catalog Author,space opera|found family\n")
+    report = import_catalog(csv_dump)
+    assert (report.inserted, report.updated) == (0, 1)
+    assert _stored_tropes("import-test-0") == ["space opera", "found family"]
+
+    catalog = get_candidate_catalog()
+    rows = [row for row in range(len(catalog)) if "space opera" in catalog.index.tropes(row)]
+    assert {candidate.external_id for candidate in catalog.load(rows).values()} == {
+        f"import-test-{n}" for n in (0, 2, 3, 4)
+    }
+
+
+def test_import_endpoint_queues_job_with_progress() -> None:
+    directory = Path(get_settings().catalog_import_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "queued.jsonl").write_text("".join(json.dumps(_record(n)) + "\n" for n in range(10, 13)))
+    client = TestClient(app)
+
+    assert client.post("/api/catalog/import", params={"file": "../outside.jsonl"}).status_code == 400
+    response = client.post("/api/catalog/import", params={"file": "queued.jsonl"})
+    assert response.status_code == 200
+    assert response.json()["scheduled"] is True
+
+    JobWorker(job_types=["catalog_import"]).run_pending()
+    status = client.get("/api/catalog/import/status").json()
+    assert status["status"] == "completed"
+    assert status["progress"]["inserted"] == 3
+    assert _stored_tropes("import-test-11") == ["slow burn", "space opera"]
+
+
+def test_stale_view_is_served_until_the_import_finishes(monkeypatch) -> None:
+    served = get_candidate_catalog()
+    monkeypatch.setattr(catalog_service, "_imports", 1)
+    catalog_service._import_records([(1, _record(90))], None, None)
+    assert get_candidate_catalog() is served  # still importing: no rebuild yet
+
+    monkeypatch.setattr(catalog_service, "_imports", 0)
+    assert get_candidate_catalog() is served  # the rebuild runs in the background
+    deadline = time.monotonic() + 5
+    while get_candidate_catalog() is served and time.monotonic() < deadline:
+        time.sleep(0.01)
+    rebuilt = get_candidate_catalog()
+    assert len(rebuilt) == len(served) + 1
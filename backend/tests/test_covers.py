@@ -0,0 +1,140 @@
+import io
+import uuid
+
+import httpx
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import get_session
+from app.main import app
+from app.models import Book
+from app.services import cover_service
+from app.services.catalog_service import import_records
+from app.services.cover_service import CoverCache, get_cover_cache
+from app.services.recommendation_service import precompute_recommendations
+from app.services.sync_service import _seed_books
+
+
+def _png(width: int, height: int, color=(200, 40, 90)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _upstream(monkeypatch, body: bytes, content_type: str = "image/png") -> list:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        return httpx.Response(200, content=body, headers={"content-type": content_type})
+
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(cover_service, "_client", lambda _=None: httpx.AsyncClient(transport=transport))
+    return calls
+
+
+def _book(title: str, cover_url) -> int:
+    with get_session() as session:
+        book = Book(title=title, author="Cover Tester", cover_url=cover_url)
+        session.add(book)
+        session.flush()
+        return book.id
+
+
+def test_serves_resized_variants_from_one_fetch(monkeypatch) -> None:
+    calls = _upstream(monkeypatch, _png(1000, 1500))
+    book_id = _book("Cover Proxy", "https://covers.example/proxy.png")
+    client = TestClient(app)
+
+    thumb = client.get(f"/api/covers/{book_id}?size=thumb")
+    assert thumb.status_code == 200
+    assert thumb.headers["content-type"] == "image/jpeg"
+    assert "max-age=" in thumb.headers["cache-control"]
+    assert Image.open(io.BytesIO(thumb.content)).size == (160, 240)
+
+    card = client.get(f"/api/covers/{book_id}")
+    assert Image.open(io.BytesIO(card.content)).size == (480, 720)
+    assert card.headers["etag"] != thumb.headers["etag"]
+    assert calls == ["https://covers.example/proxy.png"]
+
+    revalidated = client.get(f"/api/covers/{book_id}?size=thumb", headers={"If-None-Match": thumb.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert len(calls) == 1
+
+
+def test_identical_images_are_stored_once(monkeypatch) -> None:
+    _upstream(monkeypatch, _png(800, 1200, color=(10, 120, 30)))
+    first = _book("Shared Cover A", "https://covers.example/shared-a.png")
+    second = _book("Shared Cover B", "https://covers.example/shared-b.png")
+    client = TestClient(app)
+
+    responses = [client.get(f"/api/covers/{book_id}") for book_id in (first, second)]
+    assert responses[0].headers["etag"] == responses[1].headers["etag"]
+    cache = get_cover_cache()
+    assert cache.get("https://covers.example/shared-a.png", "card") == cache.get(
+        "https://covers.example/shared-b.png", "card"
+    )
+
+
+def test_catalog_covers_accept_slashed_ids(monkeypatch) -> None:
+    calls = _upstream(monkeypatch, _png(300, 450))
+    record = {
+        "id": "/works/OL123W",
+        "title": "Slashed",
+        "author": "Tester",
+        "cover_url": "https://covers.example/ol.png",
+        "tropes": ["found family"],
+    }
+    import_records([(1, record)])
+
+    response = TestClient(app).get("/api/covers/catalog/%2Fworks%2FOL123W?size=thumb")
+    assert response.status_code == 200
+    assert calls == ["https://covers.example/ol.png"]
+
+
+def test_missing_and_broken_covers(monkeypatch) -> None:
+    _upstream(monkeypatch, b"<html>not found</html>", content_type="text/html")
+    no_cover = _book("No Cover", None)
+    broken = _book("Broken Cover", "https://covers.example/broken")
+    client = TestClient(app)
+
+    assert client.get(f"/api/covers/{no_cover}").status_code == 404
+    assert client.get(f"/api/covers/{broken}").status_code == 502
+    assert client.get(f"/api/covers/{broken}?size=huge").status_code == 422
+
+
+def test_cache_evicts_least_recently_served(tmp_path) -> None:
+    cache = CoverCache(tmp_path, max_bytes=2500)
+    for name in ("one", "two", "three"):
+        cache.put(f"https://covers.example/{name}", {"card": ((name * 400).encode()[:1000], "image/jpeg")})
+        if name == "two":
+            cache.get("https://covers.example/one", "card")
+
+    assert cache.get("https://covers.example/two", "card") is None
+    assert cache.get("https://covers.example/one", "card") is not None
+    assert cache.evictions == 1 and cache.nbytes <= cache.max_bytes
+
+
+def test_feed_page_prefetches_next_page_covers(monkeypatch) -> None:
+    monkeypatch.setattr(get_settings(), "cover_prefetch_enabled", True)
+    calls = _upstream(monkeypatch, _png(600, 900, color=(90, 90, 200)))
+    run = uuid.uuid4().hex
+    with get_session() as session:
+        _seed_books(session)
+        # Fresh URLs, so covers cached by earlier tests cannot satisfy the prefetch.
+        for book in session.exec(select(Book)):
+            book.cover_url = f"https://covers.example/{run}/{book.id}.png"
+            session.add(book)
+    precompute_recommendations(reason="test")
+    client = TestClient(app)
+    headers = {"X-User-Id": "cover-reader"}
+
+    first = client.get("/api/recommendations?limit=1", headers=headers).json()
+    assert len(calls) == 1
+    following = client.get(f"/api/recommendations?limit=1&cursor={first['next_cursor']}", headers=headers).json()
+    upcoming = following["items"][0]["book"]
+    # Fetched while serving the first page; serving this one warmed the page after it.
+    assert calls[0] == upcoming["cover_url"]
+    assert get_cover_cache().get(upcoming["cover_url"], "card") is not None
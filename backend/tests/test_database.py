@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.config import Settings
+from app.database import get_engine, get_read_engine, get_read_session, get_session, resolve_profile
+from app.models import LogEntry
+
+
+def test_profile_resolution() -> None:
+    assert resolve_profile(Settings(database_url="sqlite:///./x.db")) == "sqlite"
+    assert resolve_profile(Settings(database_url="sqlite://")) == "default"
+    assert resolve_profile(Settings(database_url="postgresql://u@h/db")) == "postgres"
+    assert resolve_profile(Settings(database_url="sqlite:///./x.db", database_profile="default")) == "default"
+
+
+def test_sqlite_profile_uses_wal_and_query_only_readers() -> None:
+    with get_engine().connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    with get_read_engine().connect() as connection:
+        assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+    with get_read_session() as session:
+        with pytest.raises(OperationalError):
+            session.add(LogEntry(message="should not be written"))
+            session.flush()
+
+
+def test_concurrent_writers_queue_on_the_writer_connection() -> None:
+    def write(n: int) -> None:
+        with get_session() as session:
+            session.add(LogEntry(source="db-concurrency", message=str(n)))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(write, range(200)))
+    with get_read_session() as session:
+        count = session.exec(text("SELECT count(*) FROM logentry WHERE source = 'db-concurrency'")).scalar()
+    assert count == 200
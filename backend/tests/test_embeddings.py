@@ -0,0 +1,87 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.database import get_session
+from app.main import app
+from app.models import Book
+from app.services.catalog_service import import_records
+from app.services.embedding_service import HashingEmbeddingProvider, _book_index, _candidate_index
+from app.services.sync_service import _seed_books
+from app.services.vector_index import VectorIndex, VectorStore
+
+
+def test_hashing_provider_is_deterministic_and_normalized() -> None:
+    provider = HashingEmbeddingProvider(dimensions=64)
+    first = provider.embed(["A dragon rider and a mage", ""])
+    second = HashingEmbeddingProvider(dimensions=64).embed(["A dragon rider and a mage", ""])
+    assert np.array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+
+def test_vector_store_roundtrip_and_ivf_recall(tmp_path) -> None:
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(4000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    store = VectorStore.write(tmp_path / "vectors", vectors, list(range(4000)), {"fingerprint": "x"})
+    assert isinstance(store.vectors, np.memmap)
+    assert store.fingerprint == "x"
+
+    exact = VectorIndex(store.vectors, mode="exact")
+    ivf = VectorIndex(store.vectors, mode="ivf", nprobe=16)
+    queries = vectors[:50] + rng.normal(scale=0.1, size=(50, 32)).astype(np.float32)
+    hits = 0
+    for query in queries:
+        expected = [row for row, _ in exact.search(query, 10)]
+        assert expected == sorted(expected, key=lambda row: -float(vectors[row] @ query))
+        hits += len(set(expected) & {row for row, _ in ivf.search(query, 10)})
+    assert hits / 500 > 0.8
+    assert exact.search(vectors[0], 1, exclude=np.array([0]))[0][0] != 0
+
+
+def test_embedding_feed() -> None:
+    client = TestClient(app)
+    client.get("/api/recommendations?limit=1")
+    body = client.get("/api/discovery/embedding-feed?limit=3").json()
+    assert len(body["items"]) == 3
+    scores = [item["score"] for item in body["items"]]
+    assert scores == sorted(scores, reverse=True)
+    assert body["items"][0]["similar_to"]
+
+
+def test_book_store_follows_text_edits() -> None:
+    with get_session() as session:
+        _seed_books(session)
+    provider = HashingEmbeddingProvider(dimensions=64)
+    store, _ = _book_index(provider)
+
+    with get_session() as session:
+        book = session.get(Book, store.ids[0])
+        book.cover_url = "https://covers.example/new.png"
+    assert _book_index(provider)[0].fingerprint == store.fingerprint
+
+    with get_session() as session:
+        book = session.get(Book, store.ids[0])
+        book.description = "A lighthouse keeper befriends a storm."
+    refreshed, _ = _book_index(provider)
+    assert refreshed.fingerprint != store.fingerprint
+    assert np.allclose(refreshed.vectors[0], provider.embed([f"{book.title} {book.author} {book.description}"])[0])
+
+
+def test_candidate_store_covers_the_imported_catalog() -> None:
+    provider = HashingEmbeddingProvider(dimensions=64)
+    before, _ = _candidate_index(provider)
+    record = {
+        "id": "embedded-import",
+        "title": "Lanterns Over the Tidewater",
+        "author": "Ines Calder",
+        "description": "A smuggler and a lighthouse keeper chart a storm-wracked coast.",
+        "tropes": ["forced proximity"],
+    }
+    import_records([(1, record)])
+
+    after, _ = _candidate_index(provider)
+    assert after.fingerprint != before.fingerprint
+    assert len(after.ids) == len(before.ids) + 1
+    body = TestClient(app).get("/api/discovery/embedding-feed?limit=25").json()
+    assert "embedded-import" in [item["id"] for item in body["items"]]
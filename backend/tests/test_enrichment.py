@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from sqlmodel import select
+
+from app.database import get_session
+from app.models import Book
+from app.services.enrichment_service import enrich_books
+from app.services.http_cache import CachedHttpClient, ResponseCache, TokenBucket
+
+
+def _provider_transport(calls: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        if request.url.host == "www.googleapis.com":
+            body = {"items": [{"id": "g1", "volumeInfo": {"description": "From Google", "categories": ["Fantasy"]}}]}
+        else:
+            body = {"docs": [{"key": "/works/OL1W", "cover_i": 42, "subject": ["Dragons"]}]}
+        return httpx.Response(200, json=body, headers={"ETag": '"v1"'})
+
+    return httpx.MockTransport(handler)
+
+
+def test_enrichment_fills_metadata_and_reuses_cache() -> None:
+    with get_session() as session:
+        book = Book(title="Uncharted Enrichment", author="Test Author")
+        session.add(book)
+        session.commit()
+        session.refresh(book)
+        book_count = len(session.exec(select(Book.id)).all())
+
+    calls: list = []
+    stats = asyncio.run(enrich_books(transport=_provider_transport(calls)))
+    assert stats["network_calls"] == len(calls) == book_count * 2
+    with get_session() as session:
+        enriched = session.get(Book, book.id)
+    assert enriched.description == "From Google"
+    assert enriched.cover_url == "https://covers.openlibrary.org/b/id/42-L.jpg"
+    assert enriched.book_metadata["open_library"]["subjects"] == ["Dragons"]
+
+    calls.clear()
+    stats = asyncio.run(enrich_books(transport=_provider_transport(calls)))
+    assert stats == {"updated": 0, "network_calls": 0}
+
+
+def test_cached_client_revalidates_and_retries(tmp_path) -> None:
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(dict(request.headers))
+        if len(attempts) == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        if request.headers.get("If-None-Match") == '"abc"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"value": 1}, headers={"ETag": '"abc"'})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            http = CachedHttpClient(client, ResponseCache(tmp_path), TokenBucket(1000, 10), ttl=0, backoff=0)
+            first = await http.get_json("key", "https://example.test/item")
+            second = await http.get_json("key", "https://example.test/item")
+            return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == {"value": 1}
+    assert len(attempts) == 3
+    assert attempts[-1]["if-none-match"] == '"abc"'
+
+
+def test_cached_client_gives_up_on_long_retry_after(tmp_path) -> None:
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url)
+        return httpx.Response(429, headers={"Retry-After": "3600"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            http = CachedHttpClient(
+                client, ResponseCache(tmp_path), TokenBucket(1000, 10), ttl=0, backoff=0, max_retry_after=5
+            )
+            await http.get_json("key", "https://example.test/item")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(scenario())
+    assert len(attempts) == 1
+
+
+def test_token_bucket_limits_rate() -> None:
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=2)
+        started = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
@@ -0,0 +1,69 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.cache import feed_cache
+from app.main import app
+from app.services.catalog_service import CandidateCatalog
+
+
+def test_feed_endpoints_answer_conditional_gets() -> None:
+    client = TestClient(app)
+    client.post("/api/tropes/extract")
+    for path in ("/api/recommendations?limit=5", "/api/discovery/trope-feed?limit=5"):
+        first = client.get(path)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        hits = feed_cache.hits
+        repeat = client.get(path)
+        assert repeat.json() == first.json()
+        assert repeat.headers["etag"] == etag
+        assert feed_cache.hits == hits + 1
+
+        not_modified = client.get(path, headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+
+
+def test_writes_change_the_feed_etag() -> None:
+    client = TestClient(app)
+    path = "/api/discovery/trope-feed?limit=5"
+    etag = client.get(path).headers["etag"]
+    book_id = client.get("/api/recommendations?limit=1").json()["items"][0]["book"]["id"]
+    client.post("/api/feedback", json={"book_id": book_id, "reaction": "liked"})
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_trope_feed_pages_and_streams() -> None:
+    client = TestClient(app)
+    full = client.get("/api/discovery/trope-feed?limit=25").json()
+    assert full["next_cursor"] is None
+    first = client.get("/api/discovery/trope-feed?limit=2").json()
+    rest = client.get("/api/discovery/trope-feed", params={"limit": 25, "cursor": first["next_cursor"]}).json()
+    assert first["items"] + rest["items"] == full["items"]
+
+    streamed = client.get("/api/discovery/trope-feed?limit=2", headers={"Accept": "application/x-ndjson"})
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert lines == first["items"] + [{"next_cursor": first["next_cursor"]}]
+    assert client.get("/api/discovery/trope-feed?cursor=e30").status_code == 400
+
+
+def test_trope_feed_stream_reads_rows_in_batches(monkeypatch) -> None:
+    client = TestClient(app)
+    full = client.get("/api/discovery/trope-feed?limit=12").json()["items"]
+    loads = []
+    original = CandidateCatalog.load_async
+
+    async def recording(self, rows):
+        loads.append(len(rows))
+        return await original(self, rows)
+
+    monkeypatch.setattr(CandidateCatalog, "load_async", recording)
+    monkeypatch.setattr("app.services.trope_service.STREAM_BATCH", 2)
+    streamed = client.get("/api/discovery/trope-feed?limit=12", headers={"Accept": "application/x-ndjson"})
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert lines[:-1] == full
+    assert sum(loads) == len(full) and max(loads) <= 2 and len(loads) > 1
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+from sqlmodel import func, select
+
+from app.database import get_read_session, get_session
+from app.main import app
+from app.models import Book, Feedback
+from app.services.sync_service import _seed_books
+from app.services.trope_profile import verify_trope_profile
+from app.services.trope_service import extract_tropes
+
+
+def test_batch_inserts_once_and_dedupes_replays() -> None:
+    with get_session() as session:
+        _seed_books(session)
+    extract_tropes(force=False)
+    with get_read_session() as session:
+        book_ids = list(session.exec(select(Book.id).limit(2)))
+        before = session.exec(select(func.count()).select_from(Feedback)).one()
+    swiped_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+    items = [
+        {"book_id": book_ids[0], "reaction": "liked", "idempotency_key": "swipe-1", "created_at": swiped_at.isoformat()},
+        {"book_id": book_ids[1], "reaction": "skipped", "idempotency_key": "swipe-2"},
+        {"book_id": book_ids[1], "reaction": "skipped", "idempotency_key": "swipe-2"},
+    ]
+    client = TestClient(app)
+
+    first = client.post("/api/feedback/batch", json={"items": items})
+    assert first.status_code == 200
+    body = first.json()
+    assert (body["accepted"], body["duplicates"]) == (2, 1)
+    assert [item["book_id"] for item in body["items"]] == book_ids
+    assert body["items"][0]["created_at"].startswith(swiped_at.replace(tzinfo=None).isoformat()[:19])
+
+    retry = client.post("/api/feedback/batch", json={"items": items[:2]}).json()
+    assert (retry["accepted"], retry["duplicates"]) == (0, 2)
+    assert [item["id"] for item in retry["items"]] == [item["id"] for item in body["items"]]
+
+    with get_read_session() as session:
+        assert session.exec(select(func.count()).select_from(Feedback)).one() == before + 2
+    assert verify_trope_profile() == []
+
+
+def test_batch_rejects_missing_idempotency_key() -> None:
+    client = TestClient(app)
+    response = client.post("/api/feedback/batch", json={"items": [{"book_id": 1, "reaction": "liked"}]})
+    assert response.status_code == 422
@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.database import get_session
+from app.main import app
+from app.models import SyncJob
+from app.services.job_queue import JobWorker, claim_job, complete_job, enqueue_job, job_handlers
+
+
+@pytest.fixture
+def queue_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "job_retry_backoff", 0.0)
+    monkeypatch.setattr(settings, "job_max_attempts", 2)
+    limits = {"test_flaky": 1, "test_slow": 1, "test_race": 1}
+    monkeypatch.setattr(settings, "job_concurrency", {**settings.job_concurrency, **limits})
+    return settings
+
+
+def _job(job_id: int) -> SyncJob:
+    with get_session() as session:
+        return session.get(SyncJob, job_id)
+
+
+def test_duplicate_requests_coalesce_onto_one_queued_job() -> None:
+    client = TestClient(app)
+    first = client.post("/api/tropes/refresh").json()
+    second = client.post("/api/tropes/refresh").json()
+    assert second["job_id"] == first["job_id"]
+    assert second["scheduled"] is False
+    assert client.post("/api/tropes/extract").json()["job_id"] != first["job_id"]
+
+    JobWorker(job_types=["trope_extract"]).run_pending()
+    job = _job(first["job_id"])
+    assert job.status == "completed"
+    assert job.message.startswith("Extracted")
+    assert client.post("/api/tropes/refresh").json()["job_id"] != first["job_id"]
+
+
+def test_failed_attempts_retry_then_give_up(monkeypatch, queue_settings) -> None:
+    calls = []
+
+    def flaky(job: SyncJob) -> str:
+        calls.append(job.attempts)
+        if job.payload["fail"] > len(calls) - 1:
+            raise RuntimeError("upstream unavailable")
+        return "recovered"
+
+    monkeypatch.setitem(job_handlers(), "test_flaky", flaky)
+    recovered, _ = enqueue_job("test_flaky", {"fail": 1})
+    JobWorker(job_types=["test_flaky"]).run_pending()
+    job = _job(recovered.id)
+    assert (job.status, job.attempts, job.message, job.last_error) == ("completed", 2, "recovered", None)
+
+    calls.clear()
+    doomed, _ = enqueue_job("test_flaky", {"fail": 5})
+    JobWorker(job_types=["test_flaky"]).run_pending()
+    job = _job(doomed.id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert job.last_error == "upstream unavailable"
+
+
+def test_expired_leases_are_reclaimed_and_limits_hold(monkeypatch, queue_settings) -> None:
+    monkeypatch.setitem(job_handlers(), "test_slow", lambda job: None)
+    first, _ = enqueue_job("test_slow", {"n": 1})
+    second, _ = enqueue_job("test_slow", {"n": 2})
+
+    claimed = claim_job("worker-a", ["test_slow"])
+    assert claimed.id == first.id and claimed.lease_owner == "worker-a"
+    assert claim_job("worker-b", ["test_slow"]) is None  # concurrency limit of 1
+
+    with get_session() as session:
+        job = session.get(SyncJob, first.id)
+        job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.add(job)
+    reclaimed = claim_job("worker-b", ["test_slow"])
+    assert (reclaimed.id, reclaimed.lease_owner, reclaimed.attempts) == (first.id, "worker-b", 2)
+    assert complete_job(first.id, "worker-a") is False
+    assert complete_job(first.id, "worker-b") is True
+    assert claim_job("worker-b", ["test_slow"]).id == second.id
+
+
+def test_concurrent_claims_respect_the_type_limit(monkeypatch, queue_settings) -> None:
+    monkeypatch.setitem(job_handlers(), "test_race", lambda job: None)
+    for n in range(4):
+        enqueue_job("test_race", {"race": n})
+    barrier = threading.Barrier(4)
+    claimed = []
+
+    def claim(worker_id: str) -> None:
+        barrier.wait()
+        claimed.append(claim_job(worker_id, ["test_race"]))
+
+    threads = [threading.Thread(target=claim, args=(f"racer-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    winners = [job for job in claimed if job is not None]
+    assert len(winners) == 1
+
+
+def test_enrichment_and_embedding_rebuilds_are_queued_jobs() -> None:
+    client = TestClient(app)
+    first = client.post("/api/enrichment/run").json()
+    second = client.post("/api/enrichment/run").json()
+    assert second["job_id"] == first["job_id"] and second["scheduled"] is False
+    rebuild = client.post("/api/embeddings/rebuild").json()
+    assert rebuild["scheduled"] is True
+
+    JobWorker(job_types=["enrichment", "embedding_rebuild"]).run_pending()
+    assert _job(first["job_id"]).status == "completed"
+    job = _job(rebuild["job_id"])
+    assert job.status == "completed" and job.message.startswith("Embedded")
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import func, select
+
+from app.database import get_read_session, get_session
+from app.main import app
+from app.models import LogEntry
+from app.services.log_archive import archive_logs, get_log_archive
+from app.services.log_service import fetch_logs
+
+
+def _live_count(source: str) -> int:
+    with get_read_session() as session:
+        return session.exec(select(func.count()).select_from(LogEntry).where(LogEntry.source == source)).one()
+
+
+def test_archive_moves_old_rows_and_reads_through() -> None:
+    base = datetime(2019, 3, 1, 22)
+    with get_session() as session:
+        session.add_all(
+            LogEntry(
+                source="archive-test",
+                level="ERROR" if n % 3 == 0 else "INFO",
+                message=f"entry-{n}",
+                created_at=base + timedelta(hours=n),
+            )
+            for n in range(6)
+        )
+    before = [item.message for item in fetch_logs(source="archive-test", limit=50).items]
+
+    totals = archive_logs(timedelta(days=1), now=base + timedelta(hours=4, days=1))
+    assert totals["archived"] == totals["deleted"] >= 4
+    assert _live_count("archive-test") == 2
+    segments = [segment for segment in get_log_archive().segments() if segment.sources.get("archive-test")]
+    assert len(segments) == 2  # entries span two UTC days
+    assert sum(segment.levels.get("ERROR", 0) for segment in segments) == 2
+
+    client = TestClient(app)
+    seen, cursor = [], None
+    while True:
+        params = {"source": "archive-test", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/logs", params=params).json()
+        seen += [item["message"] for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == before == [f"entry-{n}" for n in reversed(range(6))]
+
+    errors = client.get("/api/logs", params={"source": "archive-test", "level": "error"}).json()
+    assert [item["message"] for item in errors["items"]] == ["entry-3", "entry-0"]
+    window = client.get(
+        "/api/logs",
+        params={"source": "archive-test", "since": base.isoformat(), "until": (base + timedelta(hours=2)).isoformat()},
+    ).json()
+    assert [item["message"] for item in window["items"]] == ["entry-1", "entry-0"]
+
+    # A second run over the same range finds nothing left to move.
+    assert archive_logs(timedelta(days=1), now=base + timedelta(hours=4, days=1))["archived"] == 0
+
+
+def test_rerun_after_interrupted_delete_does_not_duplicate() -> None:
+    day = datetime(2018, 6, 1)
+    with get_session() as session:
+        session.add_all(
+            LogEntry(source="archive-rerun", message=f"entry-{n}", created_at=day + timedelta(minutes=n)) for n in range(3)
+        )
+    # Segment written, but the process died before deleting the rows.
+    written, _ = get_log_archive().write_day(day, day + timedelta(days=1), batch_size=2)
+    assert written == 3
+    archive_logs(timedelta(days=1), now=day + timedelta(days=3))
+    assert _live_count("archive-rerun") == 0
+    items = fetch_logs(source="archive-rerun").items
+    assert [item.message for item in items] == ["entry-2", "entry-1", "entry-0"]
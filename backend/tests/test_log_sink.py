@@ -0,0 +1,85 @@
+import threading
+import time
+
+from app.models import LogEntry
+from app.services.log_service import LogSink, fetch_logs, flush_logs, record_log
+
+
+class _GatedWriter:
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.batches = []
+
+    def __call__(self, entries) -> None:
+        self.gate.wait(5)
+        self.batches.append([entry.message for entry in entries])
+
+
+def _entry(message: str) -> LogEntry:
+    return LogEntry(message=message)
+
+
+def test_sink_batches_and_flushes() -> None:
+    writer = _GatedWriter()
+    writer.gate.set()
+    sink = LogSink(capacity=100, batch_size=3, flush_interval=10, writer=writer)
+    for n in range(7):
+        sink.submit(_entry(str(n)))
+    assert sink.flush(timeout=5)
+    assert [message for batch in writer.batches for message in batch] == [str(n) for n in range(7)]
+    assert max(len(batch) for batch in writer.batches) <= 3
+    sink.close()
+
+
+def test_sink_drop_oldest_and_sample_policies() -> None:
+    for policy, expected_dropped in (("drop_oldest", 4), ("sample", 4)):
+        writer = _GatedWriter()
+        sink = LogSink(capacity=2, batch_size=1, flush_interval=0, overflow=policy, sample_every=2, writer=writer)
+        sink.submit(_entry("first"))
+        # Wait for the writer to pick up "first" so the queue holds only what follows.
+        while sink._pending:
+            time.sleep(0.001)
+        for n in range(6):
+            sink.submit(_entry(f"later-{n}"))
+        assert sink.dropped == expected_dropped
+        writer.gate.set()
+        assert sink.flush(timeout=5)
+        written = [message for batch in writer.batches for message in batch]
+        assert written[0] == "first"
+        assert len(written) == 3
+        if policy == "drop_oldest":
+            assert written[1:] == ["later-4", "later-5"]
+        sink.close()
+
+
+def test_sink_rejects_overflow_when_every_entry_is_waited_on() -> None:
+    writer = _GatedWriter()
+    sink = LogSink(capacity=2, batch_size=1, flush_interval=0, overflow="drop_oldest", writer=writer)
+    sink.submit(_entry("first"))
+    while sink._pending:
+        time.sleep(0.001)
+    waiters = [threading.Thread(target=sink.submit, args=(_entry(f"urgent-{n}"), True)) for n in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    while sink.depth < 2:
+        time.sleep(0.001)
+
+    sink.submit(_entry("overflow"))
+    assert sink.dropped == 1 and sink.depth == 2
+
+    writer.gate.set()
+    for waiter in waiters:
+        waiter.join(5)
+    assert sink.flush(timeout=5)
+    written = [message for batch in writer.batches for message in batch]
+    assert written[0] == "first" and sorted(written[1:]) == ["urgent-0", "urgent-1"]
+    sink.close()
+
+
+def test_record_log_roundtrip() -> None:
+    entry = record_log("info", "sink roundtrip", source="tests", wait=True)
+    assert entry.id is not None
+    record_log("INFO", "sink background", source="tests")
+    assert flush_logs(timeout=5)
+    messages = [item.message for item in fetch_logs(source="tests").items]
+    assert {"sink roundtrip", "sink background"} <= set(messages)
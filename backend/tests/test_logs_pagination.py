@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.database import get_session
+from app.main import app
+from app.models import LogEntry
+
+
+def test_logs_keyset_pagination_and_time_range() -> None:
+    base = datetime(2020, 1, 1)
+    with get_session() as session:
+        # Two rows share each timestamp to exercise the id tie-breaker.
+        session.add_all(
+            LogEntry(source="paging-test", message=f"entry-{n}", created_at=base + timedelta(minutes=n // 2))
+            for n in range(9)
+        )
+    client = TestClient(app)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"source": "paging-test", "limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/logs", params=params).json()
+        seen.extend(item["message"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"entry-{n}" for n in reversed(range(9))]
+
+    window = client.get(
+        "/api/logs",
+        params={"source": "paging-test", "since": (base + timedelta(minutes=1)).isoformat(), "until": (base + timedelta(minutes=3)).isoformat()},
+    ).json()
+    assert [item["message"] for item in window["items"]] == ["entry-5", "entry-4", "entry-3", "entry-2"]
+
+    assert client.get("/api/logs", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+from app.services.job_queue import JobWorker, enqueue_job
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = metrics.Histogram("demo_seconds", "Demo.", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, route='/a"b')
+    assert histogram.render() == [
+        'demo_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'demo_seconds_bucket{route="/a\\"b",le="1"} 2',
+        'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'demo_seconds_sum{route="/a\\"b"} 5.55',
+        'demo_seconds_count{route="/a\\"b"} 3',
+    ]
+
+
+def test_metrics_endpoint_reports_routes_sql_and_jobs() -> None:
+    client = TestClient(app)
+    requests_before = metrics.HTTP_REQUESTS.value(method="GET", route="/api/feedback", status="200")
+    queries_before = metrics.HTTP_DB_QUERIES.count(method="GET", route="/api/feedback")
+    client.get("/api/feedback")
+    assert metrics.HTTP_REQUESTS.value(method="GET", route="/api/feedback", status="200") == requests_before + 1
+    assert metrics.HTTP_DB_QUERIES.count(method="GET", route="/api/feedback") == queries_before + 1
+
+    enqueue_job("trope_extract", {"force": False})
+    JobWorker(job_types=["trope_extract"]).run_pending()
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert '# TYPE http_request_duration_seconds histogram' in body
+    assert 'http_request_db_queries_count{method="GET",route="/api/feedback"}' in body
+    assert 'job_duration_seconds_count{job_type="trope_extract",status="completed"}' in body
+    assert "# TYPE job_queue_depth gauge" in body
+    assert "log_buffer_depth" in body
@@ -0,0 +1,81 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.database import get_session
+from app.main import app
+from app.models import Recommendation, RecommendationState, SyncJob
+from app.services.job_queue import JobWorker
+from app.services.recommendation_service import (
+    REFRESH_JOB,
+    get_recommendations,
+    precompute_recommendations,
+    recommendations_are_stale,
+)
+
+
+def test_recommendations_are_materialized_and_deterministic() -> None:
+    client = TestClient(app)
+    precompute_recommendations()
+    first = client.get("/api/recommendations?limit=25").json()["items"]
+    second = client.get("/api/recommendations?limit=25").json()["items"]
+    assert first == second
+    scores = [item["score"] for item in first]
+    assert scores == sorted(scores, reverse=True)
+    with get_session() as session:
+        generation = session.get(RecommendationState, 1).generation
+        generations = set(session.exec(select(Recommendation.generation)))
+    # The previous generation is kept for cursors issued before the swap.
+    assert generations <= {generation - 1, generation}
+
+
+def test_feedback_marks_recommendations_stale_until_refreshed() -> None:
+    client = TestClient(app)
+    items = client.get("/api/recommendations?limit=25").json()["items"]
+    last = items[-1]["book"]["id"]
+    response = client.post("/api/feedback", json={"book_id": last, "reaction": "liked"})
+    assert response.status_code == 200
+    assert recommendations_are_stale()
+    # Stale reads serve the previous generation and queue a single refresh job.
+    client.get("/api/recommendations?limit=25")
+    client.get("/api/recommendations?limit=25")
+    with get_session() as session:
+        queued = session.exec(select(SyncJob).where(SyncJob.job_type == REFRESH_JOB, SyncJob.status == "queued")).all()
+    assert len(queued) == 1
+    assert recommendations_are_stale()
+    JobWorker(job_types=[REFRESH_JOB]).run_pending()
+    assert not recommendations_are_stale()
+
+
+def test_cursor_pages_walk_one_generation() -> None:
+    client = TestClient(app)
+    precompute_recommendations()
+    full = get_recommendations(1000)
+    seen, cursor = [], None
+    while True:
+        url = "/api/recommendations?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json()
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        if len(seen) == 2:
+            precompute_recommendations()  # a refresh mid-walk must not reshuffle the pages
+    assert [item["book"]["id"] for item in seen] == [item.book.id for item in full]
+
+    stale_cursor = client.get("/api/recommendations?limit=1").json()["next_cursor"]
+    precompute_recommendations()
+    precompute_recommendations()
+    assert client.get("/api/recommendations", params={"cursor": stale_cursor}).status_code == 400
+    assert client.get("/api/recommendations?cursor=not-a-cursor").status_code == 400
+
+
+def test_recommendations_stream_as_ndjson() -> None:
+    client = TestClient(app)
+    expected = client.get("/api/recommendations?limit=3").json()
+    response = client.get("/api/recommendations?limit=3", headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[:-1] == expected["items"]
+    assert lines[-1] == {"next_cursor": expected["next_cursor"]}
@@ -0,0 +1,39 @@
+import asyncio
+
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import get_session
+from app.models import AppSettings
+from app.schemas import SettingsUpdate
+from app.services import settings_service
+from app.services.settings_service import get_app_settings, get_app_settings_async, update_settings
+
+
+def test_settings_cache_is_write_through_and_notices_other_writers(monkeypatch) -> None:
+    update_settings(SettingsUpdate(llm_model="model-a"))
+    assert get_app_settings().llm_model == "model-a"
+
+    # Simulate another worker writing the row directly.
+    with get_session() as session:
+        row = session.exec(select(AppSettings)).first()
+        row.llm_model = "model-b"
+        session.add(row)
+
+    monkeypatch.setattr(get_settings(), "settings_cache_check_interval", 3600.0)
+    assert get_app_settings().llm_model == "model-a"
+    monkeypatch.setattr(get_settings(), "settings_cache_check_interval", 0.0)
+    assert get_app_settings().llm_model == "model-b"
+    update_settings(SettingsUpdate(llm_model="gpt-4o-mini"))
+
+
+def test_async_read_does_not_wait_for_the_cache_lock(monkeypatch) -> None:
+    update_settings(SettingsUpdate(llm_model="model-c"))
+    monkeypatch.setattr(get_settings(), "settings_cache_check_interval", 0.0)
+    settings_service._cache.invalidate()
+
+    # The sync path holds the lock across DB round trips; the event loop must not.
+    with settings_service._cache.lock:
+        settings = asyncio.run(asyncio.wait_for(get_app_settings_async(), timeout=5))
+    assert settings.llm_model == "model-c"
+    assert get_app_settings() is settings
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+
+from sqlmodel import select, update
+
+from app.database import create_db_and_tables, get_session
+from app.lazy import lazy_import
+from app.metrics import STARTUP_PHASE_SECONDS
+from app.models import SchemaState
+from app.startup import run_startup
+
+
+def test_unchanged_schema_skips_apply() -> None:
+    create_db_and_tables()
+    assert create_db_and_tables() is False
+    assert create_db_and_tables(force=True) is True
+
+    with get_session() as session:
+        session.exec(update(SchemaState).values(fingerprint="outdated"))
+    assert create_db_and_tables() is True
+    with get_session() as session:
+        assert session.exec(select(SchemaState.fingerprint)).one() != "outdated"
+
+
+def test_startup_report_times_each_phase() -> None:
+    report = run_startup(imports_seconds=0.25)
+
+    assert [name for name, _ in report.phases] == ["imports", "engine", "schema", "settings"]
+    assert report.schema_applied is False
+    assert report.total_seconds >= 0.25
+    assert report.as_dict()["phases_ms"]["imports"] == 250.0
+    assert STARTUP_PHASE_SECONDS.value(phase="imports") == 0.25
+    assert report.over_budget(0.1) and not report.over_budget(0)
+
+
+def test_heavy_dependencies_load_on_first_use() -> None:
+    code = "import sys, app.main; print('numpy' in sys.modules, 'httpx' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["False", "False"]
+
+    colorsys = lazy_import("colorsys")
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
@@ -0,0 +1,160 @@
+import json
+import uuid
+
+import httpx
+from sqlmodel import select
+
+from app.config import get_settings
+from app.database import get_session
+from app.models import Book, BookTrope
+from app.services.sync_service import _seed_books
+from app.services import trope_extractor
+from app.services.trope_extractor import LocalTropeProvider, OpenAITropeProvider, TropeBook, resolve_tropes
+from app.services.trope_service import extract_tropes
+
+
+class CountingProvider(LocalTropeProvider):
+    def __init__(self) -> None:
+        self.batches = []
+
+    async def extract_batch(self, http, books):
+        self.batches.append([book.id for book in books])
+        return await super().extract_batch(http, books)
+
+
+def _pairs() -> set:
+    with get_session() as session:
+        return set(session.exec(select(BookTrope.book_id, BookTrope.trope)))
+
+
+def _books() -> list:
+    with get_session() as session:
+        return [TropeBook(*row) for row in session.exec(select(Book.id, Book.title, Book.author, Book.description))]
+
+
+def test_extract_tropes_is_idempotent_and_force_swaps_in_place() -> None:
+    with get_session() as session:
+        _seed_books(session)
+    extract_tropes(force=False, batch_size=2)
+    before = _pairs()
+    expected = sum(len(LocalTropeProvider().tropes_for(book)) for book in _books())
+    assert len(before) >= expected
+
+    assert extract_tropes(force=False, batch_size=2) == 0
+    assert _pairs() == before
+
+    assert extract_tropes(force=True, batch_size=2) == expected
+    assert len(_pairs()) == expected
+
+
+def test_force_refresh_only_reextracts_changed_books(monkeypatch) -> None:
+    with get_session() as session:
+        _seed_books(session)
+    extract_tropes(force=True)
+    provider = CountingProvider()
+    monkeypatch.setattr("app.services.trope_service.get_trope_provider", lambda: provider)
+
+    extract_tropes(force=True)
+    assert provider.batches == []
+
+    with get_session() as session:
+        book = session.exec(select(Book)).first()
+        book.description = f"A stranded rival crew seeks a lost throne ({uuid.uuid4()})."
+        session.add(book)
+        book_id = book.id
+    extract_tropes(force=True)
+    assert provider.batches == [[book_id]]
+    with get_session() as session:
+        stored = set(session.exec(select(BookTrope.trope).where(BookTrope.book_id == book_id)))
+        changed = session.get(Book, book_id)
+    assert stored == {trope for trope, _ in LocalTropeProvider().tropes_for(TropeBook(book_id, changed.title, changed.author, changed.description))}
+
+
+def test_resolve_tropes_batches_and_caches(monkeypatch) -> None:
+    monkeypatch.setattr(get_settings(), "trope_llm_batch_size", 2)
+    run = uuid.uuid4().hex
+    books = [TropeBook(n, f"Book {n}", "Author", f"{run} description {n}") for n in range(5)]
+    provider = CountingProvider()
+
+    first, stats = resolve_tropes(books, provider)
+    assert sorted(len(batch) for batch in provider.batches) == [1, 2, 2]
+    assert stats == {"cached": 0, "extracted": 5, "provider_calls": 3, "failed": 0}
+
+    second, stats = resolve_tropes(books, provider)
+    assert len(provider.batches) == 3
+    assert stats == {"cached": 5, "extracted": 0, "provider_calls": 0, "failed": 0}
+    assert second == first
+
+
+def test_openai_provider_sends_batches_and_skips_missing_books() -> None:
+    run = uuid.uuid4().hex
+    books = [TropeBook(n, f"Book {n}", "Author", f"{run} description {n}") for n in range(3)]
+    prompts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        sent = json.loads(body["messages"][1]["content"])
+        prompts.append([book["id"] for book in sent])
+        # The model drops the last book; it must stay uncached so it is retried next time.
+        content = {
+            "books": [
+                {"id": book["id"], "tropes": [{"trope": "Slow Burn", "confidence": 0.8}, {"trope": "slow burn"}]}
+                for book in sent[:-1]
+            ]
+        }
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(content)}}]})
+
+    provider = OpenAITropeProvider(model="gpt-4o-mini", api_key="test")
+    results, stats = resolve_tropes(books, provider, transport=httpx.MockTransport(handler))
+    assert prompts == [[0, 1, 2]]
+    assert results == {0: [("slow burn", 0.8)], 1: [("slow burn", 0.8)]}
+    assert stats["provider_calls"] == 1
+
+    results, stats = resolve_tropes(books, provider, transport=httpx.MockTransport(handler))
+    assert prompts[-1] == [2]
+    assert stats["cached"] == 2
+
+
+def test_failed_batches_keep_completed_work(monkeypatch) -> None:
+    monkeypatch.setattr(get_settings(), "trope_llm_batch_size", 1)
+    monkeypatch.setattr(get_settings(), "trope_llm_max_retries", 2)
+    monkeypatch.setattr(trope_extractor, "RETRY_BACKOFF", 0.0)
+    run = uuid.uuid4().hex
+    books = [TropeBook(n, f"Book {n}", "Author", f"{run} description {n}") for n in range(3)]
+    attempts = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        book_id = json.loads(json.loads(request.content)["messages"][1]["content"])[0]["id"]
+        attempts[book_id] = attempts.get(book_id, 0) + 1
+        if book_id == 1 and attempts[book_id] == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        if book_id == 2:
+            return httpx.Response(503)
+        content = {"books": [{"id": book_id, "tropes": [{"trope": "found family", "confidence": 0.9}]}]}
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(content)}}]})
+
+    provider = OpenAITropeProvider(model="gpt-4o-mini", api_key="test")
+    results, stats = resolve_tropes(books, provider, transport=httpx.MockTransport(handler))
+    assert sorted(results) == [0, 1]
+    assert attempts == {0: 1, 1: 2, 2: 3}
+    assert stats == {"cached": 0, "extracted": 2, "provider_calls": 6, "failed": 1}
+
+    # The completed batches were cached even though another one failed.
+    _, stats = resolve_tropes(books, provider, transport=httpx.MockTransport(handler))
+    assert stats["cached"] == 2 and stats["failed"] == 1
+
+
+def test_long_retry_after_fails_the_batch(monkeypatch) -> None:
+    monkeypatch.setattr(get_settings(), "http_max_retry_after", 5.0)
+    books = [TropeBook(1, "Book", "Author", f"{uuid.uuid4().hex} description")]
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url)
+        return httpx.Response(429, headers={"Retry-After": "3600"})
+
+    provider = OpenAITropeProvider(model="gpt-4o-mini", api_key="test")
+    results, stats = resolve_tropes(books, provider, transport=httpx.MockTransport(handler))
+    assert results == {}
+    assert len(attempts) == 1
+    assert stats["failed"] == 1
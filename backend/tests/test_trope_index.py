@@ -0,0 +1,75 @@
+import random
+from collections import Counter
+
+from app.services.trope_index import TropeScoringIndex
+from app.services.trope_extractor import TROPE_LIBRARY
+
+
+def _reference_ranking(candidates, profile, limit, feedback=None):
+    feedback = feedback or {}
+    scored = []
+    for index, tropes in enumerate(candidates):
+        overlap = [trope for trope in tropes if trope in profile]
+        if not overlap:
+            continue
+        score = 0.0
+        for trope in overlap:
+            score += 1.0 / (profile[trope] + 1.0) + feedback.get(trope, 0.0)
+        normalized = max(0.0, min(0.99, 0.55 + score / (len(overlap) * 2)))
+        scored.append((index, round(normalized * 100, 2), overlap))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+
+def test_index_matches_reference_ranking() -> None:
+    rng = random.Random(7)
+    vocabulary = TROPE_LIBRARY + [f"trope-{n}" for n in range(40)]
+    candidates = [rng.sample(vocabulary, rng.randint(1, 5)) for _ in range(2000)]
+    index = TropeScoringIndex(candidates)
+    for _ in range(20):
+        profile = Counter({trope: rng.randint(1, 6) for trope in rng.sample(vocabulary, rng.randint(1, 12))})
+        for limit in (1, 10, 25, 5000):
+            expected = _reference_ranking(candidates, profile, limit)
+            actual = [(match.index, match.score, match.matched_tropes) for match in index.top_k(profile, limit)]
+            assert actual == expected
+        feedback = {trope: rng.uniform(-1.5, 1.5) for trope in rng.sample(sorted(profile), len(profile) // 2)}
+        expected = _reference_ranking(candidates, profile, 25, feedback)
+        actual = [(match.index, match.score, match.matched_tropes) for match in index.top_k(profile, 25, None, feedback)]
+        assert actual == expected
+
+
+def test_feedback_moves_matching_candidates() -> None:
+    index = TropeScoringIndex([["found family", "heist"], ["slow burn", "heist"]])
+    profile = Counter({"slow burn": 2, "found family": 2, "heist": 2})
+
+    def ranking(feedback):
+        return [(match.index, match.score) for match in index.top_k(profile, 5, feedback=feedback)]
+
+    assert ranking(None) == [(0, 71.67), (1, 71.67)]
+    liked = ranking({"slow burn": 0.2})
+    assert liked[0][0] == 1 and liked[0][1] > 71.67
+    skipped = ranking({"slow burn": -0.2})
+    assert skipped[-1][0] == 1 and skipped[-1][1] < 71.67
+
+
+def test_index_ignores_unknown_tropes() -> None:
+    index = TropeScoringIndex([["slow burn"], ["found family"]])
+    assert index.top_k(Counter({"space opera": 3}), 5) == []
+    assert [match.index for match in index.top_k(Counter({"found family": 1}), 5)] == [1]
+
+
+def test_keyset_pages_concatenate_to_full_ranking() -> None:
+    rng = random.Random(11)
+    vocabulary = TROPE_LIBRARY + [f"trope-{n}" for n in range(10)]
+    candidates = [rng.sample(vocabulary, rng.randint(1, 4)) for _ in range(500)]
+    index = TropeScoringIndex(candidates)
+    profile = Counter({trope: rng.randint(1, 4) for trope in rng.sample(vocabulary, 8)})
+    full = index.top_k(profile, 5000)
+    paged, after = [], None
+    while True:
+        page = index.top_k(profile, 37, after)
+        if not page:
+            break
+        paged += page
+        after = (page[-1].score, page[-1].index)
+    assert paged == full
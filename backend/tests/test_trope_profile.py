@@ -0,0 +1,40 @@
+from sqlmodel import select
+
+from app.database import get_read_session, get_session
+from app.models import BookTrope, TropeProfile
+from app.schemas import FeedbackRequest
+from app.services.feedback_service import record_feedback
+from app.services.sync_service import _seed_books
+from app.services.trope_profile import main, rebuild_trope_profile, verify_trope_profile
+from app.services.trope_service import extract_tropes
+
+
+def test_incremental_profile_matches_full_rebuild() -> None:
+    with get_session() as session:
+        _seed_books(session)
+    extract_tropes(force=False)
+    rebuild_trope_profile()
+    assert verify_trope_profile() == []
+
+    with get_read_session() as session:
+        book_id, trope = session.exec(select(BookTrope.book_id, BookTrope.trope)).first()
+        before = session.get(TropeProfile, trope).book_count
+    # Feedback is per reader and leaves the library-wide counts alone.
+    record_feedback(FeedbackRequest(book_id=book_id, reaction="liked"))
+    with get_read_session() as session:
+        assert session.get(TropeProfile, trope).book_count == before
+
+    extract_tropes(force=True)
+    assert verify_trope_profile() == []
+    assert main(["verify"]) == 0
+
+
+def test_verify_reports_drift() -> None:
+    rebuild_trope_profile()
+    with get_session() as session:
+        row = session.exec(select(TropeProfile)).first()
+        row.book_count += 3
+        session.add(row)
+    assert len(verify_trope_profile()) == 1
+    assert main(["rebuild"]) == 0
+    assert verify_trope_profile() == []
@@ -0,0 +1,125 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.database import get_read_session, get_session
+from app.main import app
+from app.models import Book, BookTrope
+from app.services.catalog_service import import_records
+from app.services.sync_service import _seed_books
+from app.services.trope_service import extract_tropes
+from app.services.user_state import UserStateCache, get_user_state, get_user_state_cache
+
+
+def _library() -> list:
+    with get_session() as session:
+        _seed_books(session)
+    extract_tropes(force=False)
+    with get_read_session() as session:
+        return list(session.exec(select(Book.id).order_by(Book.id)))
+
+
+def test_feedback_and_feeds_are_per_reader() -> None:
+    book_ids = _library()
+    client = TestClient(app)
+    liked = book_ids[0]
+
+    response = client.post(
+        "/api/feedback", json={"book_id": liked, "reaction": "liked"}, headers={"X-User-Id": "reader-a"}
+    )
+    assert response.status_code == 200
+
+    mine = client.get("/api/feedback", headers={"X-User-Id": "reader-a"}).json()["items"]
+    theirs = client.get("/api/feedback", headers={"X-User-Id": "reader-b"}).json()["items"]
+    assert [item["book_id"] for item in mine] == [liked]
+    assert theirs == []
+
+    feed_a = client.get("/api/recommendations?limit=25", headers={"X-User-Id": "reader-a"}).json()
+    feed_b = client.get("/api/recommendations?limit=25", headers={"X-User-Id": "reader-b"}).json()
+    assert liked not in [item["book"]["id"] for item in feed_a["items"]]
+    assert liked in [item["book"]["id"] for item in feed_b["items"]]
+
+    streamed = client.get(
+        "/api/recommendations?limit=25",
+        headers={"X-User-Id": "reader-a", "Accept": "application/x-ndjson"},
+    )
+    cards = [json.loads(line) for line in streamed.text.splitlines()][:-1]
+    assert cards and liked not in [card["book"]["id"] for card in cards]
+
+
+def test_trope_weights_follow_the_readers_feedback() -> None:
+    book_ids = _library()
+    with get_read_session() as session:
+        tropes = set(session.exec(select(BookTrope.trope).where(BookTrope.book_id == book_ids[1])))
+    client = TestClient(app)
+    client.post("/api/feedback", json={"book_id": book_ids[1], "reaction": "disliked"}, headers={"X-User-Id": "critic"})
+
+    critic, _ = get_user_state("critic")
+    newcomer, _ = get_user_state("newcomer")
+    assert critic.has_seen(book_ids[1]) and not newcomer.has_seen(book_ids[1])
+    assert all(critic.feedback().get(trope, 0.0) < newcomer.feedback().get(trope, 0.0) for trope in tropes)
+
+    feed = client.get("/api/discovery/trope-feed", headers={"X-User-Id": "critic"})
+    assert feed.status_code == 200
+
+
+def test_reactions_move_matching_candidates_in_the_readers_feed() -> None:
+    book_ids = _library()
+    client = TestClient(app)
+    with get_read_session() as session:
+        tropes = sorted(set(session.exec(select(BookTrope.trope).where(BookTrope.book_id == book_ids[0]))))
+    catalog = [
+        {"id": f"probe-{n}", "title": f"Probe {n}", "author": "Probe", "tropes": [trope]}
+        for n, trope in enumerate(tropes)
+    ]
+    import_records(enumerate(catalog, start=1))
+
+    def scores(user_id: str) -> dict:
+        items = client.get("/api/discovery/trope-feed?limit=25", headers={"X-User-Id": user_id}).json()["items"]
+        return {item["id"]: item["score"] for item in items if item["id"].startswith("probe-")}
+
+    neutral = scores("neutral")
+    client.post("/api/feedback", json={"book_id": book_ids[0], "reaction": "liked"}, headers={"X-User-Id": "fan"})
+    client.post("/api/feedback", json={"book_id": book_ids[0], "reaction": "skipped"}, headers={"X-User-Id": "skeptic"})
+    liked, skipped = scores("fan"), scores("skeptic")
+    assert len(neutral) == len(tropes)
+    assert all(liked[key] > neutral[key] > skipped[key] for key in neutral)
+
+
+def test_state_is_cached_until_the_reader_writes() -> None:
+    book_ids = _library()
+    cache = get_user_state_cache()
+    first, _ = get_user_state("regular")
+    hits = cache.hits
+    again, _ = get_user_state("regular")
+    assert again is first and cache.hits == hits + 1
+
+    TestClient(app).post(
+        "/api/feedback", json={"book_id": book_ids[2], "reaction": "liked"}, headers={"X-User-Id": "regular"}
+    )
+    refreshed, _ = get_user_state("regular")
+    assert refreshed is not first and refreshed.has_seen(book_ids[2])
+
+
+def test_cache_evicts_least_recently_used_within_budget() -> None:
+    _library()
+    probe, _ = get_user_state("probe")
+    cache = UserStateCache(max_bytes=probe.nbytes * 2 + probe.nbytes // 2)
+    for user_id in ("one", "two"):
+        cache.get(user_id, (0, 0))
+    cache.get("one", (0, 0))
+    cache.get("three", (0, 0))
+
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.get("one", (0, 0)) is not None and cache.hits == 2
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.nbytes == sum(state.nbytes for state in cache._entries.values())
+
+    cache.invalidate()
+    assert (len(cache), cache.nbytes) == (0, 0)
+
+
+def test_rejects_malformed_reader_id() -> None:
+    response = TestClient(app).get("/api/feedback", headers={"X-User-Id": "../etc"})
+    assert response.status_code == 400
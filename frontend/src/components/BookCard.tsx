@@ -1,4 +1,4 @@
-import type { FC } from "react";
+import { useEffect, useState, type FC } from "react";
 
 type BookCardProps = {
   title: string;
@@ -25,10 +25,13 @@ const BookCard: FC<BookCardProps> = ({
   onSkip,
   disabled
 }) => {
+  const [coverFailed, setCoverFailed] = useState(false);
+  useEffect(() => setCoverFailed(false), [coverUrl]);
+
   return (
     <article className="book-card">
-      {coverUrl ? (
-        <img src={coverUrl} alt={`Cover of ${title}`} loading="lazy" />
+      {coverUrl && !coverFailed ? (
+        <img src={coverUrl} alt={`Cover of ${title}`} loading="lazy" onError={() => setCoverFailed(true)} />
       ) : (
         <div style={{ height: "320px", background: "linear-gradient(135deg,#6366f1,#ec4899)" }} />
       )}
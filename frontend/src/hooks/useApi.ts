@@ -1,13 +1,39 @@
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || window.location.origin;
 
+const READER_STORAGE_KEY = "bookdiscover.reader";
+
 type RequestOptions = RequestInit & { parseJson?: boolean };
 
+// Feedback and feeds are kept per reader; an empty value means the default reader.
+export function getReader(): string {
+  return window.localStorage.getItem(READER_STORAGE_KEY) || "";
+}
+
+export function setReader(reader: string): void {
+  if (reader) {
+    window.localStorage.setItem(READER_STORAGE_KEY, reader);
+  } else {
+    window.localStorage.removeItem(READER_STORAGE_KEY);
+  }
+}
+
+// Covers go through the backend proxy, which serves cached, resized copies.
+export function coverSrc(path: string, size: "thumb" | "card" = "card"): string {
+  return `${API_BASE_URL}/api/covers/${path}?size=${size}`;
+}
+
+const readerHeaders = (): Record<string, string> => {
+  const reader = getReader();
+  return reader ? { "X-User-Id": reader } : {};
+};
+
 export async function apiRequest<T>(path: string, options: RequestOptions = {}): Promise<T> {
   const { parseJson = true, headers, ...rest } = options;
   const response = await fetch(`${API_BASE_URL}${path}`, {
     ...rest,
     headers: {
       "Content-Type": "application/json",
+      ...readerHeaders(),
       ...(headers || {})
     }
   });
@@ -23,3 +49,42 @@ export async function apiRequest<T>(path: string, options: RequestOptions = {}):
 
   return (await response.json()) as T;
 }
+
+// Reads an application/x-ndjson response, handing each line over as soon as it arrives.
+export async function streamNdjson<T>(path: string, onLine: (line: T) => void): Promise<void> {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    headers: { Accept: "application/x-ndjson", ...readerHeaders() }
+  });
+
+  if (!response.ok) {
+    const text = await response.text();
+    throw new Error(text || `Request failed with status ${response.status}`);
+  }
+
+  const emit = (line: string) => {
+    if (line.trim()) {
+      onLine(JSON.parse(line) as T);
+    }
+  };
+
+  if (!response.body) {
+    (await response.text()).split("\n").forEach(emit);
+    return;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline = buffer.indexOf("\n");
+    while (newline >= 0) {
+      emit(buffer.slice(0, newline));
+      buffer = buffer.slice(newline + 1);
+      newline = buffer.indexOf("\n");
+    }
+  }
+  emit(buffer + decoder.decode());
+}
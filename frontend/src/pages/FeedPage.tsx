@@ -1,8 +1,8 @@
-import { useCallback, useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import BookCard from "../components/BookCard";
-import { apiRequest } from "../hooks/useApi";
+import { apiRequest, coverSrc, streamNdjson } from "../hooks/useApi";
 
-type FeedMode = "taste" | "trope";
+type FeedMode = "taste" | "trope" | "similar";
 
 type TasteRecommendationResponse = {
   id: number;
@@ -21,6 +21,7 @@ type TasteRecommendationResponse = {
 
 type RecommendationsResponse = {
   items: TasteRecommendationResponse[];
+  next_cursor?: string | null;
 };
 
 type TropeRecommendation = {
@@ -37,6 +38,28 @@ type TropeRecommendation = {
 
 type TropeRecommendationsResponse = {
   items: TropeRecommendation[];
+  next_cursor?: string | null;
+};
+
+// Last line of an NDJSON feed stream; every other line is a card.
+type StreamTrailer = {
+  next_cursor: string | null;
+};
+
+type EmbeddingRecommendation = {
+  id: string;
+  title: string;
+  author: string;
+  description?: string;
+  cover_url?: string;
+  tropes: string[];
+  score: number;
+  similar_to?: string | null;
+  explanation: string;
+};
+
+type EmbeddingRecommendationsResponse = {
+  items: EmbeddingRecommendation[];
 };
 
 type CardViewModel = {
@@ -51,6 +74,31 @@ type CardViewModel = {
   feedbackBookId?: number;
 };
 
+type PendingFeedback = {
+  book_id: number;
+  reaction: "liked" | "skipped";
+  idempotency_key: string;
+  created_at: string;
+};
+
+// Swipes are queued and sent together; a failed batch is retried with the same keys.
+const FEEDBACK_FLUSH_SIZE = 10;
+const FEEDBACK_FLUSH_INTERVAL_MS = 3000;
+
+const FEED_PAGE_SIZE = 10;
+// Fetch the next page once the user is this many cards from the end.
+const FEED_PREFETCH_DISTANCE = 3;
+
+const FEED_PATHS: Record<"taste" | "trope", string> = {
+  taste: "/api/recommendations",
+  trope: "/api/discovery/trope-feed"
+};
+
+const newIdempotencyKey = () =>
+  typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
 const FeedPage = () => {
   const [mode, setMode] = useState<FeedMode>("taste");
   const [loading, setLoading] = useState(true);
@@ -59,6 +107,36 @@ const FeedPage = () => {
   const [activeIndex, setActiveIndex] = useState(0);
   const [feedbackState, setFeedbackState] = useState<Record<string, "liked" | "skipped">>({});
 
+  const nextCursor = useRef<string | null>(null);
+  const loadingMore = useRef(false);
+  const pendingFeedback = useRef<PendingFeedback[]>([]);
+  const flushing = useRef(false);
+
+  const flushFeedback = useCallback(async () => {
+    if (flushing.current || pendingFeedback.current.length === 0) return;
+    flushing.current = true;
+    const batch = pendingFeedback.current.slice(0, 500);
+    try {
+      await apiRequest("/api/feedback/batch", {
+        method: "POST",
+        body: JSON.stringify({ items: batch })
+      });
+      pendingFeedback.current = pendingFeedback.current.slice(batch.length);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      flushing.current = false;
+    }
+  }, []);
+
+  useEffect(() => {
+    const timer = window.setInterval(() => void flushFeedback(), FEEDBACK_FLUSH_INTERVAL_MS);
+    return () => {
+      window.clearInterval(timer);
+      void flushFeedback();
+    };
+  }, [flushFeedback]);
+
   const activeRecommendation = useMemo(
     () => recommendations[activeIndex],
     [recommendations, activeIndex]
@@ -70,7 +148,7 @@ const FeedPage = () => {
       title: item.book.title,
       author: item.book.author,
       description: item.book.description,
-      coverUrl: item.book.cover_url,
+      coverUrl: item.book.cover_url ? coverSrc(String(item.book.id)) : undefined,
       reason: item.explanation || item.book.reason,
       scoreLabel: `Affinity ${Math.round(item.score * 100)}%`,
       feedbackBookId: item.book.id
@@ -83,36 +161,95 @@ const FeedPage = () => {
       title: item.title,
       author: item.author,
       description: item.description,
-      coverUrl: item.cover_url,
+      coverUrl: item.cover_url ? coverSrc(`catalog/${encodeURIComponent(item.id)}`) : undefined,
       reason: item.explanation,
       tropes: item.matched_tropes.length > 0 ? item.matched_tropes : item.all_tropes,
       scoreLabel: `Trope match ${item.score}%`
     }));
   }, []);
 
+  const normaliseEmbeddingFeed = useCallback((payload: EmbeddingRecommendationsResponse): CardViewModel[] => {
+    return payload.items.map((item) => ({
+      id: `similar-${item.id}`,
+      title: item.title,
+      author: item.author,
+      description: item.description,
+      coverUrl: item.cover_url ? coverSrc(`catalog/${encodeURIComponent(item.id)}`) : undefined,
+      reason: item.explanation,
+      tropes: item.tropes,
+      scoreLabel: `Similarity ${item.score}%`
+    }));
+  }, []);
+
+  const normalisePage = useCallback(
+    (selectedMode: "taste" | "trope", items: unknown[]): CardViewModel[] =>
+      selectedMode === "trope"
+        ? normaliseTropeFeed({ items: items as TropeRecommendation[] })
+        : normaliseTasteFeed({ items: items as TasteRecommendationResponse[] }),
+    [normaliseTasteFeed, normaliseTropeFeed]
+  );
+
   const loadRecommendations = useCallback(
     async (selectedMode: FeedMode) => {
       setLoading(true);
       setError(null);
+      setRecommendations([]);
+      setActiveIndex(0);
+      setFeedbackState({});
+      nextCursor.current = null;
       try {
-        if (selectedMode === "trope") {
-          const data = await apiRequest<TropeRecommendationsResponse>("/api/discovery/trope-feed?limit=10");
-          setRecommendations(normaliseTropeFeed(data));
+        if (selectedMode === "similar") {
+          const data = await apiRequest<EmbeddingRecommendationsResponse>("/api/discovery/embedding-feed?limit=10");
+          setRecommendations(normaliseEmbeddingFeed(data));
         } else {
-          const data = await apiRequest<RecommendationsResponse>("/api/recommendations?limit=10");
-          setRecommendations(normaliseTasteFeed(data));
+          // Cards are streamed so the first one renders before the page is complete.
+          const feedMode = selectedMode;
+          await streamNdjson<TasteRecommendationResponse | TropeRecommendation | StreamTrailer>(
+            `${FEED_PATHS[feedMode]}?limit=${FEED_PAGE_SIZE}`,
+            (line) => {
+              if ("next_cursor" in line) {
+                nextCursor.current = line.next_cursor;
+                return;
+              }
+              setRecommendations((prev) => [...prev, ...normalisePage(feedMode, [line])]);
+              setLoading(false);
+            }
+          );
         }
-        setActiveIndex(0);
-        setFeedbackState({});
       } catch (err) {
         setError(err instanceof Error ? err.message : "Failed to fetch recommendations");
       } finally {
         setLoading(false);
       }
     },
-    [normaliseTasteFeed, normaliseTropeFeed]
+    [normaliseEmbeddingFeed, normalisePage]
   );
 
+  const loadMore = useCallback(async () => {
+    const cursor = nextCursor.current;
+    if (mode === "similar" || !cursor || loadingMore.current) return;
+    loadingMore.current = true;
+    try {
+      const data = await apiRequest<RecommendationsResponse | TropeRecommendationsResponse>(
+        `${FEED_PATHS[mode]}?limit=${FEED_PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}`
+      );
+      nextCursor.current = data.next_cursor ?? null;
+      setRecommendations((prev) => [...prev, ...normalisePage(mode, data.items)]);
+    } catch (err) {
+      // An expired cursor ends the feed; reloading starts a fresh ranking.
+      nextCursor.current = null;
+      console.error(err);
+    } finally {
+      loadingMore.current = false;
+    }
+  }, [mode, normalisePage]);
+
+  useEffect(() => {
+    if (recommendations.length > 0 && activeIndex >= recommendations.length - FEED_PREFETCH_DISTANCE) {
+      void loadMore();
+    }
+  }, [activeIndex, recommendations.length, loadMore]);
+
   useEffect(() => {
     void loadRecommendations(mode);
   }, [loadRecommendations, mode]);
@@ -122,27 +259,25 @@ const FeedPage = () => {
   }, [recommendations.length]);
 
   const submitFeedback = useCallback(
-    async (reaction: "like" | "skip") => {
+    (reaction: "like" | "skip") => {
       const current = activeRecommendation;
       if (!current) return;
       const stateKey = current.id;
       setFeedbackState((prev) => ({ ...prev, [stateKey]: reaction === "like" ? "liked" : "skipped" }));
       if (current.feedbackBookId) {
-        try {
-          await apiRequest("/api/feedback", {
-            method: "POST",
-            body: JSON.stringify({
-              book_id: current.feedbackBookId,
-              reaction: reaction === "like" ? "liked" : "skipped"
-            })
-          });
-        } catch (err) {
-          console.error(err);
+        pendingFeedback.current.push({
+          book_id: current.feedbackBookId,
+          reaction: reaction === "like" ? "liked" : "skipped",
+          idempotency_key: newIdempotencyKey(),
+          created_at: new Date().toISOString()
+        });
+        if (pendingFeedback.current.length >= FEEDBACK_FLUSH_SIZE) {
+          void flushFeedback();
         }
       }
       handleAdvance();
     },
-    [activeRecommendation, handleAdvance]
+    [activeRecommendation, handleAdvance, flushFeedback]
   );
 
   if (loading) {
@@ -192,6 +327,15 @@ const FeedPage = () => {
         >
           Trope Feed
         </button>
+        <button
+          type="button"
+          role="tab"
+          className={`toggle-button ${mode === "similar" ? "active" : ""}`}
+          onClick={() => setMode("similar")}
+          aria-selected={mode === "similar"}
+        >
+          Similar
+        </button>
       </div>
       <BookCard
         key={activeRecommendation.id}
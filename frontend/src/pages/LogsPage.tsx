@@ -12,6 +12,7 @@ type LogEntry = {
 
 type LogsResponse = {
   items: LogEntry[];
+  next_cursor?: string | null;
 };
 
 const levelBadgeClass = (level: string) => {
@@ -31,6 +32,8 @@ const LogsPage = () => {
   const [logs, setLogs] = useState<LogEntry[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchLogs = useCallback(async () => {
     setLoading(true);
@@ -38,6 +41,7 @@ const LogsPage = () => {
     try {
       const response = await apiRequest<LogsResponse>("/api/logs");
       setLogs(response.items);
+      setNextCursor(response.next_cursor ?? null);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Unable to load logs");
     } finally {
@@ -45,6 +49,22 @@ const LogsPage = () => {
     }
   }, []);
 
+  const loadOlder = useCallback(async () => {
+    if (!nextCursor) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const response = await apiRequest<LogsResponse>(`/api/logs?cursor=${encodeURIComponent(nextCursor)}`);
+      setLogs((current) => [...current, ...response.items]);
+      setNextCursor(response.next_cursor ?? null);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : "Unable to load logs");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor]);
+
   useEffect(() => {
     void fetchLogs();
     const interval = window.setInterval(() => {
@@ -89,6 +109,11 @@ const LogsPage = () => {
           )}
         </div>
       ))}
+      {nextCursor && (
+        <button className="secondary-button" type="button" onClick={() => loadOlder()} disabled={loadingMore}>
+          {loadingMore ? "Loading…" : "Load older entries"}
+        </button>
+      )}
     </div>
   );
 };
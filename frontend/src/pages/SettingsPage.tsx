@@ -1,5 +1,5 @@
 import { FormEvent, useCallback, useEffect, useState } from "react";
-import { apiRequest } from "../hooks/useApi";
+import { apiRequest, getReader, setReader } from "../hooks/useApi";
 
 type Settings = {
   abs_url?: string;
@@ -206,6 +206,26 @@ const SettingsPage = () => {
           {syncStatus.message && <p style={{ margin: 0 }}>{syncStatus.message}</p>}
         </div>
       )}
+      <section style={{ marginTop: "2rem" }}>
+        <h3 style={{ margin: "0 0 0.5rem", fontSize: "1rem", color: "#1e293b" }}>Reader</h3>
+        <p style={{ margin: "0 0 1rem", fontSize: "0.85rem", color: "#475569" }}>
+          Each reader on this device gets their own swipes and feeds. Leave empty for the shared default reader.
+        </p>
+        <div className="settings-field">
+          <label htmlFor="reader">Reader name</label>
+          <input
+            id="reader"
+            placeholder="default"
+            defaultValue={getReader()}
+            pattern="[A-Za-z0-9][A-Za-z0-9_.@\-]{0,63}"
+            onBlur={(event) => {
+              if (event.currentTarget.checkValidity()) {
+                setReader(event.currentTarget.value.trim());
+              }
+            }}
+          />
+        </div>
+      </section>
       <section style={{ marginTop: "2rem" }}>
         <h3 style={{ margin: "0 0 0.5rem", fontSize: "1rem", color: "#1e293b" }}>Trope Discovery Engine</h3>
         <p style={{ margin: "0 0 1rem", fontSize: "0.85rem", color: "#475569" }}>